@@ -0,0 +1,105 @@
+"""
+Batch - Varios archivos (o un ZIP) analizados en paralelo con un reporte consolidado
+Cada archivo se analiza en el pool como un job propio y devuelve sus estados
+sin finalizar; el reporte consolidado combina esos estados con el merge de
+cada analizador, sin volver a juntar los datos de los archivos.
+"""
+
+import os
+import shutil
+import zipfile
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from api.pipeline import build_analyzers
+from api.uploads import sniff_format, UploadTooLargeError, UPLOAD_CHUNK_BYTES
+from core.registro_analizadores import resolve_mode, run_dependents
+from core.streaming import merge_states, finalize_states
+
+logger = logging.getLogger('MVN-API')
+
+BATCH_MAX_FILES = int(os.environ.get("MVN_BATCH_MAX_FILES", 200))
+
+
+class BatchError(Exception):
+    """El batch no se puede procesar (ZIP inválido, demasiados archivos)"""
+
+
+def is_zip_archive(path: str) -> bool:
+    """ZIP de archivos (un .xlsx también es un ZIP, pero no cuenta)"""
+    if not zipfile.is_zipfile(path):
+        return False
+    with zipfile.ZipFile(path) as zf:
+        return '[Content_Types].xml' not in zf.namelist()
+
+
+def sniff_file(path: str) -> str:
+    with open(path, 'rb') as f:
+        return sniff_format(f.read(UPLOAD_CHUNK_BYTES)) if os.path.getsize(path) else 'txt'
+
+
+def extract_zip(path: str, destino: str, max_bytes: int, max_files: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    Extrae los archivos del ZIP en `destino` y devuelve (nombre, path) de cada uno.
+
+    Sólo se usa el nombre base de cada miembro (sin rutas), se omiten
+    carpetas, archivos ocultos y ZIPs anidados, y se corta si el total
+    descomprimido supera `max_bytes`.
+    """
+    max_files = max_files or BATCH_MAX_FILES
+    os.makedirs(destino, exist_ok=True)
+    miembros = []
+    total = 0
+    try:
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                nombre = Path(info.filename).name
+                if info.is_dir() or not nombre or nombre.startswith('.') or info.filename.startswith('__MACOSX/'):
+                    continue
+                if nombre.lower().endswith('.zip'):
+                    logger.warning(f"ZIP anidado omitido: {info.filename}")
+                    continue
+                if len(miembros) >= max_files:
+                    raise BatchError(f"El ZIP tiene más de {max_files} archivos")
+
+                salida = os.path.join(destino, f"{len(miembros):03d}_{nombre}")
+                with zf.open(info) as origen, open(salida, 'wb') as f:
+                    while True:
+                        bloque = origen.read(UPLOAD_CHUNK_BYTES)
+                        if not bloque:
+                            break
+                        total += len(bloque)
+                        if total > max_bytes:
+                            raise UploadTooLargeError(
+                                f"El ZIP descomprimido supera el máximo de {max_bytes // (1024 * 1024)} MB"
+                            )
+                        f.write(bloque)
+                miembros.append((nombre, salida))
+    except zipfile.BadZipFile as e:
+        shutil.rmtree(destino, ignore_errors=True)
+        raise BatchError(f"ZIP inválido: {e}")
+    except Exception:
+        shutil.rmtree(destino, ignore_errors=True)
+        raise
+    return miembros
+
+
+def consolidate(modo: str, miembros: List[Dict], estados: List[Optional[Tuple[Dict, Dict]]]) -> Dict:
+    """Reporte consolidado a partir de los estados de cada archivo (None si falló)"""
+    analizadores = build_analyzers(modo, validation=True)
+    combinados, errores = merge_states(analizadores, [e for e in estados if e is not None])
+    results = finalize_states(analizadores, combinados, errores)
+    run_dependents(resolve_mode(modo)[1], results)
+    results["miembros"] = [
+        {
+            "job_id": m["job_id"],
+            "file": m["file"],
+            "formato": m["formato"],
+            "status": "completed" if e is not None else m.get("status", "failed"),
+            "filas": m.get("filas"),
+            "error": m.get("error")
+        }
+        for m, e in zip(miembros, estados)
+    ]
+    return results
@@ -0,0 +1,261 @@
+"""
+Ejecutor de jobs - Pool de procesos con cola acotada
+El análisis (pandas, síncrono) corre fuera del event loop para que
+/health y /status sigan respondiendo mientras se procesan archivos.
+
+Un job se cancela con una marca en MVN_CANCEL_DIR (visible desde cualquier
+proceso del host) y tiene un plazo (MVN_JOB_TIMEOUT_MIN, o el de cada
+upload). El worker revisa ambos en check_cancelled(), entre etapas y entre
+chunks, y corta el job con JobCancelled. Dentro de las etapas de una sola
+pasada (parse sin chunks, analizadores) el mismo chequeo corre en los
+puntos de control de core (core/punto_control.py).
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Optional, Tuple
+
+from core.punto_control import Interrupcion, set_checkpoint
+
+logger = logging.getLogger('MVN-API')
+
+CANCEL_DIR = os.environ.get("MVN_CANCEL_DIR", "cancel")
+# Plazo por defecto de un job desde que entra a la cola (0 = sin plazo)
+JOB_TIMEOUT_S = float(os.environ.get("MVN_JOB_TIMEOUT_MIN", 0)) * 60
+
+# Cola de progreso del proceso worker actual (se asigna en _init_worker)
+_progress_queue = None
+
+# Plazo del job que corre en este worker (epoch; None = sin plazo)
+_job_deadline = None
+
+
+class QueueFullError(Exception):
+    """No hay lugar en la cola de jobs"""
+
+
+class JobCancelled(Exception):
+    """El job se detuvo antes de terminar; `status` es 'cancelled' o 'timed_out'"""
+
+    def __init__(self, status: str, mensaje: str = ""):
+        # Los args completos para que viaje del worker a la API (pickle)
+        super().__init__(status, mensaje)
+        self.status = status
+
+    def __str__(self) -> str:
+        return self.args[1] or self.args[0]
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s | %(levelname)s | %(message)s'
+    )
+
+
+def report_progress(job_id: str, **campos):
+    """Publica una actualización de estado desde el worker (no-op fuera del pool)"""
+    if _progress_queue is not None:
+        _progress_queue.put((job_id, campos))
+
+
+def _cancel_path(job_id: str) -> str:
+    return os.path.join(CANCEL_DIR, job_id)
+
+
+def request_cancel(job_id: str):
+    """Marca el job para que su worker lo corte en el próximo punto de control"""
+    os.makedirs(CANCEL_DIR, exist_ok=True)
+    with open(_cancel_path(job_id), "w"):
+        pass
+
+
+def clear_cancel(job_id: str):
+    try:
+        os.remove(_cancel_path(job_id))
+    except FileNotFoundError:
+        pass
+
+
+def check_cancelled(job_id: str):
+    """Punto de control del worker: lanza JobCancelled si el job se canceló o venció su plazo"""
+    if _job_deadline is not None and time.time() > _job_deadline:
+        raise JobCancelled("timed_out", "Plazo del job vencido")
+    if os.path.exists(_cancel_path(job_id)):
+        raise JobCancelled("cancelled", "Job cancelado")
+
+
+def _interrupt_if_cancelled(job_id: str):
+    """Punto de control de core: el mismo chequeo, como Interrupcion"""
+    try:
+        check_cancelled(job_id)
+    except JobCancelled as e:
+        raise Interrupcion(*e.args) from None
+
+
+def _run_job(fn: Callable, job_id: str, deadline: Optional[float], *args):
+    """Ejecuta fn(job_id, *args) en el worker con el plazo del job"""
+    global _job_deadline
+    _job_deadline = deadline
+    set_checkpoint(partial(_interrupt_if_cancelled, job_id))
+    try:
+        # Cancelado (o vencido) mientras esperaba en la cola
+        check_cancelled(job_id)
+        return fn(job_id, *args)
+    except Interrupcion as e:
+        raise JobCancelled(*e.args) from None
+    finally:
+        _job_deadline = None
+        set_checkpoint(None)
+
+
+class JobExecutor:
+    """
+    Ejecuta funciones de pipeline en un pool de procesos.
+
+    Como máximo hay `max_workers` jobs corriendo y `max_queue` esperando;
+    más allá de eso submit() lanza QueueFullError (la API responde 429).
+    Las actualizaciones de progreso de los workers llegan por una cola y
+    se entregan a `on_progress(job_id, campos)` desde un hilo lector.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 on_progress: Optional[Callable] = None, timeout_s: Optional[float] = None):
+        self.max_workers = max_workers or int(os.environ.get("MVN_WORKERS", os.cpu_count() or 2))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get("MVN_MAX_QUEUE", 8))
+        self.on_progress = on_progress
+        self.timeout_s = timeout_s if timeout_s is not None else JOB_TIMEOUT_S
+        self._pool = None
+        self._queue = None
+        self._reader = None
+        self._pending = set()
+        # job_id -> (future del pool, plazo)
+        self._jobs: Dict[str, Tuple[Future, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def queued(self) -> int:
+        return max(self.in_flight - self.max_workers, 0)
+
+    def is_full(self) -> bool:
+        return self.in_flight >= self.capacity
+
+    def start(self):
+        if self._pool is not None:
+            return
+        context = multiprocessing.get_context("spawn")
+        self._queue = context.Queue()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._queue,)
+        )
+        self._reader = threading.Thread(target=self._read_progress, name="job-progress", daemon=True)
+        self._reader.start()
+        logger.info(f"JobExecutor iniciado: {self.max_workers} workers, cola de {self.max_queue}")
+
+    def submit(self, fn: Callable, job_id: str, *args, timeout_s: Optional[float] = None) -> asyncio.Future:
+        """
+        Encola fn(job_id, *args) en el pool; devuelve un future awaitable.
+
+        El plazo (`timeout_s`, por defecto el del ejecutor; 0 = sin plazo)
+        corre desde que el job entra a la cola.
+        """
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        deadline = time.time() + timeout_s if timeout_s else None
+        with self._lock:
+            if len(self._pending) >= self.capacity:
+                raise QueueFullError(f"Cola llena ({self.capacity} jobs en curso)")
+            self.start()
+            future = self._pool.submit(_run_job, fn, job_id, deadline, *args)
+            self._pending.add(future)
+            self._jobs[job_id] = (future, deadline)
+        future.add_done_callback(lambda f: self._discard(f, job_id))
+        return asyncio.wrap_future(future)
+
+    def _discard(self, future, job_id: str):
+        with self._lock:
+            self._pending.discard(future)
+            if self._jobs.get(job_id, (None,))[0] is future:
+                del self._jobs[job_id]
+
+    async def wait(self, job_id: str, future: asyncio.Future):
+        """
+        Resultado del job. Lanza JobCancelled si se canceló o si vence su
+        plazo, aunque el worker siga en una etapa larga (se corta en el
+        próximo punto de control).
+        """
+        with self._lock:
+            deadline = self._jobs.get(job_id, (None, None))[1]
+        timeout = None if deadline is None else max(deadline - time.time(), 0)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.cancel(job_id)
+            # El worker termina después; lo que devuelva ya no se usa
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise JobCancelled("timed_out", "Plazo del job vencido")
+        except asyncio.CancelledError:
+            if future.cancelled():
+                raise JobCancelled("cancelled", "Job cancelado")
+            raise
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancela un job: si espera en la cola no llega a correr; si corre,
+        el worker lo corta en el próximo punto de control. Devuelve True si
+        el job todavía no había empezado.
+        """
+        request_cancel(job_id)
+        with self._lock:
+            future = self._jobs.get(job_id, (None,))[0]
+        return future is not None and future.cancel()
+
+    def _read_progress(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            job_id, campos = item
+            if self.on_progress is not None:
+                try:
+                    self.on_progress(job_id, campos)
+                except Exception as e:
+                    logger.error(f"[JOB-{job_id}] Error actualizando progreso: {e}")
+
+    def shutdown(self, wait: bool = True):
+        """Cancela los jobs en espera, espera a los que corren y libera el pool"""
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        self._queue.put(None)
+        self._reader.join(timeout=5)
+        self._queue.close()
+        self._pool = None
+        self._queue = None
+        self._reader = None
+        logger.info("JobExecutor detenido")
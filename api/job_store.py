@@ -0,0 +1,405 @@
+"""
+Job store - Estado de los jobs fuera del proceso de la API
+`memory` para un solo proceso; `sqlite` (por defecto) comparte los jobs entre
+varios workers de uvicorn en el mismo host. Los jobs terminados expiran
+después de MVN_JOB_TTL_H horas.
+
+También guarda el índice de la caché de resultados (ver ResultCache) y sus
+contadores, así todos los workers comparten hits y desalojos.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger('MVN-API')
+
+JOB_STORE = os.environ.get("MVN_JOB_STORE", "sqlite")
+JOBS_DB = os.environ.get("MVN_JOBS_DB", "jobs.db")
+JOB_TTL_S = float(os.environ.get("MVN_JOB_TTL_H", 24)) * 3600
+
+# Estados en los que un job ya no recibe actualizaciones de progreso
+FINAL_STATES = ("completed", "failed", "cancelled", "timed_out")
+
+# Jobs detenidos antes de terminar (DELETE /jobs/{job_id} o plazo vencido)
+STOPPED_STATES = ("cancelled", "timed_out")
+
+# Cada cuánto se barren los jobs expirados (en segundos)
+PURGE_INTERVAL_S = 60
+
+
+class JobStore:
+    """
+    Interfaz del store de jobs.
+
+    update() es atómica: lee, combina los campos y escribe en una sola
+    operación. Con `progress=True` no toca jobs que ya terminaron (las
+    actualizaciones de progreso pueden llegar después del resultado).
+    `on_purge(job_ids)` recibe los jobs expirados que se eliminaron, para
+    borrar sus archivos.
+    """
+
+    def __init__(self, ttl_s: Optional[float] = None, on_purge: Optional[Callable[[List[str]], None]] = None):
+        self.ttl_s = ttl_s if ttl_s is not None else JOB_TTL_S
+        self.on_purge = on_purge
+        self._last_purge = 0.0
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def create(self, job_id: str, job: Dict):
+        raise NotImplementedError
+
+    def update(self, job_id: str, campos: Dict, progress: bool = False) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def delete(self, job_id: str):
+        raise NotImplementedError
+
+    def count(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def purge_expired(self) -> List[str]:
+        """Elimina los jobs terminados hace más de ttl_s; devuelve sus ids"""
+        raise NotImplementedError
+
+    # Índice de la caché de resultados: clave (sha256, modo, huella) → entrada
+    # {job_id, result_path, bytes, created}; LRU por último uso
+
+    def cache_get(self, clave: Tuple[str, str, str]) -> Optional[Dict]:
+        """Entrada de la clave (y la marca como usada)"""
+        raise NotImplementedError
+
+    def cache_put(self, clave: Tuple[str, str, str], entrada: Dict):
+        raise NotImplementedError
+
+    def cache_delete(self, clave: Tuple[str, str, str]):
+        raise NotImplementedError
+
+    def cache_evict(self, max_entries: int, max_bytes: int, max_age_s: float) -> List[Dict]:
+        """Quita las vencidas y las menos usadas hasta entrar en los límites; devuelve las quitadas"""
+        raise NotImplementedError
+
+    def cache_jobs(self, job_ids: Iterable[str]) -> Set[str]:
+        """Cuáles de `job_ids` tienen resultados referenciados por la caché"""
+        raise NotImplementedError
+
+    def cache_count(self, contador: str, n: int = 1):
+        raise NotImplementedError
+
+    def cache_stats(self) -> Dict:
+        """entries, bytes y los contadores (hits, misses, evictions)"""
+        raise NotImplementedError
+
+    def maybe_purge(self):
+        """Barre los jobs expirados como mucho una vez por PURGE_INTERVAL_S"""
+        ahora = time.time()
+        if ahora - self._last_purge >= PURGE_INTERVAL_S:
+            self._last_purge = ahora
+            borrados = self.purge_expired()
+            if borrados:
+                logger.info(f"Job store: {len(borrados)} jobs expirados eliminados")
+                if self.on_purge is not None:
+                    self.on_purge(borrados)
+
+
+class MemoryJobStore(JobStore):
+    """Jobs en un dict del proceso (un solo worker de uvicorn)"""
+
+    def __init__(self, ttl_s: Optional[float] = None, on_purge: Optional[Callable[[List[str]], None]] = None):
+        super().__init__(ttl_s, on_purge)
+        self._jobs: Dict[str, Dict] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._cache: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+        self._cache_counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def create(self, job_id: str, job: Dict):
+        self.maybe_purge()
+        with self._lock:
+            self._jobs[job_id] = dict(job)
+            self._mark(job_id)
+
+    def update(self, job_id: str, campos: Dict, progress: bool = False) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (progress and job.get("status") in FINAL_STATES):
+                return None
+            job.update(campos)
+            self._mark(job_id)
+            return dict(job)
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._finished_at.pop(job_id, None)
+
+    def count(self) -> Dict[str, int]:
+        with self._lock:
+            conteo = {}
+            for job in self._jobs.values():
+                conteo[job.get("status")] = conteo.get(job.get("status"), 0) + 1
+            return conteo
+
+    def purge_expired(self) -> List[str]:
+        limite = time.time() - self.ttl_s
+        with self._lock:
+            expirados = [j for j, t in self._finished_at.items() if t < limite]
+            for job_id in expirados:
+                self._jobs.pop(job_id, None)
+                del self._finished_at[job_id]
+        return expirados
+
+    def _mark(self, job_id: str):
+        if self._jobs[job_id].get("status") in FINAL_STATES:
+            self._finished_at.setdefault(job_id, time.time())
+
+    def cache_get(self, clave: Tuple[str, str, str]) -> Optional[Dict]:
+        with self._lock:
+            entrada = self._cache.get(clave)
+            if entrada is None:
+                return None
+            self._cache.move_to_end(clave)
+            return dict(entrada)
+
+    def cache_put(self, clave: Tuple[str, str, str], entrada: Dict):
+        with self._lock:
+            self._cache.pop(clave, None)
+            self._cache[clave] = dict(entrada)
+
+    def cache_delete(self, clave: Tuple[str, str, str]):
+        with self._lock:
+            self._cache.pop(clave, None)
+
+    def cache_evict(self, max_entries: int, max_bytes: int, max_age_s: float) -> List[Dict]:
+        limite = time.time() - max_age_s
+        with self._lock:
+            quitadas = [c for c, e in self._cache.items() if e["created"] < limite]
+            vigentes = [c for c in self._cache if c not in quitadas]
+            total = sum(self._cache[c]["bytes"] for c in vigentes)
+            while vigentes and (len(vigentes) > max_entries or total > max_bytes):
+                clave = vigentes.pop(0)
+                total -= self._cache[clave]["bytes"]
+                quitadas.append(clave)
+            return [self._cache.pop(c) for c in quitadas]
+
+    def cache_jobs(self, job_ids: Iterable[str]) -> Set[str]:
+        with self._lock:
+            return set(job_ids) & {e["job_id"] for e in self._cache.values()}
+
+    def cache_count(self, contador: str, n: int = 1):
+        with self._lock:
+            self._cache_counters[contador] = self._cache_counters.get(contador, 0) + n
+
+    def cache_stats(self) -> Dict:
+        with self._lock:
+            return dict(self._cache_counters, entries=len(self._cache),
+                        bytes=sum(e["bytes"] for e in self._cache.values()))
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Jobs en una base SQLite (WAL) compartida por los procesos de la API.
+
+    Una conexión por hilo; las escrituras usan BEGIN IMMEDIATE para que
+    leer-combinar-escribir sea atómico entre procesos.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_s: Optional[float] = None,
+                 on_purge: Optional[Callable[[List[str]], None]] = None):
+        super().__init__(ttl_s, on_purge)
+        self.path = path or JOBS_DB
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                " sha256 TEXT NOT NULL,"
+                " modo TEXT NOT NULL,"
+                " huella TEXT NOT NULL,"
+                " job_id TEXT NOT NULL,"
+                " result_path TEXT NOT NULL,"
+                " bytes INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " used REAL NOT NULL,"
+                " PRIMARY KEY (sha256, modo, huella))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS result_cache_used ON result_cache (used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_counters (contador TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directorio = os.path.dirname(self.path)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        fila = self._connect().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def create(self, job_id: str, job: Dict):
+        self.maybe_purge()
+        ahora = time.time()
+        status = job.get("status", "queued")
+        self._connect().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, data, updated_at, finished_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, status, json.dumps(job, default=str), ahora, ahora if status in FINAL_STATES else None)
+        )
+
+    def update(self, job_id: str, campos: Dict, progress: bool = False) -> Optional[Dict]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if fila is None:
+                conn.execute("ROLLBACK")
+                return None
+            job = json.loads(fila[0])
+            if progress and job.get("status") in FINAL_STATES:
+                conn.execute("ROLLBACK")
+                return None
+            job.update(campos)
+            status = job.get("status", "queued")
+            ahora = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, data = ?, updated_at = ?,"
+                " finished_at = COALESCE(finished_at, ?) WHERE job_id = ?",
+                (status, json.dumps(job, default=str), ahora,
+                 ahora if status in FINAL_STATES else None, job_id)
+            )
+            conn.execute("COMMIT")
+            return job
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, job_id: str):
+        self._connect().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def count(self) -> Dict[str, int]:
+        filas = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: n for status, n in filas}
+
+    def purge_expired(self) -> List[str]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            filas = conn.execute(
+                "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - self.ttl_s,)
+            ).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", filas)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [fila[0] for fila in filas]
+
+    def cache_get(self, clave: Tuple[str, str, str]) -> Optional[Dict]:
+        conn = self._connect()
+        fila = conn.execute(
+            "SELECT job_id, result_path, bytes, created FROM result_cache"
+            " WHERE sha256 = ? AND modo = ? AND huella = ?", clave
+        ).fetchone()
+        if fila is None:
+            return None
+        conn.execute("UPDATE result_cache SET used = ? WHERE sha256 = ? AND modo = ? AND huella = ?",
+                     (time.time(),) + tuple(clave))
+        return {"job_id": fila[0], "result_path": fila[1], "bytes": fila[2], "created": fila[3]}
+
+    def cache_put(self, clave: Tuple[str, str, str], entrada: Dict):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO result_cache"
+            " (sha256, modo, huella, job_id, result_path, bytes, created, used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            tuple(clave) + (entrada["job_id"], entrada["result_path"], entrada["bytes"],
+                            entrada["created"], time.time())
+        )
+
+    def cache_delete(self, clave: Tuple[str, str, str]):
+        self._connect().execute("DELETE FROM result_cache WHERE sha256 = ? AND modo = ? AND huella = ?", clave)
+
+    def cache_evict(self, max_entries: int, max_bytes: int, max_age_s: float) -> List[Dict]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            filas = conn.execute(
+                "SELECT sha256, modo, huella, job_id, result_path, bytes, created FROM result_cache ORDER BY used DESC"
+            ).fetchall()
+            limite = time.time() - max_age_s
+            quitadas, conservadas, total, lleno = [], 0, 0, False
+            for fila in filas:
+                if fila[6] < limite:
+                    quitadas.append(fila)
+                    continue
+                # De la más usada a la menos: desde la primera que no entra, se quitan todas
+                lleno = lleno or conservadas >= max_entries or total + fila[5] > max_bytes
+                if lleno:
+                    quitadas.append(fila)
+                    continue
+                conservadas += 1
+                total += fila[5]
+            conn.executemany("DELETE FROM result_cache WHERE sha256 = ? AND modo = ? AND huella = ?",
+                             [fila[:3] for fila in quitadas])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [{"job_id": f[3], "result_path": f[4], "bytes": f[5], "created": f[6]} for f in quitadas]
+
+    def cache_jobs(self, job_ids: Iterable[str]) -> Set[str]:
+        job_ids = list(job_ids)
+        referenciados = set()
+        for inicio in range(0, len(job_ids), 500):
+            lote = job_ids[inicio:inicio + 500]
+            filas = self._connect().execute(
+                f"SELECT DISTINCT job_id FROM result_cache WHERE job_id IN ({', '.join('?' * len(lote))})", lote
+            ).fetchall()
+            referenciados.update(fila[0] for fila in filas)
+        return referenciados
+
+    def cache_count(self, contador: str, n: int = 1):
+        self._connect().execute(
+            "INSERT INTO cache_counters (contador, valor) VALUES (?, ?)"
+            " ON CONFLICT (contador) DO UPDATE SET valor = valor + excluded.valor", (contador, n)
+        )
+
+    def cache_stats(self) -> Dict:
+        conn = self._connect()
+        entradas, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM result_cache").fetchone()
+        contadores = dict(conn.execute("SELECT contador, valor FROM cache_counters").fetchall())
+        return dict(contadores, entries=entradas, bytes=total)
+
+
+def create_job_store(backend: Optional[str] = None,
+                     on_purge: Optional[Callable[[List[str]], None]] = None) -> JobStore:
+    """Store según MVN_JOB_STORE ('sqlite' o 'memory')"""
+    backend = (backend or JOB_STORE).lower()
+    if backend == "memory":
+        return MemoryJobStore(on_purge=on_purge)
+    if backend == "sqlite":
+        return SQLiteJobStore(on_purge=on_purge)
+    raise ValueError(f"MVN_JOB_STORE no soportado: {backend}")
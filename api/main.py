@@ -3,27 +3,37 @@ API FastAPI MVN - Servidor principal
 Reemplaza Google Colab, accesible desde celular
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 import os
+import shutil
 import uuid
+import time
+import hashlib
 import asyncio
 from datetime import datetime
-from typing import Optional
-import json
+from typing import List, Optional
 import traceback
 import logging
 from pathlib import Path
 
 # Importar módulos de análisis
 try:
-    from core.pre_parser import PreParser
-    from core.data_validator import DataValidator
-    from core.analyzer_ventas import AnalizadorVentas
-    from core.analyzer_rentabilidad import AnalizadorRentabilidad
-    from core.analyzer_auditoria import AnalizadorAuditoria
+    from api.pipeline import run_pipeline, run_dataset_pipeline, run_batch_member, run_append_pipeline
+    from api.job_executor import JobExecutor, QueueFullError, JobCancelled, clear_cancel
+    from api.uploads import receive_uploads, UploadTooLargeError, UploadError, MAX_UPLOAD_BYTES
+    from api.result_cache import ResultCache, parser_fingerprint
+    from api.metrics import Metrics
+    from api.job_store import create_job_store, FINAL_STATES, STOPPED_STATES
+    from api.result_files import locate, read_body, negotiate_encoding, etag_matches, write_results, ResultChanged
+    from api.batch import is_zip_archive, sniff_file, extract_zip, consolidate, BatchError, BATCH_MAX_FILES
+    from core.dataset_store import DatasetStore
+    from core.pre_parser import PreParser, COMPACT_DEFAULT
+    from core.registro_layouts import registro_layouts
+    from core.registro_analizadores import available_modes, resolve_mode
 except ImportError as e:
     print(f"⚠️ Import error: {e}")
 
@@ -61,11 +71,49 @@ system_state = {
     "total_analyses": 0,
     "failed_analyses": 0,
     "uptime_start": datetime.now().isoformat(),
-    "active_jobs": {},
     "error_log": []
 }
 
 
+def remove_expired_files(job_ids: List[str]):
+    """Archivos de los jobs expirados; los resultados que la caché sigue sirviendo se conservan"""
+    en_cache = result_cache.referenced_jobs(job_ids)
+    for job_id in job_ids:
+        shutil.rmtree(f"uploads/{job_id}", ignore_errors=True)
+        if job_id not in en_cache:
+            shutil.rmtree(f"results/{job_id}", ignore_errors=True)
+
+
+# Jobs compartidos entre workers de uvicorn (MVN_JOB_STORE, MVN_JOBS_DB, MVN_JOB_TTL_H)
+job_store = create_job_store(on_purge=remove_expired_files)
+
+
+def apply_progress(job_id: str, campos: dict):
+    """Aplica una actualización de progreso enviada por un worker"""
+    job_store.update(job_id, campos, progress=True)
+
+
+# Pool de procesos para el análisis (MVN_WORKERS, MVN_MAX_QUEUE)
+executor = JobExecutor(on_progress=apply_progress)
+
+# Resultados ya calculados por hash de archivo + modo (índice en el job store)
+result_cache = ResultCache(job_store)
+
+# Datasets ya parseados (MVN_DATASETS_DIR)
+dataset_store = DatasetStore()
+
+# Layouts de encabezado conocidos y alias de columnas (MVN_LAYOUTS_FILE)
+layout_registry = registro_layouts()
+
+# Latencias por etapa, filas y bytes procesados (GET /metrics)
+metrics = Metrics()
+
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    executor.shutdown(wait=True)
+
+
 @app.get("/health")
 async def health_check():
     """Health check para Railway/Render"""
@@ -77,7 +125,10 @@ async def health_check():
             "status": "healthy",
             "timestamp": system_state["last_check"],
             "total_analyses": system_state["total_analyses"],
-            "failed_analyses": system_state["failed_analyses"]
+            "failed_analyses": system_state["failed_analyses"],
+            "jobs_in_flight": executor.in_flight,
+            "jobs_queued": executor.queued,
+            "jobs": job_store.count()
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -97,61 +148,186 @@ async def root():
         "endpoints": {
             "/health": "Health check",
             "/upload": "Subir archivo (POST)",
+            "/batch": "Subir varios archivos o un ZIP con reporte consolidado (POST)",
             "/status/{job_id}": "Estado del análisis",
-            "/results/{job_id}": "Obtener resultados"
+            "/results/{job_id}": "Obtener resultados",
+            "/cache/stats": "Estadísticas de la caché de resultados",
+            "/metrics": "Métricas en formato Prometheus",
+            "/datasets": "Datasets ya parseados",
+            "/datasets/{dataset_id}/analyze": "Re-analizar un dataset (POST)",
+            "/datasets/{dataset_id}/append": "Agregar un archivo delta a un dataset (POST)",
+            "/layouts": "Layouts de encabezado conocidos y alias de columnas",
+            "/layouts/aliases": "Agregar un alias de columna (POST)",
+            "/modos": "Modos de análisis y qué analizadores ejecuta cada uno",
+            "/jobs/{job_id}": "Cancelar un job o batch en espera o en curso (DELETE)"
         }
     }
 
 
+def check_mode(modo: str):
+    """400 si el modo no existe (un modo con nombre o análisis unidos con '+')"""
+    try:
+        resolve_mode(modo)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def timeout_seconds(timeout_min: Optional[float]) -> Optional[float]:
+    """Plazo de un job en segundos (None: MVN_JOB_TIMEOUT_MIN; 0: sin plazo)"""
+    if timeout_min is None:
+        return None
+    if timeout_min < 0:
+        raise HTTPException(status_code=400, detail="timeout_min no puede ser negativo")
+    return timeout_min * 60
+
+
+@app.get("/modos")
+async def list_modes():
+    """Modos con nombre: analizadores de datos (en paralelo) y análisis posteriores"""
+    modos = {}
+    for modo in available_modes():
+        try:
+            datos, posteriores = resolve_mode(modo)
+        except ValueError as e:
+            modos[modo] = {"error": str(e)}
+            continue
+        modos[modo] = {"analizadores": datos, "posteriores": posteriores}
+    return {"modos": modos, "combinables": "nombres unidos con '+' (p.ej. ventas+tendencias)"}
+
+
 @app.post("/upload")
 async def upload_file(
-    file: UploadFile = File(...),
-    modo: str = "completo"
+    request: Request,
+    modo: str = "completo",
+    stream: Optional[bool] = None,
+    compact: Optional[bool] = None,
+    sheets: Optional[str] = None,
+    timeout_min: Optional[float] = None
 ):
     """
-    Sube un archivo y ejecuta análisis
+    Sube un archivo (multipart, campo `file`) y ejecuta análisis
     
-    Modos: ventas, rentabilidad, auditoria, completo
+    Modos: completo, reporte, un analizador (ventas, rentabilidad, auditoria,
+    clientes, tendencias) o varios unidos con '+' (ver GET /modos)
+    stream: fuerza (o desactiva) el análisis por chunks; por defecto
+    se activa para archivos mayores a MVN_STREAMING_MB
+    compact: representación compacta en memoria (por defecto MVN_COMPACT)
+    sheets: hojas de un Excel ("Norte,Sur", "2" o "*" para todas; por defecto la primera)
+    timeout_min: plazo del job en minutos (por defecto MVN_JOB_TIMEOUT_MIN; 0 = sin plazo)
     """
+    check_mode(modo)
+    timeout_s = timeout_seconds(timeout_min)
+    if executor.is_full():
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiados análisis en curso, reintentar más tarde",
+            headers={"Retry-After": "30"}
+        )
+    
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+    
     job_id = str(uuid.uuid4())[:8]
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    logger.info(f"[JOB-{job_id}] Archivo recibido: {file.filename} | Modo: {modo}")
-    
     # Crear directorios
     os.makedirs(f"uploads/{job_id}", exist_ok=True)
     os.makedirs(f"results/{job_id}", exist_ok=True)
     
     try:
-        # Guardar archivo
-        file_path = f"uploads/{job_id}/{file.filename}"
-        content = await file.read()
+        # Guardar archivo mientras llega (con hash y límite de tamaño)
+        inicio = time.perf_counter()
+        upload = (await receive_uploads(
+            request, "file", lambda num, nombre: f"uploads/{job_id}/{Path(nombre or 'upload').name}",
+            max_archivos=1
+        ))[0]
+        metrics.observe_stage("upload", time.perf_counter() - inicio, upload["formato"], modo)
+        file_path = upload["path"]
+        filename = upload["filename"]
         
-        with open(file_path, "wb") as f:
-            f.write(content)
+        logger.info(f"[JOB-{job_id}] Archivo recibido: {filename} | Modo: {modo}")
+        logger.info(f"[JOB-{job_id}] Archivo guardado: {upload['bytes']} bytes | sha256 {upload['sha256'][:12]} | {upload['formato']}")
         
-        logger.info(f"[JOB-{job_id}] Archivo guardado: {len(content)} bytes")
+        sheets = (sheets or "").strip() or None
+        if sheets and upload["formato"] == "excel":
+            # Las hojas elegidas son parte del contenido: otra selección es otro dataset y otra entrada de caché
+            upload["sha256"] = hashlib.sha256(f"{upload['sha256']}:{sheets}".encode()).hexdigest()
+        else:
+            sheets = None
+        compact = COMPACT_DEFAULT if compact is None else compact
+        if compact:
+            # Lo mismo con el modo compacto: el dataset guardado y la memoria del resultado son otros
+            # ('[' no puede estar en el nombre de una hoja)
+            upload["sha256"] = hashlib.sha256(f"{upload['sha256']}:[compact]".encode()).hexdigest()
         
-        # Registrar job
-        system_state["active_jobs"][job_id] = {
-            "status": "processing",
-            "file": file.filename,
+        dataset_id = upload["sha256"][:16]
+        if dataset_store.exists(dataset_id) and dataset_store.info(dataset_id).get("appends"):
+            # El dataset de este archivo ya tiene deltas agregados: no se reutiliza ni se pisa
+            dataset_id = None
+        job = {
+            "file": filename,
             "modo": modo,
             "created_at": timestamp,
-            "progress": 0
+            "bytes": upload["bytes"],
+            "sha256": upload["sha256"],
+            "formato": upload["formato"],
+            "dataset_id": dataset_id,
+            "sheets": sheets,
+            "compact": compact
         }
         
-        # Ejecutar análisis en background
-        asyncio.create_task(run_analysis(job_id, file_path, modo))
+        # Mismo archivo y modo ya analizados: devolver el resultado existente
+        cached = result_cache.get(upload["sha256"], modo)
+        if cached is not None:
+            remove_job_files(job_id)
+            return register_cached_job(job_id, job, cached)
+        
+        # Registrar job
+        job_store.create(job_id, dict(job, status="queued", progress=0))
+        
+        # Ejecutar análisis en el pool de procesos (sin re-parsear si el dataset ya existe)
+        if dataset_id and is_dataset_current(dataset_id):
+            logger.info(f"[JOB-{job_id}] Dataset {dataset_id} ya parseado, se reutiliza")
+            future = executor.submit(run_dataset_pipeline, job_id, dataset_id, modo, stream, timeout_s=timeout_s)
+        else:
+            dataset_meta = {
+                "sha256": upload["sha256"],
+                "source_file": filename,
+                "formato": upload["formato"],
+                "bytes": upload["bytes"],
+                "sheets": sheets,
+                "parser_fingerprint": parser_fingerprint()
+            }
+            future = executor.submit(
+                run_pipeline, job_id, file_path, modo, stream, upload["formato"], dataset_id, dataset_meta,
+                compact, sheets, timeout_s=timeout_s
+            )
+        asyncio.create_task(run_analysis(job_id, future))
         
         return {
             "job_id": job_id,
             "status": "queued",
             "message": f"Análisis '{modo}' iniciado",
+            "dataset_id": dataset_id,
             "check_status_url": f"/status/{job_id}",
             "get_results_url": f"/results/{job_id}"
         }
         
+    except UploadTooLargeError as e:
+        logger.warning(f"[JOB-{job_id}] {e}")
+        remove_job_files(job_id)
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    except UploadError as e:
+        remove_job_files(job_id)
+        raise HTTPException(status_code=400, detail=str(e))
+        
+    except QueueFullError as e:
+        job_store.delete(job_id)
+        remove_job_files(job_id)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+        
     except Exception as e:
         logger.error(f"[JOB-{job_id}] Error: {e}")
         system_state["failed_analyses"] += 1
@@ -159,78 +335,547 @@ async def upload_file(
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
-async def run_analysis(job_id: str, file_path: str, modo: str):
-    """Ejecuta pipeline de análisis"""
-    job = system_state["active_jobs"][job_id]
+def register_cached_job(job_id: str, job: dict, cached: dict) -> dict:
+    """Registra un job completado que reutiliza un resultado de la caché"""
+    job_store.create(job_id, dict(
+        job,
+        status="completed",
+        progress=100,
+        result_path=cached["result_path"],
+        cache_hit=True,
+        cached_from=cached["job_id"]
+    ))
+    metrics.record_job("cache_hit", job.get("formato"), job["modo"])
+    logger.info(f"[JOB-{job_id}] Cache hit → resultados de {cached['job_id']}")
+    return {
+        "job_id": job_id,
+        "status": "completed",
+        "message": f"Análisis '{job['modo']}' ya disponible (caché)",
+        "dataset_id": job.get("dataset_id"),
+        "check_status_url": f"/status/{job_id}",
+        "get_results_url": f"/results/{job_id}"
+    }
+
+
+def is_dataset_current(dataset_id: str) -> bool:
+    """El dataset existe y fue generado por la versión actual del parser"""
+    if not dataset_store.exists(dataset_id):
+        return False
+    return dataset_store.info(dataset_id).get("parser_fingerprint") == parser_fingerprint()
+
+
+def remove_job_files(job_id: str, upload_path: Optional[str] = None):
+    """
+    Borra los directorios de upload y resultados de un job. Un archivo de
+    un batch no tiene carpeta propia en uploads/: se borra su `upload_path`.
+    """
+    if upload_path:
+        try:
+            os.remove(upload_path)
+        except FileNotFoundError:
+            pass
+    else:
+        shutil.rmtree(f"uploads/{job_id}", ignore_errors=True)
+    shutil.rmtree(f"results/{job_id}", ignore_errors=True)
+
+
+def is_stopped(job_id: str) -> bool:
+    return (job_store.get(job_id) or {}).get("status") in STOPPED_STATES
+
+
+def stop_job(job_id: str, status: str, error: str) -> bool:
+    """
+    Deja el job en `status` (cancelled / timed_out) y borra sus archivos.
+    No toca un job que ya terminó; devuelve True si lo detuvo.
+    """
+    upload_path = (job_store.get(job_id) or {}).get("upload_path")
+    detenido = job_store.update(job_id, {"status": status, "error": error}, progress=True) is not None
+    remove_job_files(job_id, upload_path)
+    if detenido:
+        logger.warning(f"[JOB-{job_id}] ⏹ {status}: {error}")
+    return detenido
+
+
+async def run_analysis(job_id: str, future: asyncio.Future):
+    """Espera el resultado del pipeline en el pool y actualiza el job"""
+    job = job_store.get(job_id)
     
     try:
         system_state["total_analyses"] += 1
+        campos = await executor.wait(job_id, future)
+        metricas = campos.pop("metricas", None)
+        # progress=True: no pisa un job que se canceló mientras terminaba
+        actualizado = job_store.update(job_id, campos, progress=True)
+        if actualizado is None and is_stopped(job_id):
+            raise JobCancelled("cancelled", "Job cancelado")
+        job = actualizado or dict(job, **campos)
+        metrics.record_job("completed", job.get("formato"), job["modo"], metricas)
+        if job.get("sha256"):
+            result_cache.put(job["sha256"], job["modo"], job_id, job["result_path"])
+    
+    except JobCancelled as e:
+        stop_job(job_id, e.status, str(e))
+        metrics.record_job(e.status, job.get("formato"), job["modo"])
         
-        # Paso 1: Pre-parsing
-        job["progress"] = 20
-        logger.info(f"[JOB-{job_id}] Pre-parsing...")
-        
-        parser = PreParser()
-        parsed_data = parser.parse(file_path)
-        
-        if parsed_data.get('status') == 'error':
-            raise Exception(f"Parse error: {parsed_data.get('error')}")
-        
-        # Paso 2: Validación
-        job["progress"] = 40
-        logger.info(f"[JOB-{job_id}] Validando datos...")
-        
-        validator = DataValidator()
-        validation = validator.validate(parsed_data.get('data'))
-        
-        # Paso 3: Análisis según modo
-        job["progress"] = 60
-        results = {}
-        
-        if modo in ["ventas", "completo"]:
-            logger.info(f"[JOB-{job_id}] Analizando ventas...")
-            analyzer = AnalizadorVentas()
-            results["ventas"] = analyzer.analyze(parsed_data)
-        
-        if modo in ["rentabilidad", "completo"]:
-            logger.info(f"[JOB-{job_id}] Analizando rentabilidad...")
-            analyzer = AnalizadorRentabilidad()
-            results["rentabilidad"] = analyzer.analyze(parsed_data)
-        
-        if modo in ["auditoria", "completo"]:
-            logger.info(f"[JOB-{job_id}] Ejecutando auditoría...")
-            analyzer = AnalizadorAuditoria()
-            results["auditoria"] = analyzer.analyze(parsed_data)
-        
-        # Agregar validación
-        results["validation"] = validation
+    except Exception as e:
+        job_store.update(job_id, {"status": "failed", "error": str(e)})
+        system_state["failed_analyses"] += 1
+        metrics.record_job("failed", job.get("formato"), job["modo"])
         
-        # Guardar resultados
-        job["progress"] = 90
-        result_path = f"results/{job_id}/analysis_result.json"
+        logger.error(f"[JOB-{job_id}] ❌ Error: {e}")
+        logger.error(traceback.format_exc())
+    
+    finally:
+        clear_cancel(job_id)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancela un job (o un batch con todos sus archivos) en espera o en curso
+    
+    Un job en la cola no llega a correr; uno en curso se corta en el próximo
+    punto de control (entre etapas o entre chunks) y libera su worker. El
+    upload y los resultados parciales se borran en el momento.
+    """
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job["status"] in FINAL_STATES:
+        raise HTTPException(status_code=409, detail=f"El job ya terminó ({job['status']})")
+    
+    # Primero el estado: el progreso que siga llegando del worker ya no lo pisa
+    stop_job(job_id, "cancelled", "Cancelado por el usuario")
+    miembros = job.get("miembros", []) if job.get("tipo") == "batch" else [job_id]
+    for miembro in miembros:
+        if miembro == job_id or stop_job(miembro, "cancelled", "Cancelado por el usuario"):
+            executor.cancel(miembro)
+    
+    return {"job_id": job_id, "status": "cancelled"}
+
+
+@app.post("/batch")
+async def upload_batch(
+    request: Request,
+    modo: str = "completo",
+    compact: Optional[bool] = None,
+    timeout_min: Optional[float] = None
+):
+    """
+    Sube varios archivos (o un ZIP; multipart, campo `files`) y los analiza en paralelo
+    
+    Cada archivo es un job propio; al terminar todos se combina un
+    reporte consolidado. Si un archivo no trae columna de sucursal, se
+    usa el nombre del archivo como sucursal. `timeout_min` es el plazo de
+    cada archivo desde que entra al pool.
+    """
+    check_mode(modo)
+    timeout_s = timeout_seconds(timeout_min)
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Archivos demasiado grandes")
+    
+    batch_id = str(uuid.uuid4())[:8]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs(f"uploads/{batch_id}", exist_ok=True)
+    os.makedirs(f"results/{batch_id}", exist_ok=True)
+    
+    try:
+        uploads = await receive_uploads(
+            request, "files",
+            lambda num, nombre: f"uploads/{batch_id}/{num:03d}_{Path(nombre or f'archivo_{num}').name}",
+            max_archivos=BATCH_MAX_FILES
+        )
+        logger.info(f"[BATCH-{batch_id}] {len(uploads)} archivos recibidos | Modo: {modo}")
+        archivos = []
+        for num, upload in enumerate(uploads):
+            nombre = Path(upload["filename"] or f"archivo_{num}").name
+            file_path = upload["path"]
+            if await asyncio.to_thread(is_zip_archive, file_path):
+                destino = f"uploads/{batch_id}/{num:03d}_{Path(nombre).stem}"
+                archivos.extend(await asyncio.to_thread(extract_zip, file_path, destino, MAX_UPLOAD_BYTES))
+                os.remove(file_path)
+            elif nombre.lower().endswith(".zip"):
+                raise BatchError(f"ZIP inválido: {nombre}")
+            else:
+                archivos.append((nombre, file_path))
         
-        with open(result_path, "w") as f:
-            json.dump(results, f, indent=2, default=str)
+        if not archivos:
+            raise BatchError("El batch no tiene archivos para analizar")
+        if len(archivos) > BATCH_MAX_FILES:
+            raise BatchError(f"El batch tiene más de {BATCH_MAX_FILES} archivos")
         
-        job["status"] = "completed"
-        job["progress"] = 100
-        job["result_path"] = result_path
+    except UploadTooLargeError as e:
+        remove_job_files(batch_id)
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    except (BatchError, UploadError) as e:
+        remove_job_files(batch_id)
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    miembros = []
+    for num, (nombre, file_path) in enumerate(archivos):
+        member_id = f"{batch_id}-{num:03d}"
+        os.makedirs(f"results/{member_id}", exist_ok=True)
+        miembro = {
+            "job_id": member_id,
+            "file": nombre,
+            "path": file_path,
+            "modo": modo,
+            "created_at": timestamp,
+            "bytes": os.path.getsize(file_path),
+            "formato": sniff_file(file_path),
+            "batch_id": batch_id
+        }
+        job_store.create(member_id, dict(
+            {k: v for k, v in miembro.items() if k != "path"}, upload_path=file_path, status="queued", progress=0
+        ))
+        miembros.append(miembro)
+    
+    job_store.create(batch_id, {
+        "file": [m["file"] for m in miembros],
+        "modo": modo,
+        "created_at": timestamp,
+        "tipo": "batch",
+        "miembros": [m["job_id"] for m in miembros],
+        "status": "queued",
+        "progress": 0
+    })
+    asyncio.create_task(run_batch(batch_id, miembros, modo, compact, timeout_s))
+    
+    return {
+        "batch_id": batch_id,
+        "status": "queued",
+        "message": f"Análisis '{modo}' de {len(miembros)} archivos iniciado",
+        "miembros": [{"job_id": m["job_id"], "file": m["file"]} for m in miembros],
+        "check_status_url": f"/batch/{batch_id}",
+        "get_results_url": f"/results/{batch_id}"
+    }
+
+
+async def run_batch(batch_id: str, miembros: List[dict], modo: str, compact: Optional[bool],
+                    timeout_s: Optional[float] = None):
+    """Analiza los archivos en el pool (a lo sumo uno por worker) y consolida"""
+    lugares = asyncio.Semaphore(executor.max_workers)
+    terminados = 0
+    job_store.update(batch_id, {"status": "processing"}, progress=True)
+    
+    async def analizar(miembro: dict):
+        nonlocal terminados
+        async with lugares:
+            job_id = miembro["job_id"]
+            try:
+                if is_stopped(job_id):
+                    # Cancelado mientras esperaba su turno
+                    raise JobCancelled("cancelled", "Cancelado por el usuario")
+                system_state["total_analyses"] += 1
+                future = await submit_when_ready(
+                    run_batch_member, job_id, miembro["path"], modo, miembro["formato"],
+                    Path(miembro["file"]).stem, compact, timeout_s=timeout_s
+                )
+                campos = await executor.wait(job_id, future)
+                estados = campos.pop("estados")
+                metricas = campos.pop("metricas", None)
+                miembro["filas"] = campos.pop("filas", None)
+                if job_store.update(job_id, campos, progress=True) is None and is_stopped(job_id):
+                    raise JobCancelled("cancelled", "Cancelado por el usuario")
+                metrics.record_job("completed", miembro["formato"], modo, metricas)
+            except JobCancelled as e:
+                estados = None
+                miembro["status"], miembro["error"] = e.status, str(e)
+                stop_job(job_id, e.status, str(e))
+                metrics.record_job(e.status, miembro["formato"], modo)
+            except Exception as e:
+                estados = None
+                miembro["error"] = str(e)
+                job_store.update(job_id, {"status": "failed", "error": str(e)})
+                system_state["failed_analyses"] += 1
+                metrics.record_job("failed", miembro["formato"], modo)
+                logger.error(f"[JOB-{job_id}] ❌ Error: {e}")
+            finally:
+                clear_cancel(job_id)
+            terminados += 1
+            job_store.update(batch_id, {"progress": int(terminados / len(miembros) * 90)}, progress=True)
+            return estados
+    
+    try:
+        estados = await asyncio.gather(*[analizar(m) for m in miembros])
+        if is_stopped(batch_id):
+            remove_job_files(batch_id)
+            logger.warning(f"[BATCH-{batch_id}] ⏹ Cancelado")
+            return
+        if all(e is None for e in estados):
+            raise Exception("Todos los archivos del batch fallaron")
         
-        logger.info(f"[JOB-{job_id}] ✅ Completado")
+        result_path = f"results/{batch_id}/analysis_result.json"
+        results = await asyncio.to_thread(consolidate, modo, miembros, estados)
+        await asyncio.to_thread(write_results, result_path, results)
+        job_store.update(batch_id, {"status": "completed", "progress": 100, "result_path": result_path})
+        logger.info(f"[BATCH-{batch_id}] ✅ Consolidado de {len(miembros)} archivos")
         
     except Exception as e:
-        job["status"] = "failed"
-        job["error"] = str(e)
-        system_state["failed_analyses"] += 1
-        
-        logger.error(f"[JOB-{job_id}] ❌ Error: {e}")
+        job_store.update(batch_id, {"status": "failed", "error": str(e)})
+        logger.error(f"[BATCH-{batch_id}] ❌ Error: {e}")
         logger.error(traceback.format_exc())
 
 
+async def submit_when_ready(fn, *args, **kwargs) -> asyncio.Future:
+    """Encola en el pool, esperando si la cola está llena"""
+    while True:
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except QueueFullError:
+            await asyncio.sleep(0.5)
+
+
+@app.get("/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """Estado de un batch y de cada uno de sus archivos"""
+    batch = job_store.get(batch_id)
+    if not batch or batch.get("tipo") != "batch":
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    
+    miembros = []
+    for job_id in batch["miembros"]:
+        job = job_store.get(job_id) or {}
+        miembros.append({
+            "job_id": job_id,
+            "file": job.get("file"),
+            "status": job.get("status", "expired"),
+            "progress": job.get("progress", 0),
+            "error": job.get("error")
+        })
+    return {
+        "batch_id": batch_id,
+        "status": batch["status"],
+        "progress": batch.get("progress", 0),
+        "modo": batch["modo"],
+        "error": batch.get("error"),
+        "miembros": miembros
+    }
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hits, misses y tamaño de la caché de resultados"""
+    return result_cache.stats()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Latencias por etapa, contadores y estado de la cola (formato Prometheus)"""
+    return PlainTextResponse(
+        metrics.render(in_flight=executor.in_flight, queued=executor.queued),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/datasets")
+async def list_datasets():
+    """Datasets ya parseados disponibles para re-análisis"""
+    return {"datasets": dataset_store.list()}
+
+
+@app.get("/datasets/{dataset_id}")
+async def get_dataset(dataset_id: str):
+    """Metadatos de un dataset (columnas, filas, partes, origen)"""
+    try:
+        return dataset_store.info(dataset_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+
+
+@app.post("/datasets/{dataset_id}/analyze")
+async def analyze_dataset(dataset_id: str, modo: str = "completo", stream: Optional[bool] = None,
+                          timeout_min: Optional[float] = None):
+    """
+    Analiza un dataset ya parseado sin volver a subir el archivo
+    
+    Modos: los de /upload (ver GET /modos)
+    """
+    check_mode(modo)
+    timeout_s = timeout_seconds(timeout_min)
+    try:
+        info = dataset_store.info(dataset_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+    
+    job_id = str(uuid.uuid4())[:8]
+    job = {
+        "file": info.get("source_file"),
+        "modo": modo,
+        "created_at": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "bytes": info.get("bytes"),
+        "sha256": info.get("sha256"),
+        "formato": info.get("formato"),
+        "dataset_id": dataset_id
+    }
+    logger.info(f"[JOB-{job_id}] Re-análisis del dataset {dataset_id} | Modo: {modo}")
+    
+    cached = result_cache.get(info["sha256"], modo) if info.get("sha256") else None
+    if cached is not None:
+        return register_cached_job(job_id, job, cached)
+    
+    os.makedirs(f"results/{job_id}", exist_ok=True)
+    job_store.create(job_id, dict(job, status="queued", progress=0))
+    try:
+        future = executor.submit(run_dataset_pipeline, job_id, dataset_id, modo, stream, timeout_s=timeout_s)
+    except QueueFullError as e:
+        job_store.delete(job_id)
+        remove_job_files(job_id)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    asyncio.create_task(run_analysis(job_id, future))
+    
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "message": f"Análisis '{modo}' del dataset {dataset_id} iniciado",
+        "dataset_id": dataset_id,
+        "check_status_url": f"/status/{job_id}",
+        "get_results_url": f"/results/{job_id}"
+    }
+
+
+@app.post("/datasets/{dataset_id}/append")
+async def append_dataset(
+    dataset_id: str,
+    request: Request,
+    modo: str = "completo",
+    timeout_min: Optional[float] = None
+):
+    """
+    Agrega un archivo delta (p.ej. las ventas de hoy; multipart, campo `file`) a un dataset
+    
+    El delta se parsea y valida solo; sus agregados se combinan con los
+    guardados del dataset, así que el costo depende del delta y no del
+    historial. El resultado es el del dataset completo más la sección 'delta'.
+    """
+    check_mode(modo)
+    timeout_s = timeout_seconds(timeout_min)
+    if not dataset_store.exists(dataset_id):
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+    if executor.is_full():
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiados análisis en curso, reintentar más tarde",
+            headers={"Retry-After": "30"}
+        )
+    
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+    
+    job_id = str(uuid.uuid4())[:8]
+    os.makedirs(f"uploads/{job_id}", exist_ok=True)
+    os.makedirs(f"results/{job_id}", exist_ok=True)
+    
+    try:
+        upload = (await receive_uploads(
+            request, "file", lambda num, nombre: f"uploads/{job_id}/{Path(nombre or 'delta').name}",
+            max_archivos=1
+        ))[0]
+    except UploadTooLargeError as e:
+        remove_job_files(job_id)
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        remove_job_files(job_id)
+        raise HTTPException(status_code=400, detail=str(e))
+    file_path = upload["path"]
+    logger.info(f"[JOB-{job_id}] Delta {upload['filename']} para el dataset {dataset_id} | Modo: {modo}")
+    
+    job = {
+        "file": upload["filename"],
+        "modo": modo,
+        "created_at": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "bytes": upload["bytes"],
+        "formato": upload["formato"],
+        "dataset_id": dataset_id,
+        "tipo": "append"
+    }
+    delta = {
+        "sha256": upload["sha256"],
+        "source_file": upload["filename"],
+        "formato": upload["formato"],
+        "bytes": upload["bytes"]
+    }
+    job_store.create(job_id, dict(job, status="queued", progress=0))
+    try:
+        future = executor.submit(
+            run_append_pipeline, job_id, dataset_id, file_path, modo, upload["formato"], delta,
+            timeout_s=timeout_s
+        )
+    except QueueFullError as e:
+        job_store.delete(job_id)
+        remove_job_files(job_id)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    asyncio.create_task(run_analysis(job_id, future))
+    
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "message": f"Delta agregado al dataset {dataset_id}, análisis '{modo}' iniciado",
+        "dataset_id": dataset_id,
+        "check_status_url": f"/status/{job_id}",
+        "get_results_url": f"/results/{job_id}"
+    }
+
+
+# Los endpoints de layouts son síncronos: el registro lee y escribe un JSON
+# con un lock de archivo (puede esperar), así que corren en el threadpool
+
+@app.get("/layouts")
+def list_layouts():
+    """Layouts de encabezado conocidos (mapeo, tipos, dialecto, limpieza) y alias de columnas"""
+    return {"layouts": layout_registry.list(), "aliases": layout_registry.aliases()}
+
+
+@app.get("/layouts/{firma}")
+def get_layout(firma: str):
+    """Un layout por la firma de su encabezado (ver `layout` en los resultados)"""
+    layout = layout_registry.get(firma)
+    if layout is None:
+        raise HTTPException(status_code=404, detail=f"Layout {firma} not found")
+    return layout
+
+
+@app.delete("/layouts/{firma}")
+def delete_layout(firma: str):
+    """Olvida un layout: el próximo archivo con ese encabezado se resuelve de nuevo"""
+    if not layout_registry.delete(firma):
+        raise HTTPException(status_code=404, detail=f"Layout {firma} not found")
+    return {"firma": firma, "deleted": True}
+
+
+@app.post("/layouts/aliases")
+def add_column_alias(nombre: str, columna: str):
+    """
+    Lee la columna `nombre` (sin mayúsculas ni acentos) como la columna estándar `columna`
+    
+    Columnas: producto, precio_venta, cantidad, costo, sucursal, cliente, fecha, hora
+    """
+    if columna not in PreParser.STANDARD_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Columna '{columna}' no es estándar: {', '.join(PreParser.STANDARD_COLUMNS)}"
+        )
+    try:
+        return {"alias": layout_registry.add_alias(nombre, columna)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.delete("/layouts/aliases/{nombre}")
+def delete_column_alias(nombre: str):
+    """Quita un alias de columna"""
+    if not layout_registry.remove_alias(nombre):
+        raise HTTPException(status_code=404, detail=f"Alias {nombre} not found")
+    return {"alias": nombre, "deleted": True}
+
+
 @app.get("/status/{job_id}")
 async def get_status(job_id: str):
     """Obtener estado de un análisis"""
-    job = system_state["active_jobs"].get(job_id)
+    job = job_store.get(job_id)
     
     if not job:
         raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
@@ -240,42 +885,79 @@ async def get_status(job_id: str):
         "status": job["status"],
         "progress": job.get("progress", 0),
         "file": job["file"],
-        "modo": job["modo"]
+        "modo": job["modo"],
+        "cache_hit": job.get("cache_hit", False),
+        "dataset_id": job.get("dataset_id")
     }
 
 
 @app.get("/results/{job_id}")
-async def get_results(job_id: str):
-    """Obtener resultados de un análisis"""
-    job = system_state["active_jobs"].get(job_id)
+async def get_results(job_id: str, request: Request, section: Optional[str] = None):
+    """Obtener resultados de un análisis (o una sola sección con ?section=ventas)"""
+    job = job_store.get(job_id)
     
     if not job:
         raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
     
+    if job["status"] in STOPPED_STATES:
+        # Sus archivos ya se borraron
+        raise HTTPException(status_code=410, detail=f"Analysis {job['status']}: {job.get('error', '')}")
+    
     if job["status"] != "completed":
         raise HTTPException(
             status_code=202,
             detail=f"Analysis still {job['status']}"
         )
     
-    result_path = job.get("result_path")
-    if not result_path or not os.path.exists(result_path):
-        raise HTTPException(status_code=500, detail="Results not found")
-    
-    return FileResponse(result_path, media_type="application/json")
+    return await result_response(request, job, section)
 
 
 @app.get("/results/{job_id}/json")
-async def get_results_json(job_id: str):
-    """Obtener resultados como JSON"""
-    job = system_state["active_jobs"].get(job_id)
+async def get_results_json(job_id: str, request: Request, section: Optional[str] = None):
+    """Obtener resultados como JSON (o una sola sección con ?section=ventas)"""
+    job = job_store.get(job_id)
     
     if not job or job["status"] != "completed":
         raise HTTPException(status_code=404, detail="Results not ready")
     
+    return await result_response(request, job, section)
+
+
+# Reintentos de lectura de un resultado que se está reescribiendo
+RESULT_READ_RETRIES = 5
+
+
+async def result_response(request: Request, job: dict, section: Optional[str]) -> Response:
+    """Bytes ya serializados del resultado, con ETag y gzip/deflate según el cliente"""
     result_path = job.get("result_path")
-    with open(result_path, "r") as f:
-        return json.load(f)
+    if not result_path:
+        raise HTTPException(status_code=500, detail="Results not found")
+    if not os.path.exists(result_path):
+        # Un hit de caché cuyo job de origen expiró y salió de la caché
+        raise HTTPException(status_code=410, detail="Results expired")
+    
+    # Índice, lectura y (en resultados viejos) compresión fuera del event loop.
+    # Si el resultado se reescribe entre el índice y la lectura, se vuelve a ubicar
+    for _ in range(RESULT_READ_RETRIES):
+        try:
+            ubicacion = await run_in_threadpool(locate, result_path, section)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e.args[0]))
+        
+        headers = {"ETag": f'W/"{ubicacion["etag"]}"', "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), ubicacion["etag"]):
+            return Response(status_code=304, headers=headers)
+        
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        try:
+            cuerpo = await run_in_threadpool(read_body, ubicacion, encoding)
+        except ResultChanged:
+            await asyncio.sleep(0.05)
+            continue
+        return Response(cuerpo, media_type="application/json", headers=headers)
+    raise HTTPException(status_code=503, detail="Results being rewritten, retry", headers={"Retry-After": "1"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+"""
+Métricas - Contadores, gauges e histogramas en formato de texto Prometheus
+Sin dependencias: los workers devuelven los tiempos por etapa junto con el
+resultado del job y el proceso de la API los acumula y los expone en /metrics.
+"""
+
+import math
+import threading
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger('MVN-API')
+
+# Segundos; los parse de archivos grandes pueden tardar minutos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(nombres: Tuple[str, ...], valores: Tuple, extra: str = '') -> str:
+    pares = [f'{n}="{_escape(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _number(valor: float) -> str:
+    if valor == math.inf:
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metric:
+    tipo = ''
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(n, '')) for n in self.labels)
+
+    def render(self) -> str:
+        lineas = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.tipo}']
+        with self._lock:
+            for clave, valor in sorted(self._values.items()):
+                lineas.extend(self._samples(clave, valor))
+        return '\n'.join(lineas)
+
+    def _samples(self, clave: Tuple, valor) -> Iterable[str]:
+        yield f'{self.name}{_labels(self.labels, clave)} {_number(valor)}'
+
+
+class Counter(_Metric):
+    tipo = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        clave = self._key(labels)
+        with self._lock:
+            self._values[clave] = self._values.get(clave, 0) + amount
+
+
+class Gauge(_Metric):
+    tipo = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    tipo = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        clave = self._key(labels)
+        with self._lock:
+            serie = self._values.get(clave)
+            if serie is None:
+                serie = self._values[clave] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, limite in enumerate(self.buckets):
+                if value <= limite:
+                    serie['buckets'][i] += 1
+            serie['sum'] += value
+            serie['count'] += 1
+
+    def _samples(self, clave: Tuple, serie: Dict) -> Iterable[str]:
+        for limite, n in zip(self.buckets, serie['buckets']):
+            le = f'le="{_number(limite)}"'
+            yield f'{self.name}_bucket{_labels(self.labels, clave, le)} {n}'
+        yield f'{self.name}_sum{_labels(self.labels, clave)} {_number(serie["sum"])}'
+        yield f'{self.name}_count{_labels(self.labels, clave)} {serie["count"]}'
+
+
+class Metrics:
+    """
+    Métricas del servicio MVN.
+
+    Etapas: upload, parse, persist, validation, cada analizador y serialize,
+    etiquetadas por formato y modo. Los tiempos de las etapas que corren en
+    el pool llegan en `metricas` (ver api.pipeline) al terminar cada job.
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            'mvn_stage_duration_seconds', 'Duración de cada etapa del pipeline',
+            ('stage', 'formato', 'modo'))
+        self.job_seconds = Histogram(
+            'mvn_job_duration_seconds', 'Duración total de los jobs en el pool',
+            ('formato', 'modo'))
+        self.jobs = Counter('mvn_jobs_total', 'Jobs terminados por estado', ('status', 'formato', 'modo'))
+        self.bytes = Counter('mvn_bytes_processed_total', 'Bytes de archivos parseados', ('formato',))
+        self.rows = Counter('mvn_rows_processed_total', 'Filas analizadas', ('formato', 'modo'))
+        self.in_flight = Gauge('mvn_jobs_in_flight', 'Jobs corriendo o en cola en el pool')
+        self.queued = Gauge('mvn_jobs_queued', 'Jobs esperando un worker libre')
+
+    def observe_stage(self, stage: str, segundos: float, formato: Optional[str], modo: str):
+        self.stage_seconds.observe(segundos, stage=stage, formato=formato or 'desconocido', modo=modo)
+
+    def record_job(self, status: str, formato: Optional[str], modo: str, metricas: Optional[Dict] = None):
+        """Registra un job terminado y los tiempos por etapa que devolvió el worker"""
+        formato = formato or 'desconocido'
+        self.jobs.inc(status=status, formato=formato, modo=modo)
+        if not metricas:
+            return
+        for stage, segundos in metricas.get('etapas', {}).items():
+            self.observe_stage(stage, segundos, formato, modo)
+        if metricas.get('segundos') is not None:
+            self.job_seconds.observe(metricas['segundos'], formato=formato, modo=modo)
+        if metricas.get('bytes'):
+            self.bytes.inc(metricas['bytes'], formato=formato)
+        if metricas.get('filas'):
+            self.rows.inc(metricas['filas'], formato=formato, modo=modo)
+
+    def render(self, in_flight: int = 0, queued: int = 0) -> str:
+        """Texto para /metrics (formato de exposición Prometheus 0.0.4)"""
+        self.in_flight.set(in_flight)
+        self.queued.set(queued)
+        return '\n'.join(m.render() for m in (
+            self.stage_seconds, self.job_seconds, self.jobs, self.bytes,
+            self.rows, self.in_flight, self.queued
+        )) + '\n'
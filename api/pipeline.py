@@ -0,0 +1,342 @@
+"""
+Pipeline de análisis - parse → validación → análisis → resultados
+Se ejecuta dentro de un worker del JobExecutor (función síncrona y picklable).
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+import pandas as pd
+
+from core.pre_parser import PreParser
+from core.data_validator import DataValidator
+from core.marco_analisis import MarcoAnalisis
+from core.registro_analizadores import (
+    ANALIZADORES, register_dependent, register_mode, resolve_mode, run_dependents
+)
+from core.streaming import analyze_chunks, fold_chunks, finalize_states, merge_states, run_analyzers
+from core.dataset_store import DatasetStore
+from api.job_executor import report_progress, check_cancelled
+from api.report_generator import ReportGenerator
+from api.result_files import write_results
+from api.result_cache import analyzer_fingerprint
+
+logger = logging.getLogger('MVN-API')
+
+# Streaming: archivos mayores a este tamaño se analizan por chunks
+STREAMING_MB = float(os.environ.get("MVN_STREAMING_MB", 256))
+CHUNK_ROWS = int(os.environ.get("MVN_CHUNK_ROWS", 100_000))
+
+# Guardar el dataset normalizado para re-analizarlo sin volver a parsear
+PERSIST_DATASETS = os.environ.get("MVN_PERSIST_DATASETS", "1") != "0"
+
+# Reporte ejecutivo: repite todas las secciones, así que va en un modo aparte
+register_dependent('reporte', lambda resultados: ReportGenerator().generate(resultados),
+                   usa=('triple_validacion', 'confianza'))
+register_mode('reporte', tuple(ANALIZADORES) + ('reporte',))
+
+
+def build_analyzers(modo: str, validation: bool = False) -> Dict:
+    """Analizadores de datos del modo (en el orden del resultado)"""
+    datos, _ = resolve_mode(modo)
+    analizadores = {nombre: ANALIZADORES[nombre]() for nombre in datos}
+    if validation:
+        analizadores["validation"] = DataValidator()
+    return analizadores
+
+
+def run_pipeline(job_id: str, file_path: str, modo: str, stream: Optional[bool] = None,
+                 formato: Optional[str] = None, dataset_id: Optional[str] = None,
+                 dataset_meta: Optional[Dict] = None, compact: Optional[bool] = None,
+                 hojas: Optional[str] = None) -> Dict:
+    """Ejecuta el pipeline completo y devuelve los campos finales del job"""
+    report_progress(job_id, status="processing", progress=10)
+    store = DatasetStore() if (dataset_id and PERSIST_DATASETS) else None
+    parser = PreParser(compact=compact, hojas=hojas)
+    dataset_meta = dict(dataset_meta or {}, compact=parser.compact)
+    metricas = _new_metrics(bytes=os.path.getsize(file_path))
+
+    if stream is None:
+        stream = os.path.getsize(file_path) > STREAMING_MB * 1024 * 1024
+
+    if stream:
+        # Parse, validación y análisis en una sola pasada por chunks
+        report_progress(job_id, progress=20)
+        logger.info(f"[JOB-{job_id}] Analizando por chunks de {CHUNK_ROWS} filas...")
+
+        chunks = parser.iter_chunks(file_path, chunksize=CHUNK_ROWS, formato=formato)
+        chunks = _timed(_checkpoints(job_id, chunks), metricas, 'parse')
+        if store is not None:
+            chunks = _timed(store.tee(dataset_id, chunks, dataset_meta), metricas, 'persist', filas=False)
+        analizadores = build_analyzers(modo, validation=True)
+        estados, errores = fold_chunks(chunks, analizadores, metricas['etapas'])
+        if store is not None:
+            # Pedirle un chunk al tee incluye parsearlo
+            metricas['etapas']['persist'] -= metricas['etapas'].get('parse', 0.0)
+            if modo == "completo" and not errores:
+                # Estados de todos los analizadores: el primer append no re-pliega el dataset
+                store.save_state(dataset_id, (estados, errores), analyzer_fingerprint())
+        results = finalize_states(analizadores, estados, errores, metricas['etapas'])
+        results["memoria"] = parser.memory_report()
+        _report_parser(results, parser)
+        return save_results(job_id, results, streaming=True, dataset_id=dataset_id if store else None,
+                            metricas=metricas, modo=modo)
+
+    # Paso 1: Pre-parsing
+    report_progress(job_id, progress=20)
+    logger.info(f"[JOB-{job_id}] Pre-parsing...")
+
+    with _stage(metricas['etapas'], 'parse'):
+        parsed_data = parser.parse(file_path, formato)
+
+    if parsed_data.get('status') == 'error':
+        raise Exception(f"Parse error: {parsed_data.get('error')}")
+    metricas['filas'] = len(parsed_data['data'])
+    check_cancelled(job_id)
+
+    if store is not None:
+        with _stage(metricas['etapas'], 'persist'):
+            store.save(dataset_id, parsed_data['data'], dataset_meta)
+        check_cancelled(job_id)
+
+    results = analyze_parsed(job_id, parsed_data, modo, metricas['etapas'])
+    results["memoria"] = parser.memory_report()
+    _report_parser(results, parser)
+    return save_results(job_id, results, streaming=False, dataset_id=dataset_id if store else None,
+                        metricas=metricas, modo=modo)
+
+
+def run_dataset_pipeline(job_id: str, dataset_id: str, modo: str, stream: Optional[bool] = None) -> Dict:
+    """Analiza un dataset ya parseado (sin leer el archivo original)"""
+    report_progress(job_id, status="processing", progress=10)
+    store = DatasetStore()
+    info = store.info(dataset_id)
+    metricas = _new_metrics()
+
+    if stream is None:
+        stream = info['parts'] > 1
+
+    if stream:
+        report_progress(job_id, progress=20)
+        logger.info(f"[JOB-{job_id}] Analizando dataset {dataset_id} por partes...")
+        memoria = {'compact': info.get('compact', False), 'bytes_antes': 0}
+        partes = _measure(_timed(_checkpoints(job_id, store.iter_parts(dataset_id)), metricas, 'load'), memoria)
+        results = analyze_chunks(partes, build_analyzers(modo, validation=True), metricas['etapas'])
+        results["memoria"] = _memory_report(memoria)
+        return save_results(job_id, results, streaming=True, dataset_id=dataset_id, metricas=metricas, modo=modo)
+
+    report_progress(job_id, progress=20)
+    logger.info(f"[JOB-{job_id}] Cargando dataset {dataset_id}...")
+    with _stage(metricas['etapas'], 'load'):
+        df = store.load(dataset_id)
+    metricas['filas'] = len(df)
+    check_cancelled(job_id)
+    parsed_data = {
+        'data': df,
+        'format_detected': info.get('formato'),
+        'rows': len(df),
+        'columns': list(df.columns),
+        'status': 'success'
+    }
+    results = analyze_parsed(job_id, parsed_data, modo, metricas['etapas'])
+    results["memoria"] = _memory_report({
+        'compact': info.get('compact', False),
+        'bytes_antes': int(df.memory_usage(deep=True).sum())
+    })
+    return save_results(job_id, results, streaming=False, dataset_id=dataset_id, metricas=metricas, modo=modo)
+
+
+def run_append_pipeline(job_id: str, dataset_id: str, file_path: str, modo: str,
+                        formato: Optional[str] = None, delta: Optional[Dict] = None) -> Dict:
+    """
+    Agrega un archivo delta a un dataset y actualiza sus agregados.
+
+    El delta se parsea y se pliega solo (su validación va en la sección
+    'delta'), se guarda como partes nuevas del dataset y sus estados se
+    combinan con los guardados. Si no hay estados vigentes se pliega el
+    dataset una vez y quedan guardados para los siguientes appends.
+    """
+    report_progress(job_id, status="processing", progress=10)
+    store = DatasetStore()
+    parser = PreParser(compact=store.info(dataset_id).get('compact'))
+    metricas = _new_metrics(bytes=os.path.getsize(file_path))
+    analizadores = build_analyzers("completo", validation=True)
+    huella = analyzer_fingerprint()
+
+    with store.lock(dataset_id):
+        with _stage(metricas['etapas'], 'load'):
+            base = store.load_state(dataset_id, huella)
+        if base is None:
+            logger.info(f"[JOB-{job_id}] Sin estados guardados para {dataset_id}, plegando el dataset...")
+            partes = _timed(_checkpoints(job_id, store.iter_parts(dataset_id)), metricas, 'load', filas=False)
+            base = fold_chunks(partes, analizadores)
+
+        report_progress(job_id, progress=40)
+        chunks = parser.iter_chunks(file_path, chunksize=CHUNK_ROWS, formato=formato)
+        chunks = _timed(_checkpoints(job_id, chunks), metricas, 'parse')
+        chunks = _timed(store.append(dataset_id, chunks, delta or {}), metricas, 'persist', filas=False)
+        delta_estados = fold_chunks(chunks, analizadores, metricas['etapas'])
+        metricas['etapas']['persist'] -= metricas['etapas'].get('parse', 0.0)
+
+        report_progress(job_id, progress=80)
+        estados, errores = merge_states(analizadores, [base, delta_estados])
+        if not errores:
+            store.save_state(dataset_id, (estados, errores), huella)
+
+    seleccion = build_analyzers(modo, validation=True)
+    results = finalize_states(seleccion, estados, errores, metricas['etapas'])
+    validacion = {'validation': analizadores['validation']}
+    results["delta"] = dict(
+        finalize_states(validacion, delta_estados[0], delta_estados[1]),
+        filas=metricas['filas'],
+        archivo=(delta or {}).get('source_file')
+    )
+    results["memoria"] = parser.memory_report()
+    _report_parser(results, parser)
+    return save_results(job_id, results, streaming=True, dataset_id=dataset_id, metricas=metricas, modo=modo)
+
+
+def run_batch_member(job_id: str, file_path: str, modo: str, formato: Optional[str] = None,
+                     sucursal: Optional[str] = None, compact: Optional[bool] = None) -> Dict:
+    """
+    Analiza un archivo de un batch por chunks.
+
+    Guarda el resultado del archivo como el de un job individual y devuelve
+    además los estados sin finalizar, que la API combina con los de los
+    demás archivos. Si el archivo no trae sucursal se usa `sucursal`.
+    """
+    report_progress(job_id, status="processing", progress=10)
+    parser = PreParser(compact=compact)
+    metricas = _new_metrics(bytes=os.path.getsize(file_path))
+    analizadores = build_analyzers(modo, validation=True)
+
+    chunks = parser.iter_chunks(file_path, chunksize=CHUNK_ROWS, formato=formato)
+    chunks = _timed(_checkpoints(job_id, chunks), metricas, 'parse')
+    if sucursal is not None:
+        chunks = _with_branch(chunks, sucursal)
+    estados, errores = fold_chunks(chunks, analizadores, metricas['etapas'])
+
+    report_progress(job_id, progress=80)
+    results = finalize_states(analizadores, estados, errores, metricas['etapas'])
+    results["memoria"] = parser.memory_report()
+    _report_parser(results, parser)
+    final = save_results(job_id, results, streaming=True, metricas=metricas, modo=modo)
+    final["filas"] = metricas["filas"]
+    final["estados"] = (estados, errores)
+    return final
+
+
+def _with_branch(chunks: Iterable[pd.DataFrame], sucursal: str) -> Iterator[pd.DataFrame]:
+    for chunk in chunks:
+        if 'sucursal' not in chunk.columns:
+            chunk = chunk.assign(sucursal=sucursal)
+        yield chunk
+
+
+def _report_parser(results: Dict, parser: PreParser):
+    """Registros mal formados que el parser saltó (sólo si hubo) y layout del CSV"""
+    if parser.registros_invalidos:
+        results["registros_invalidos"] = parser.registros_invalidos
+    if parser.layout:
+        results["layout"] = parser.layout
+
+
+def _checkpoints(job_id: str, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Revisa cancelación y plazo del job antes de cada chunk"""
+    iterador = iter(chunks)
+    while True:
+        check_cancelled(job_id)
+        chunk = next(iterador, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _measure(chunks: Iterable[pd.DataFrame], memoria: Dict) -> Iterator[pd.DataFrame]:
+    for chunk in chunks:
+        memoria['bytes_antes'] += int(chunk.memory_usage(deep=True).sum())
+        yield chunk
+
+
+def _memory_report(memoria: Dict) -> Dict:
+    """Memoria de un dataset cargado tal como se guardó (no se vuelve a compactar)"""
+    return dict(memoria, bytes_despues=memoria['bytes_antes'], reduccion_pct=0.0)
+
+
+def _new_metrics(bytes: int = 0) -> Dict:
+    """Tiempos por etapa, filas y bytes del job (se devuelven a la API para /metrics)"""
+    return {'etapas': {}, 'filas': 0, 'bytes': bytes, 'inicio': time.perf_counter()}
+
+
+@contextmanager
+def _stage(tiempos: Dict, etapa: str):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[etapa] = tiempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+def _timed(chunks: Iterable[pd.DataFrame], metricas: Dict, etapa: str,
+           filas: bool = True) -> Iterator[pd.DataFrame]:
+    """Acumula en `etapa` el tiempo de producir cada chunk (y cuenta sus filas)"""
+    iterador = iter(chunks)
+    while True:
+        with _stage(metricas['etapas'], etapa):
+            chunk = next(iterador, None)
+        if chunk is None:
+            return
+        if filas:
+            metricas['filas'] += len(chunk)
+        yield chunk
+
+
+def analyze_parsed(job_id: str, parsed_data: Dict, modo: str, tiempos: Optional[Dict] = None) -> Dict:
+    """Validación y análisis sobre un DataFrame ya normalizado (los analizadores en paralelo)"""
+    tiempos = {} if tiempos is None else tiempos
+    report_progress(job_id, progress=40)
+
+    # Columnas derivadas y perfil de calidad compartidos (una sola vez por job)
+    frame = MarcoAnalisis(parsed_data.get('data'))
+    parsed_data['frame'] = frame
+
+    analizadores = build_analyzers(modo, validation=True)
+    logger.info(f"[JOB-{job_id}] Validando y analizando {', '.join(analizadores)}...")
+
+    def analizar(nombre, analizador):
+        if nombre == "validation":
+            return analizador.validate(parsed_data.get('data'), frame)
+        return analizador.analyze(parsed_data)
+
+    resultados, errores = run_analyzers(analizadores, analizar, frame, tiempos)
+    report_progress(job_id, progress=80)
+    # La validación va al final, después de las secciones del modo
+    return {nombre: errores.get(nombre) or resultados[nombre] for nombre in analizadores}
+
+
+def save_results(job_id: str, results: Dict, streaming: bool, dataset_id: Optional[str] = None,
+                 metricas: Optional[Dict] = None, modo: Optional[str] = None) -> Dict:
+    """Agrega los análisis posteriores del modo, guarda resultados y devuelve el estado final del job"""
+    check_cancelled(job_id)
+    report_progress(job_id, progress=90)
+    result_path = f"results/{job_id}/analysis_result.json"
+    metricas = metricas or _new_metrics()
+    if modo is not None:
+        run_dependents(resolve_mode(modo)[1], results, metricas['etapas'])
+
+    with _stage(metricas['etapas'], 'serialize'):
+        write_results(result_path, results)
+    metricas['segundos'] = time.perf_counter() - metricas.pop('inicio')
+
+    logger.info(f"[JOB-{job_id}] ✅ Completado")
+    return {
+        "status": "completed",
+        "progress": 100,
+        "result_path": result_path,
+        "streaming": streaming,
+        "dataset_id": dataset_id,
+        "metricas": metricas
+    }
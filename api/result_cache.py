@@ -0,0 +1,152 @@
+"""
+Caché de resultados - direccionada por contenido
+Clave: sha256 del archivo (con las hojas elegidas y el modo compacto) + modo +
+huella de la versión de los analizadores (+ alias de columnas del registro de layouts).
+Un hit devuelve un job completado que apunta al artefacto existente en results/.
+El índice vive en el job store (compartido entre workers con SQLite).
+"""
+
+import hashlib
+import os
+import shutil
+import time
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from api.job_store import JobStore
+from core.registro_layouts import registro_layouts
+
+logger = logging.getLogger('MVN-API')
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _source_fingerprint(archivos) -> str:
+    sha = hashlib.sha256()
+    for archivo in archivos:
+        sha.update(archivo.name.encode())
+        sha.update(archivo.read_bytes())
+    return sha.hexdigest()[:16]
+
+
+@lru_cache(maxsize=1)
+def analyzer_fingerprint() -> str:
+    """Hash del código que produce los resultados (core/, validators/, pipeline y reporte), MVN_SKETCHES y MVN_MODOS"""
+    archivos = sorted((BASE_DIR / "core").glob("*.py")) + sorted((BASE_DIR / "validators").glob("*.py"))
+    huella = _source_fingerprint(archivos + [BASE_DIR / "api" / "pipeline.py", BASE_DIR / "api" / "report_generator.py"])
+    # Con sketches cambian las secciones del resultado y los estados guardados
+    huella += "-sk" if os.environ.get("MVN_SKETCHES", "0") == "1" else ""
+    # Un modo con nombre puede cambiar de analizadores
+    modos = os.environ.get("MVN_MODOS", "")
+    return huella + (f"-{hashlib.sha256(modos.encode()).hexdigest()[:8]}" if modos else "")
+
+
+@lru_cache(maxsize=1)
+def _parser_code_fingerprint() -> str:
+    core = BASE_DIR / "core"
+    archivos = [core / "pre_parser.py", core / "dialecto_csv.py", core / "registro_layouts.py"]
+    return _source_fingerprint(archivos + sorted(core.glob("lector_*.py")))
+
+
+def parser_fingerprint() -> str:
+    """Hash del código que produce los datasets normalizados y de los alias de columnas"""
+    aliases = registro_layouts().aliases_signature()
+    return _parser_code_fingerprint() + (f"-{aliases}" if aliases else "")
+
+
+def artifact_bytes(result_path: str) -> int:
+    """Bytes en disco de los artefactos de un resultado (todo results/{job_id}/; un hard link cuenta una vez)"""
+    directorio = Path(result_path).parent
+    try:
+        archivos = {}
+        for f in directorio.iterdir():
+            if f.is_file():
+                estado = f.stat()
+                archivos[estado.st_ino] = estado.st_size
+        return sum(archivos.values())
+    except FileNotFoundError:
+        return 0
+
+
+class ResultCache:
+    """
+    Índice LRU de resultados ya calculados, guardado en el job store.
+
+    Con el store SQLite el índice y los contadores son los mismos para
+    todos los workers de uvicorn y sobreviven a un reinicio. Se acota por
+    cantidad de entradas, bytes en disco de los artefactos referenciados y
+    antigüedad. Desalojar una entrada la quita del índice; el artefacto
+    se borra si el job que lo generó ya expiró del store (mientras el job
+    exista, el artefacto es suyo).
+    """
+
+    def __init__(self, store: JobStore, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 max_age_s: Optional[float] = None):
+        self.store = store
+        self.max_entries = max_entries or int(os.environ.get("MVN_CACHE_MAX_ENTRIES", 512))
+        self.max_bytes = max_bytes or int(float(os.environ.get("MVN_CACHE_MAX_MB", 1024)) * 1024 * 1024)
+        self.max_age_s = max_age_s or float(os.environ.get("MVN_CACHE_MAX_AGE_H", 24)) * 3600
+
+    def key(self, sha256: str, modo: str) -> Tuple[str, str, str]:
+        # Los alias de columnas cambian el parseo del mismo archivo
+        return sha256, modo, f"{analyzer_fingerprint()}:{registro_layouts().aliases_signature()}"
+
+    def get(self, sha256: str, modo: str) -> Optional[Dict]:
+        clave = self.key(sha256, modo)
+        entrada = self.store.cache_get(clave)
+        vigente = (
+            entrada is not None
+            and time.time() - entrada["created"] <= self.max_age_s
+            and os.path.exists(entrada["result_path"])
+        )
+        if not vigente:
+            if entrada is not None:
+                self.store.cache_delete(clave)
+                self._release([entrada])
+            self.store.cache_count("misses")
+            return None
+        self.store.cache_count("hits")
+        return entrada
+
+    def put(self, sha256: str, modo: str, job_id: str, result_path: str):
+        self.store.cache_put(self.key(sha256, modo), {
+            "job_id": job_id,
+            "result_path": result_path,
+            "bytes": artifact_bytes(result_path),
+            "created": time.time()
+        })
+        desalojadas = self.store.cache_evict(self.max_entries, self.max_bytes, self.max_age_s)
+        if desalojadas:
+            self.store.cache_count("evictions", len(desalojadas))
+            self._release(desalojadas)
+
+    def referenced_jobs(self, job_ids: Iterable[str]) -> Set[str]:
+        """Jobs cuyos resultados sigue sirviendo la caché (no se borran al expirar el job)"""
+        return self.store.cache_jobs(job_ids)
+
+    def _release(self, entradas: List[Dict]):
+        """Borra los artefactos de entradas quitadas cuyo job ya expiró y que ninguna otra usa"""
+        huerfanas = [e for e in entradas if self.store.get(e["job_id"]) is None]
+        en_uso = self.store.cache_jobs(e["job_id"] for e in huerfanas)
+        for entrada in huerfanas:
+            carpeta = Path(entrada["result_path"]).parent
+            # Sólo la carpeta propia del job (results/<job_id>)
+            if entrada["job_id"] not in en_uso and carpeta.name == entrada["job_id"]:
+                shutil.rmtree(carpeta, ignore_errors=True)
+                logger.info(f"Caché: artefactos de {entrada['job_id']} borrados (job expirado)")
+
+    def stats(self) -> Dict:
+        estado = self.store.cache_stats()
+        hits, misses = estado.get("hits", 0), estado.get("misses", 0)
+        consultas = hits + misses
+        return {
+            "entries": estado["entries"],
+            "bytes": estado["bytes"],
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / consultas) if consultas else 0.0,
+            "evictions": estado.get("evictions", 0),
+            "analyzer_fingerprint": analyzer_fingerprint()
+        }
@@ -0,0 +1,238 @@
+"""
+Archivos de resultados - JSON compacto, gzip precalculado y secciones indexadas
+Junto a `analysis_result.json` se guardan:
+
+    analysis_result.<gen>.json           el mismo documento (hard link) de la generación <gen>
+    analysis_result.<gen>.json.gz        el documento completo comprimido
+    analysis_result.<gen>.sections.gz    cada sección comprimida por separado (un miembro gzip por sección)
+    analysis_result.index.json           generación, ETag, offsets y largos de cada sección
+
+Servir el documento o una sección (?section=ventas) es leer un rango de
+bytes ya serializado: no se vuelve a parsear ni a codificar el JSON.
+
+Reescribir un resultado crea una generación nueva y reemplaza el índice al
+final; recién entonces se borran los archivos de la generación anterior.
+Quien leyó el índice viejo y abre después un archivo borrado recibe
+ResultChanged y vuelve a ubicar, en lugar de mezclar offsets viejos con
+bytes nuevos.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import uuid
+import zlib
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger('MVN-API')
+
+GZIP_LEVEL = 6
+
+
+class ResultChanged(Exception):
+    """La generación del índice leído ya no existe (el resultado se reescribió): volver a ubicar"""
+
+
+def _paths(result_path: str, generacion: Optional[str] = None) -> Dict[str, str]:
+    """Rutas de los archivos; sin generación, las de los resultados anteriores a las generaciones"""
+    base = result_path[:-len('.json')] if result_path.endswith('.json') else result_path
+    datos = f"{base}.{generacion}" if generacion else base
+    return {
+        'plain': f"{datos}.json" if generacion else result_path,
+        'gzip': f"{datos}.json.gz",
+        'sections': f"{datos}.sections.gz",
+        'index': base + '.index.json'
+    }
+
+
+def _read_index(result_path: str) -> Optional[Dict]:
+    try:
+        with open(_paths(result_path)['index'], 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _etag(datos: bytes) -> str:
+    return hashlib.sha256(datos).hexdigest()[:32]
+
+
+def write_results(result_path: str, results: Dict) -> Dict:
+    """Escribe el documento compacto, sus versiones gzip y el índice de secciones"""
+    rutas = _paths(result_path)
+    documento = bytearray(b'{')
+    secciones_gz = bytearray()
+    secciones = {}
+
+    for i, (nombre, valor) in enumerate(results.items()):
+        if i:
+            documento += b','
+        documento += json.dumps(str(nombre)).encode() + b':'
+        cuerpo = json.dumps(valor, separators=(',', ':'), default=str).encode()
+        comprimido = gzip.compress(cuerpo, GZIP_LEVEL)
+        secciones[str(nombre)] = {
+            'offset': len(documento),
+            'length': len(cuerpo),
+            'gzip_offset': len(secciones_gz),
+            'gzip_length': len(comprimido),
+            'etag': _etag(cuerpo)
+        }
+        documento += cuerpo
+        secciones_gz += comprimido
+    documento += b'}'
+    completo_gz = gzip.compress(bytes(documento), GZIP_LEVEL)
+
+    indice = {
+        'etag': _etag(documento),
+        'length': len(documento),
+        'gzip_length': len(completo_gz),
+        'sections': secciones
+    }
+    anterior = _read_index(result_path)
+    indice['generacion'] = uuid.uuid4().hex[:12]
+    nuevas = _paths(result_path, indice['generacion'])
+    _write_new(nuevas['gzip'], completo_gz)
+    _write_new(nuevas['sections'], secciones_gz)
+    # El documento queda en result_path y, con el mismo inodo, a nombre de la generación
+    _write_new(nuevas['plain'], documento, result_path)
+    _write_new(rutas['index'], json.dumps(indice).encode())
+
+    if anterior is not None:
+        # Sin generación (resultados anteriores), el documento viejo es result_path y ya se reemplazó
+        viejas = _paths(result_path, anterior.get('generacion'))
+        for clave in ('plain', 'gzip', 'sections') if anterior.get('generacion') else ('gzip', 'sections'):
+            try:
+                os.remove(viejas[clave])
+            except FileNotFoundError:
+                pass
+    return indice
+
+
+def _write_new(path: str, datos: bytes, tambien: Optional[str] = None):
+    """
+    Escribe `datos` en un temporal del mismo directorio y lo renombra a
+    `path`, así nunca hay un archivo a medio escribir con ese nombre. Con
+    `tambien`, el mismo archivo reemplaza además esa ruta (hard link).
+    """
+    temporal = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    try:
+        with open(temporal, 'wb') as f:
+            f.write(datos)
+        if tambien is not None:
+            os.link(temporal, path)
+            os.replace(temporal, tambien)
+        else:
+            os.replace(temporal, path)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def locate(result_path: str, section: Optional[str] = None) -> Dict:
+    """
+    Dónde leer el documento (o una sección) y su ETag.
+
+    Lanza KeyError si la sección no existe. Los resultados guardados antes
+    del índice se sirven desde el JSON original.
+    """
+    indice = _read_index(result_path)
+    if indice is None:
+        return _locate_legacy(result_path, section)
+    rutas = _paths(result_path, indice.get('generacion'))
+
+    if section is None:
+        return {
+            'etag': indice['etag'],
+            'path': rutas['plain'], 'offset': 0, 'length': indice['length'],
+            'gzip_path': rutas['gzip'], 'gzip_offset': 0, 'gzip_length': indice['gzip_length']
+        }
+
+    entrada = indice['sections'].get(section)
+    if entrada is None:
+        raise KeyError(f"Sección '{section}' no existe; disponibles: {', '.join(indice['sections'])}")
+    return {
+        'etag': entrada['etag'],
+        'path': rutas['plain'], 'offset': entrada['offset'], 'length': entrada['length'],
+        'gzip_path': rutas['sections'], 'gzip_offset': entrada['gzip_offset'],
+        'gzip_length': entrada['gzip_length']
+    }
+
+
+def _locate_legacy(result_path: str, section: Optional[str]) -> Dict:
+    with open(result_path, 'rb') as f:
+        datos = f.read()
+    if section is not None:
+        results = json.loads(datos)
+        if section not in results:
+            raise KeyError(f"Sección '{section}' no existe; disponibles: {', '.join(results)}")
+        datos = json.dumps(results[section], separators=(',', ':'), default=str).encode()
+    return {'etag': _etag(datos), 'body': datos}
+
+
+def read_body(ubicacion: Dict, encoding: Optional[str] = None) -> bytes:
+    """
+    Bytes a enviar con Content-Encoding `encoding` (None, 'gzip' o 'deflate').
+    Lanza ResultChanged si el resultado se reescribió después de `locate`.
+    """
+    if encoding == 'gzip' and 'gzip_path' in ubicacion:
+        return _read_range(ubicacion['gzip_path'], ubicacion['gzip_offset'], ubicacion['gzip_length'])
+
+    datos = ubicacion.get('body')
+    if datos is None:
+        datos = _read_range(ubicacion['path'], ubicacion['offset'], ubicacion['length'])
+    if encoding == 'gzip':
+        return gzip.compress(datos, GZIP_LEVEL)
+    if encoding == 'deflate':
+        return zlib.compress(datos, GZIP_LEVEL)
+    return datos
+
+
+def _read_range(path: str, offset: int, length: int) -> bytes:
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        raise ResultChanged(path)
+    with f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """'gzip', 'deflate' o None según Accept-Encoding (respeta q=0)"""
+    aceptadas = {}
+    for parte in (accept_encoding or '').split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        calidad = 1.0
+        for parametro in parametros.split(';'):
+            clave, _, valor = parametro.strip().partition('=')
+            if clave == 'q':
+                try:
+                    calidad = float(valor)
+                except ValueError:
+                    calidad = 0.0
+        if nombre:
+            aceptadas[nombre.strip().lower()] = calidad
+
+    for encoding in ('gzip', 'deflate'):
+        calidad = aceptadas.get(encoding, aceptadas.get('*', 0.0))
+        if calidad > 0:
+            return encoding
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match contra el ETag del recurso"""
+    if not if_none_match:
+        return False
+    for candidato in if_none_match.split(','):
+        candidato = candidato.strip()
+        if candidato == '*':
+            return True
+        if candidato.startswith('W/'):
+            candidato = candidato[2:]
+        if candidato.strip('"') == etag:
+            return True
+    return False
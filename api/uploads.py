@@ -0,0 +1,215 @@
+"""
+Uploads - Guarda archivos subidos en disco a medida que llegan
+Parsea el multipart del cuerpo en streaming (sin el spool previo de
+Starlette, así cada archivo se escribe una sola vez), calcula hash y tamaño
+al vuelo, corta apenas se excede el máximo y detecta el formato a partir
+del primer bloque. Memoria constante por upload.
+"""
+
+import hashlib
+import os
+import logging
+from typing import Callable, Dict, List, Optional
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    from python_multipart.exceptions import MultipartParseError
+except ModuleNotFoundError:
+    # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+    from multipart.exceptions import MultipartParseError
+
+logger = logging.getLogger('MVN-API')
+
+UPLOAD_CHUNK_BYTES = int(os.environ.get("MVN_UPLOAD_CHUNK_KB", 1024)) * 1024
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MVN_MAX_UPLOAD_MB", 2048)) * 1024 * 1024)
+
+
+class UploadTooLargeError(Exception):
+    """El archivo supera el tamaño máximo permitido"""
+
+
+def sniff_format(primer_bloque: bytes) -> str:
+    """Detecta el formato a partir de los primeros bytes del archivo"""
+    if primer_bloque.startswith(b'PK\x03\x04') or primer_bloque.startswith(b'\xd0\xcf\x11\xe0'):
+        return 'excel'
+
+    texto = primer_bloque.lstrip(b'\xef\xbb\xbf').lstrip()
+    if texto.startswith(b'['):
+        return 'json'
+    if texto.startswith(b'{'):
+        lineas = [l.strip() for l in texto.splitlines()[:5] if l.strip()]
+        if len(lineas) > 1 and all(l.startswith(b'{') for l in lineas):
+            return 'jsonl'
+        return 'json'
+
+    # Texto plano: CSV si las primeras líneas tienen el mismo número de separadores
+    lineas = [l for l in texto.splitlines()[:10] if l.strip()]
+    if len(lineas) > 1:
+        for sep in (b',', b';', b'\t'):
+            cuentas = {l.count(sep) for l in lineas[:-1]}
+            if len(cuentas) == 1 and cuentas.pop() > 0:
+                return 'csv'
+    return 'txt'
+
+
+class UploadError(Exception):
+    """El cuerpo no es un multipart/form-data válido o no trae archivos"""
+
+
+class _ReceptorMultipart:
+    """
+    Callbacks del parser multipart: cada parte con archivo va directo a su
+    destino, con hash y formato calculados al vuelo. Corre en el threadpool
+    (escritura y sha256 fuera del event loop).
+    """
+
+    def __init__(self, campo: str, destino: Callable[[int, str], str], max_archivos: Optional[int] = None):
+        self.campo = campo
+        self.destino = destino
+        self.max_archivos = max_archivos
+        self.archivos: List[Dict] = []
+        self._encabezados: Dict[bytes, bytes] = {}
+        self._campo_encabezado = b''
+        self._valor_encabezado = b''
+        self._actual: Optional[Dict] = None
+
+    def callbacks(self) -> Dict[str, Callable]:
+        return {
+            'on_part_begin': self._part_begin,
+            'on_header_field': self._header_field,
+            'on_header_value': self._header_value,
+            'on_header_end': self._header_end,
+            'on_headers_finished': self._headers_finished,
+            'on_part_data': self._part_data,
+            'on_part_end': self._part_end,
+        }
+
+    def _part_begin(self):
+        self._encabezados = {}
+        self._campo_encabezado = self._valor_encabezado = b''
+
+    def _header_field(self, data: bytes, start: int, end: int):
+        self._campo_encabezado += data[start:end]
+
+    def _header_value(self, data: bytes, start: int, end: int):
+        self._valor_encabezado += data[start:end]
+
+    def _header_end(self):
+        self._encabezados[self._campo_encabezado.lower()] = self._valor_encabezado
+        self._campo_encabezado = self._valor_encabezado = b''
+
+    def _headers_finished(self):
+        _, opciones = parse_options_header(self._encabezados.get(b'content-disposition', b''))
+        nombre = opciones.get(b'name', b'').decode('utf-8', 'replace')
+        filename = opciones.get(b'filename')
+        if filename is None or nombre != self.campo:
+            # Campos de formulario u otros archivos: se descartan
+            self._actual = None
+            return
+        if self.max_archivos is not None and len(self.archivos) >= self.max_archivos:
+            raise UploadError(f"Se esperan a lo sumo {self.max_archivos} archivos en '{self.campo}'")
+        filename = filename.decode('utf-8', 'replace')
+        path = self.destino(len(self.archivos), filename)
+        self._actual = {
+            'filename': filename, 'path': path, 'bytes': 0,
+            'sha256': hashlib.sha256(), 'inicio': bytearray(), 'f': open(path, 'wb')
+        }
+        self.archivos.append(self._actual)
+
+    def _part_data(self, data: bytes, start: int, end: int):
+        archivo = self._actual
+        if archivo is None:
+            return
+        bloque = data[start:end]
+        archivo['bytes'] += len(bloque)
+        archivo['sha256'].update(bloque)
+        if len(archivo['inicio']) < UPLOAD_CHUNK_BYTES:
+            archivo['inicio'] += bloque[:UPLOAD_CHUNK_BYTES - len(archivo['inicio'])]
+        archivo['f'].write(bloque)
+
+    def _part_end(self):
+        if self._actual is not None:
+            self._actual['f'].close()
+        self._actual = None
+
+    @property
+    def incomplete(self) -> bool:
+        """Quedó un archivo sin su fin de parte (cuerpo cortado)"""
+        return self._actual is not None
+
+    def close(self, borrar: bool = False):
+        for archivo in self.archivos:
+            archivo['f'].close()
+            if borrar and os.path.exists(archivo['path']):
+                os.remove(archivo['path'])
+
+    def results(self) -> List[Dict]:
+        return [{
+            'filename': a['filename'],
+            'path': a['path'],
+            'bytes': a['bytes'],
+            'sha256': a['sha256'].hexdigest(),
+            'formato': sniff_format(bytes(a['inicio'])) if a['bytes'] else 'txt'
+        } for a in self.archivos]
+
+
+async def receive_uploads(request: Request, campo: str, destino: Callable[[int, str], str],
+                          max_bytes: Optional[int] = None, max_archivos: Optional[int] = None) -> List[Dict]:
+    """
+    Lee el cuerpo multipart a medida que llega y escribe cada archivo del
+    campo `campo` en `destino(num, filename)`.
+
+    El límite se aplica a los bytes recibidos (con o sin Content-Length):
+    al superarlo se corta la lectura, se borran los archivos parciales y se
+    lanza UploadTooLargeError. Devuelve por archivo filename, path, bytes,
+    sha256 y formato detectado. Más de `max_archivos` archivos o un cuerpo
+    mal formado lanzan UploadError.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    tipo, opciones = parse_options_header(request.headers.get('content-type', ''))
+    boundary = opciones.get(b'boundary')
+    if tipo != b'multipart/form-data' or not boundary:
+        raise UploadError("Se espera un multipart/form-data")
+
+    receptor = _ReceptorMultipart(campo, destino, max_archivos)
+    parser = MultipartParser(boundary, receptor.callbacks())
+    total = 0
+    pendiente = bytearray()
+    try:
+        async for bloque in request.stream():
+            total += len(bloque)
+            if total > max_bytes:
+                raise UploadTooLargeError(
+                    f"Archivo supera el máximo de {max_bytes // (1024 * 1024)} MB"
+                )
+            pendiente += bloque
+            if len(pendiente) >= UPLOAD_CHUNK_BYTES:
+                await run_in_threadpool(_feed, parser, bytes(pendiente))
+                pendiente.clear()
+        await run_in_threadpool(_feed, parser, bytes(pendiente), True)
+        if receptor.incomplete:
+            raise UploadError("Cuerpo multipart incompleto")
+    except BaseException:
+        # Sin await: también corre si el request se cancela
+        receptor.close(borrar=True)
+        raise
+    await run_in_threadpool(receptor.close)
+
+    archivos = receptor.results()
+    if not archivos:
+        raise UploadError(f"Falta el archivo (campo '{campo}')")
+    return archivos
+
+
+def _feed(parser: MultipartParser, datos: bytes, final: bool = False):
+    try:
+        if datos:
+            parser.write(datos)
+        if final:
+            parser.finalize()
+    except MultipartParseError as e:
+        raise UploadError(f"Cuerpo multipart inválido: {e}")
@@ -0,0 +1,174 @@
+"""
+Generador de ventas sintéticas - Datasets reproducibles para benchmarks
+Mismas columnas que el export "Supermarket sales" (15+ columnas, de las que
+el PreParser usa cinco), con semilla fija, cardinalidad de SKUs, sucursales
+y tasas de nulos / duplicados / precios negativos configurables.
+"""
+
+import os
+import logging
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ('csv', 'json', 'txt', 'excel')
+EXTENSIONES = {'csv': '.csv', 'json': '.json', 'txt': '.txt', 'excel': '.xlsx'}
+
+# Límite de filas de una hoja de Excel (sin contar el encabezado)
+MAX_FILAS_EXCEL = 1_048_575
+
+CIUDADES = ['Yangon', 'Mandalay', 'Naypyitaw', 'Lima', 'Quito', 'Bogota', 'Cordoba', 'Rosario']
+LINEAS = ['Health and beauty', 'Electronic accessories', 'Home and lifestyle',
+          'Sports and travel', 'Food and beverages', 'Fashion accessories']
+
+
+@dataclass
+class GeneradorVentas:
+    """Parámetros del dataset; la misma configuración produce los mismos bytes"""
+    filas: int = 10_000
+    skus: int = 500
+    sucursales: int = 3
+    tasa_nulos: float = 0.01
+    tasa_duplicados: float = 0.01
+    tasa_negativos: float = 0.005
+    seed: int = 42
+
+    def params(self) -> Dict:
+        return asdict(self)
+
+    def nombre(self) -> str:
+        """Nombre de archivo único por configuración"""
+        return (f"ventas_{self.filas}_{self.skus}sku_{self.sucursales}suc"
+                f"_n{self.tasa_nulos}_d{self.tasa_duplicados}_s{self.seed}")
+
+    def dataframe(self) -> pd.DataFrame:
+        rng = np.random.default_rng(self.seed)
+        n_duplicados = int(self.filas * self.tasa_duplicados)
+        n = self.filas - n_duplicados
+
+        # Popularidad de SKUs tipo Zipf: pocos productos concentran las ventas
+        pesos = 1.0 / np.arange(1, self.skus + 1)
+        sku = rng.choice(self.skus, size=n, p=pesos / pesos.sum())
+        precio_base = np.round(rng.lognormal(3.0, 0.8, self.skus), 2)
+        precio = np.round(precio_base[sku] * rng.uniform(0.95, 1.05, n), 2)
+        cantidad = rng.integers(1, 11, n)
+        costo = np.round(precio * rng.uniform(0.55, 0.9, n), 2)
+        negativos = rng.random(n) < self.tasa_negativos
+        precio[negativos] = -precio[negativos]
+
+        sucursal = rng.integers(0, self.sucursales, n)
+        nombres_sucursal = np.array([_letra(i) for i in range(self.sucursales)], dtype=object)
+        fechas = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+        total = precio * cantidad
+
+        df = pd.DataFrame({
+            'Invoice ID': [f"{a:03d}-{b:02d}-{c:04d}" for a, b, c in
+                           zip(rng.integers(0, 1000, n), rng.integers(0, 100, n), rng.integers(0, 10000, n))],
+            'Branch': nombres_sucursal[sucursal],
+            'City': np.array(CIUDADES, dtype=object)[sucursal % len(CIUDADES)],
+            'Customer type': rng.choice(np.array(['Member', 'Normal'], dtype=object), n),
+            'Gender': rng.choice(np.array(['Female', 'Male'], dtype=object), n),
+            'Product line': np.array([f"Producto {i:05d}" for i in range(self.skus)], dtype=object)[sku],
+            'Categoria': np.array(LINEAS, dtype=object)[sku % len(LINEAS)],
+            'Unit price': precio,
+            'Quantity': cantidad,
+            'Tax 5%': np.round(total * 0.05, 4),
+            'Total': np.round(total * 1.05, 4),
+            'Date': fechas.strftime('%m/%d/%Y'),
+            'Time': [f"{h:02d}:{m:02d}" for h, m in zip(rng.integers(10, 21, n), rng.integers(0, 60, n))],
+            'Payment': rng.choice(np.array(['Cash', 'Credit card', 'Ewallet'], dtype=object), n),
+            'cogs': costo,
+            'gross margin percentage': 4.761904762,
+            'gross income': np.round(total * 0.05, 4),
+            'Rating': np.round(rng.uniform(4, 10, n), 1),
+        })
+
+        # Nulos en las columnas que usa el análisis
+        for col in ['Product line', 'Unit price', 'Quantity', 'cogs']:
+            mascara = rng.random(n) < self.tasa_nulos
+            df[col] = df[col].where(~mascara)
+
+        # Duplicados exactos intercalados en posiciones aleatorias
+        if n_duplicados:
+            copias = df.iloc[rng.integers(0, n, n_duplicados)]
+            df = pd.concat([df, copias], ignore_index=True)
+            df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+        return df
+
+    def path(self, directorio: str, formato: str) -> Path:
+        return Path(directorio) / f"{self.nombre()}{EXTENSIONES[formato]}"
+
+    def write(self, directorio: str, formato: str, df: pd.DataFrame = None) -> Path:
+        """Escribe el dataset en `formato` (reutiliza el archivo si ya existe)"""
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato}")
+        if formato == 'excel' and self.filas > MAX_FILAS_EXCEL:
+            raise ValueError(f"Excel admite hasta {MAX_FILAS_EXCEL} filas")
+
+        path = self.path(directorio, formato)
+        if path.exists():
+            return path
+        os.makedirs(directorio, exist_ok=True)
+        df = self.dataframe() if df is None else df
+        temporal = path.with_name(path.name + '.tmp')
+
+        if formato == 'csv':
+            df.to_csv(temporal, index=False)
+        elif formato == 'json':
+            df.to_json(temporal, orient='records', force_ascii=False)
+        elif formato == 'excel':
+            _write_excel(df, temporal)
+        else:
+            _write_txt(df, temporal)
+        os.replace(temporal, path)
+        logger.info(f"Dataset generado: {path} ({path.stat().st_size / 1e6:.1f} MB)")
+        return path
+
+
+def _write_excel(df: pd.DataFrame, path: Path, bloque: int = 50_000):
+    """
+    Hoja en modo write-only (fila por fila): df.to_excel arma todas las
+    celdas en memoria, varios GB con un millón de filas.
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append([str(c) for c in df.columns])
+    for inicio in range(0, len(df), bloque):
+        parte = df.iloc[inicio:inicio + bloque].astype(object)
+        for fila in parte.where(parte.notna(), None).itertuples(index=False, name=None):
+            hoja.append(fila)
+    libro.save(path)
+
+
+def _letra(i: int) -> str:
+    letras = ''
+    i += 1
+    while i:
+        i, resto = divmod(i - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _write_txt(df: pd.DataFrame, path: Path):
+    """Dump de POS con layouts mezclados: pipes, clave=valor y separadores"""
+    texto = {col: df[col].astype(str).where(df[col].notna(), 'nan')
+             for col in ['Product line', 'Unit price', 'Quantity', 'cogs', 'Branch']}
+    pipe = ('producto: ' + texto['Product line'] + ' | precio_venta: $' + texto['Unit price']
+            + ' | cantidad: ' + texto['Quantity'] + ' | costo=' + texto['cogs']
+            + ' | sucursal: ' + texto['Branch'])
+    clave_valor = ('producto=' + texto['Product line'] + ', precio_venta=' + texto['Unit price']
+                   + ', Qty=' + texto['Quantity'] + ', cost: ' + texto['cogs']
+                   + ', tienda: ' + texto['Branch'])
+    lineas = pipe.where(np.arange(len(df)) % 2 == 0, clave_valor)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('# Export POS\n')
+        for inicio in range(0, len(lineas), 100_000):
+            bloque = lineas.iloc[inicio:inicio + 100_000]
+            f.write('-' * 40 + '\n')
+            f.write('\n'.join(bloque) + '\n')
@@ -0,0 +1,296 @@
+"""
+Benchmarks por etapa - parse, validación y cada analizador
+Mide tiempo (mejor de N), throughput y pico de memoria (tracemalloc) para
+cada formato y escala, y compara contra un baseline guardado: si alguna
+etapa es más lenta o usa más memoria que la tolerancia, termina con código 1.
+
+El baseline versionado (benchmarks/baseline.json) cubre las escalas y
+formatos por defecto. Sin baseline, o si ningún caso medido está en él,
+también termina con error (código 2): la comparación no se hizo. Los
+tiempos son absolutos: el baseline guarda el host donde se midió y en
+otro host (o con otros parámetros) las diferencias se informan pero no
+hacen fallar la corrida.
+
+Uso (como módulo o como script desde la raíz del repo):
+    python -m benchmarks.run_benchmarks --scales 10k,100k --formats csv,txt
+    python benchmarks/run_benchmarks.py --scales 10k --formats csv
+    python -m benchmarks.run_benchmarks --save-baseline      # fija el baseline
+    python -m benchmarks.run_benchmarks --scales 10m --formats csv --no-memory --no-compare
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ''):
+    # Ejecutado como script: la raíz del repo en el path para importar benchmarks/ y core/
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generador import GeneradorVentas, FORMATOS, MAX_FILAS_EXCEL
+from core.pre_parser import PreParser
+from core.registro_layouts import RegistroLayouts
+from core.data_validator import DataValidator
+from core.analyzer_ventas import AnalizadorVentas
+from core.analyzer_rentabilidad import AnalizadorRentabilidad
+from core.analyzer_auditoria import AnalizadorAuditoria
+from core.analyzer_clientes import AnalizadorClientes
+from core.analyzer_tendencias import AnalizadorTendencias
+
+logger = logging.getLogger('MVN-BENCH')
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DATA_DIR = Path(tempfile.gettempdir()) / "mvn_benchmarks"
+
+ANALIZADORES = {
+    'ventas': AnalizadorVentas,
+    'rentabilidad': AnalizadorRentabilidad,
+    'auditoria': AnalizadorAuditoria,
+    'clientes': AnalizadorClientes,
+    'tendencias': AnalizadorTendencias,
+}
+
+# Diferencias menores a esto son ruido aunque superen la tolerancia relativa
+MIN_DIFERENCIA_S = 0.1
+MIN_DIFERENCIA_MB = 5.0
+
+
+def host_info() -> Dict:
+    """CPU, núcleos y memoria de esta máquina: los tiempos sólo se comparan en el mismo host"""
+    cpu = platform.processor()
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpu = next((l.split(':', 1)[1].strip() for l in f if l.startswith('model name')), cpu)
+    except OSError:
+        pass
+    try:
+        memoria_gb = round(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 2**30, 1)
+    except (ValueError, OSError, AttributeError):
+        memoria_gb = None
+    return {'machine': platform.machine(), 'cpu': cpu, 'cpus': os.cpu_count(), 'memoria_gb': memoria_gb}
+
+
+def parse_scale(texto: str) -> int:
+    """'10k' → 10_000, '1m' → 1_000_000"""
+    texto = texto.strip().lower().replace('_', '')
+    multiplicador = {'k': 1_000, 'm': 1_000_000}.get(texto[-1], 1)
+    return int(float(texto.rstrip('km')) * multiplicador)
+
+
+def measure(funcion: Callable, repeat: int = 1, memory: bool = True) -> Dict:
+    """
+    Mejor tiempo de `repeat` corridas y pico de memoria de una corrida extra.
+
+    Cada corrida suelta el resultado de la anterior antes de empezar: con
+    un parse de millones de filas, dos resultados vivos a la vez (más lo que
+    guarda tracemalloc) no entran en memoria y además inflarían el pico.
+    """
+    resultado = None
+    tiempos = []
+    for _ in range(repeat):
+        resultado = None
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    pico_mb = None
+    if memory:
+        resultado = None
+        gc.collect()
+        tracemalloc.start()
+        try:
+            resultado = funcion()
+            pico_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return {'segundos': min(tiempos), 'pico_mb': pico_mb, 'resultado': resultado}
+
+
+def bench_file(path: Path, formato: str, filas: int, repeat: int, memory: bool) -> Dict[str, Dict]:
+    """Mide cada etapa sobre un archivo ya generado"""
+    etapas = {}
+    tamano_mb = path.stat().st_size / 1e6
+
+    def parse():
+        # Registro de layouts vacío en cada corrida: se mide la detección
+        # completa (no el layout ya visto) y no se escribe en el directorio actual
+        registro = path.parent / "layouts.json"
+        registro.unlink(missing_ok=True)
+        return PreParser(layouts=RegistroLayouts(str(registro))).parse(str(path))
+
+    medida = measure(parse, repeat, memory)
+    parsed = medida.pop('resultado')
+    if parsed.get('status') == 'error':
+        raise RuntimeError(f"Parse falló en {path.name}: {parsed.get('error')}")
+    medida['mb_por_s'] = tamano_mb / medida['segundos'] if medida['segundos'] else None
+    etapas['parse'] = medida
+    df = parsed['data']
+
+    # Cada etapa con su propio MarcoAnalisis: mide el costo aislado (incluye
+    # calcular las columnas derivadas que necesita) sin depender del orden
+    etapas['validate'] = measure(lambda: DataValidator().validate(df), repeat, memory)
+    for nombre, clase in ANALIZADORES.items():
+        etapas[nombre] = measure(lambda: clase().analyze({'data': df}), repeat, memory)
+
+    for etapa in etapas.values():
+        etapa.pop('resultado', None)
+        etapa['filas_por_s'] = filas / etapa['segundos'] if etapa['segundos'] else None
+    return etapas
+
+
+def compare(resultados: Dict, baseline: Dict, tolerancia: float) -> List[str]:
+    """Etapas más lentas (o con más memoria) que el baseline más la tolerancia"""
+    regresiones = []
+    for clave, actual in resultados.items():
+        base = baseline.get(clave)
+        if base is None:
+            logger.warning(f"{clave}: sin baseline, no se compara")
+            continue
+        if (actual['segundos'] > base['segundos'] * (1 + tolerancia)
+                and actual['segundos'] - base['segundos'] > MIN_DIFERENCIA_S):
+            regresiones.append(
+                f"{clave}: {actual['segundos']:.3f}s vs baseline {base['segundos']:.3f}s "
+                f"(+{(actual['segundos'] / base['segundos'] - 1) * 100:.0f}%)"
+            )
+        if actual.get('pico_mb') is not None and base.get('pico_mb') is not None:
+            if (actual['pico_mb'] > base['pico_mb'] * (1 + tolerancia)
+                    and actual['pico_mb'] - base['pico_mb'] > MIN_DIFERENCIA_MB):
+                regresiones.append(
+                    f"{clave}: pico {actual['pico_mb']:.1f}MB vs baseline {base['pico_mb']:.1f}MB"
+                )
+    return regresiones
+
+
+def print_table(resultados: Dict):
+    print(f"\n{'caso':<42} {'segundos':>9} {'filas/s':>12} {'pico MB':>9}")
+    print("-" * 75)
+    for clave, r in resultados.items():
+        filas_s = f"{r['filas_por_s']:,.0f}" if r.get('filas_por_s') else '-'
+        pico = f"{r['pico_mb']:.1f}" if r.get('pico_mb') is not None else '-'
+        print(f"{clave:<42} {r['segundos']:>9.3f} {filas_s:>12} {pico:>9}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks por etapa del pipeline MVN")
+    parser.add_argument('--scales', default='10k,100k', help="Filas por dataset (10k..10m)")
+    parser.add_argument('--formats', default=','.join(FORMATOS), help="csv,json,txt,excel")
+    parser.add_argument('--skus', type=int, default=500)
+    parser.add_argument('--branches', type=int, default=3)
+    parser.add_argument('--null-rate', type=float, default=0.01)
+    parser.add_argument('--dup-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help="Corridas por etapa (se toma la mejor)")
+    parser.add_argument('--no-memory', action='store_true', help="No medir pico de memoria")
+    parser.add_argument('--data-dir', default=str(DATA_DIR))
+    parser.add_argument('--baseline', default=str(BASELINE_PATH))
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar los resultados como baseline")
+    parser.add_argument('--no-compare', action='store_true', help="Sólo medir, sin comparar contra el baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Regresión permitida (0.25 = 25%%)")
+    parser.add_argument('--output', help="Guardar resultados en un JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(message)s')
+    memory = not args.no_memory
+    resultados = {}
+
+    for filas in [parse_scale(s) for s in args.scales.split(',')]:
+        generador = GeneradorVentas(
+            filas=filas, skus=args.skus, sucursales=args.branches,
+            tasa_nulos=args.null_rate, tasa_duplicados=args.dup_rate, seed=args.seed
+        )
+        df = None
+        archivos = {}
+        for formato in [f.strip() for f in args.formats.split(',')]:
+            if formato == 'excel' and filas > MAX_FILAS_EXCEL:
+                logger.warning(f"Excel omitido para {filas} filas (máximo {MAX_FILAS_EXCEL})")
+                continue
+            if df is None and not generador.path(args.data_dir, formato).exists():
+                df = generador.dataframe()
+            archivos[formato] = generador.write(args.data_dir, formato, df)
+        # El DataFrame generado no se mantiene vivo mientras se mide
+        df = None
+        for formato, path in archivos.items():
+            logger.info(f"Midiendo {formato} con {filas:,} filas...")
+            for etapa, medida in bench_file(path, formato, filas, args.repeat, memory).items():
+                resultados[f"{formato}/{filas}/{etapa}"] = medida
+
+    print_table(resultados)
+
+    documento = {
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'host': host_info(),
+        'params': {'skus': args.skus, 'branches': args.branches, 'null_rate': args.null_rate,
+                   'dup_rate': args.dup_rate, 'seed': args.seed, 'repeat': args.repeat},
+        'results': resultados
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(documento, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(documento, f, indent=2)
+        print(f"\nBaseline guardado en {args.baseline}")
+        return 0
+    if args.no_compare:
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"\n❌ Sin baseline en {baseline_path}: correr con --save-baseline para fijarlo "
+              f"(o --no-compare para sólo medir)")
+        return 2
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    # En otro host o con otros parámetros los tiempos no son comparables: sólo se informan
+    comparable = True
+    if baseline.get('host') != documento['host']:
+        logger.warning(f"El baseline es de otro host ({baseline.get('host')}); las diferencias no hacen fallar "
+                       f"la corrida. Regenerarlo con --save-baseline en esta máquina")
+        comparable = False
+    if baseline.get('params') != documento['params']:
+        logger.warning("El baseline se generó con otros parámetros; las diferencias no hacen fallar la corrida")
+        comparable = False
+
+    comparables = [clave for clave in resultados if clave in baseline.get('results', {})]
+    if not comparables:
+        print(f"\n❌ Ningún caso medido está en {baseline_path}: usar las escalas y formatos del baseline "
+              f"o --no-compare")
+        return 2
+
+    regresiones = compare(resultados, baseline.get('results', {}), args.tolerance)
+    if regresiones:
+        print("\n" + "=" * 75)
+        print(f"REGRESIÓN DE PERFORMANCE ({len(regresiones)} etapas, tolerancia {args.tolerance:.0%})")
+        print("=" * 75)
+        for linea in regresiones:
+            print(f"  {'❌' if comparable else '⚠️'} {linea}")
+        if not comparable:
+            print("Baseline de otro host o con otros parámetros: sólo informativo")
+            return 0
+        return 1
+
+    print(f"\n✅ Sin regresiones contra {baseline_path} (tolerancia {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,40 +2,59 @@
 import pandas as pd
 import logging
 from typing import Dict
+from core.marco_analisis import MarcoAnalisis
+from core.perfil_calidad import PerfilCalidad, frame_state
 
 logger = logging.getLogger(__name__)
 
 class AnalizadorAuditoria:
+    # Entradas (ver core/registro_analizadores.py)
+    COLUMNAS = ()
+    DERIVADAS = ()
+    PERFIL = True
+
+    def __init__(self):
+        self.perfil = PerfilCalidad()
+
     def analyze(self, parsed_data: Dict) -> Dict:
         try:
-            df = parsed_data.get('data')
-            if df is None or df.empty:
+            frame = MarcoAnalisis.from_parsed(parsed_data)
+            if frame.empty:
                 return {'status': 'error', 'error': 'Datos vacíos'}
-            
-            anomalias = []
-            nulls = df.isnull().sum().sum()
-            if nulls > 0:
-                anomalias.append(f"{nulls} valores nulos")
-            
-            dups = df.duplicated().sum()
-            if dups > 0:
-                anomalias.append(f"{dups} filas duplicadas")
-            
-            if 'precio_venta' in df.columns:
-                negs = (df['precio_venta'] < 0).sum()
-                if negs > 0:
-                    anomalias.append(f"{negs} precios negativos")
-            
-            return {
-                'status': 'success',
-                'anomalias_detectadas': len(anomalias),
-                'anomalias': anomalias,
-                'filas_totales': len(df),
-                'confianza_auditoria': max(100 - (len(anomalias) * 10), 0)
-            }
+            return self.finalize(frame_state(frame))
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
 
+    def new_state(self) -> Dict:
+        return self.perfil.new_state()
+
+    def fold(self, state: Dict, frame: MarcoAnalisis) -> Dict:
+        return self.perfil.fold(state, frame)
+
+    def merge(self, a: Dict, b: Dict) -> Dict:
+        return self.perfil.merge(a, b)
+
+    def finalize(self, state: Dict) -> Dict:
+        if state['filas'] == 0:
+            return {'status': 'error', 'error': 'Datos vacíos'}
+        
+        anomalias = []
+        if state['nulos'] > 0:
+            anomalias.append(f"{state['nulos']} valores nulos")
+        if state['duplicados'] > 0:
+            anomalias.append(f"{state['duplicados']} filas duplicadas")
+        negativos = state['negativos'].get('precio_venta', 0)
+        if negativos:
+            anomalias.append(f"{negativos} precios negativos")
+        
+        return {
+            'status': 'success',
+            'anomalias_detectadas': len(anomalias),
+            'anomalias': anomalias,
+            'filas_totales': state['filas'],
+            'confianza_auditoria': max(100 - (len(anomalias) * 10), 0)
+        }
+
 def run():
     logger.info("✅ AnalizadorAuditoria configurado")
     return {'status': 'configured'}
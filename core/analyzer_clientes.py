@@ -1,27 +1,97 @@
 """Script 6: ANALYZER CLIENTES"""
+import numpy as np
 import pandas as pd
 import logging
-from typing import Dict
+from typing import Dict, Optional
+from core.marco_analisis import MarcoAnalisis
+from core.streaming import VACIO, fold_unique, merge_hashes
+from core.sketches import SKETCHES_DEFAULT, HyperLogLog, SpaceSaving, hash_values
 
 logger = logging.getLogger(__name__)
 
 class AnalizadorClientes:
+    """
+    Clientes distintos y ventas por cliente.
+
+    Con columna `cliente` se cuentan clientes distintos: exacto (un hash de
+    8 bytes por cliente) o, con sketches, HyperLogLog de memoria fija más
+    el top de clientes por Space-Saving. Sin la columna, cada fila cuenta
+    como un cliente.
+    """
+
+    # Entradas (ver core/registro_analizadores.py)
+    COLUMNAS = ('precio_venta', 'cantidad')
+    DERIVADAS = ('total',)
+    PERFIL = False
+
+    def __init__(self, sketches: Optional[bool] = None):
+        self.sketches = SKETCHES_DEFAULT if sketches is None else sketches
+
     def analyze(self, parsed_data: Dict) -> Dict:
         try:
-            df = parsed_data.get('data')
-            if df is None or df.empty:
+            frame = MarcoAnalisis.from_parsed(parsed_data)
+            if frame.empty:
                 return {'status': 'error', 'error': 'Datos vacíos'}
-            total_clientes = len(df)
-            total_ventas = (df['precio_venta'] * df['cantidad']).sum()
-            return {
-                'status': 'success',
-                'total_clientes': total_clientes,
-                'total_ventas': float(total_ventas),
-                'promedio_por_cliente': float(total_ventas / total_clientes) if total_clientes > 0 else 0
-            }
+            return self.finalize(self.fold(self.new_state(), frame))
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
 
+    def new_state(self) -> Dict:
+        return {
+            'filas': 0, 'total': 0.0,
+            'clientes': HyperLogLog() if self.sketches else VACIO,
+            'con_cliente': False,
+            'top': SpaceSaving() if self.sketches else None
+        }
+
+    def fold(self, state: Dict, frame: MarcoAnalisis) -> Dict:
+        state['filas'] += len(frame)
+        state['total'] += float(frame.column('total').sum())
+        if 'cliente' in frame.columns:
+            state['con_cliente'] = True
+            clientes = frame.column('cliente')
+            if self.sketches:
+                state['clientes'].add(clientes)
+                ventas = frame.column('total').groupby(clientes, sort=False, observed=True).sum()
+                state['top'].add(ventas)
+            else:
+                state['clientes'], _ = fold_unique(state['clientes'], np.unique(hash_values(clientes)))
+        return state
+
+    def merge(self, a: Dict, b: Dict) -> Dict:
+        if self.sketches:
+            clientes = a['clientes'].merge(b['clientes'])
+            top = a['top'].merge(b['top'])
+        else:
+            clientes, _ = merge_hashes(a['clientes'], b['clientes'])
+            top = None
+        return {
+            'filas': a['filas'] + b['filas'], 'total': a['total'] + b['total'],
+            'clientes': clientes, 'con_cliente': a['con_cliente'] or b['con_cliente'], 'top': top
+        }
+
+    def finalize(self, state: Dict) -> Dict:
+        if state['filas'] == 0:
+            return {'status': 'error', 'error': 'Datos vacíos'}
+        if not state['con_cliente']:
+            total_clientes, metodo = state['filas'], 'filas'
+        elif self.sketches:
+            total_clientes, metodo = int(round(state['clientes'].estimate())), 'hyperloglog'
+        else:
+            total_clientes, metodo = len(state['clientes']), 'exacto'
+        total_ventas = state['total']
+        resultado = {
+            'status': 'success',
+            'total_clientes': total_clientes,
+            'metodo_clientes': metodo,
+            'total_ventas': float(total_ventas),
+            'promedio_por_cliente': float(total_ventas / total_clientes) if total_clientes > 0 else 0
+        }
+        if metodo == 'hyperloglog':
+            resultado['error_relativo_clientes'] = round(state['clientes'].error_relativo, 4)
+            resultado['top_clientes'] = state['top'].top(10)
+        return resultado
+
 def run():
     logger.info("✅ AnalizadorClientes configurado")
     return {'status': 'configured'}
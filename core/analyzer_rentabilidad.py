@@ -2,45 +2,75 @@
 import pandas as pd
 import logging
 from typing import Dict
+from core.marco_analisis import MarcoAnalisis
+from core.streaming import merge_top
 
 logger = logging.getLogger(__name__)
 
 class AnalizadorRentabilidad:
+    # Entradas (ver core/registro_analizadores.py)
+    COLUMNAS = ('precio_venta', 'costo', 'cantidad')
+    DERIVADAS = ('margen_unitario', 'margen_porcentaje', 'total', 'total_costo', 'total_margen')
+    PERFIL = False
+
+    SUMAS = ['filas', 'total_venta', 'total_costo', 'total_margen', 'productos_con_perdida', 'total_perdida']
+
     def analyze(self, parsed_data: Dict) -> Dict:
         try:
-            df = parsed_data.get('data')
-            if df is None or df.empty:
+            frame = MarcoAnalisis.from_parsed(parsed_data)
+            if frame.empty:
                 return {'status': 'error', 'error': 'Datos vacíos'}
-            
-            df['margen_unitario'] = df['precio_venta'] - df['costo']
-            df['margen_porcentaje'] = (df['margen_unitario'] / df['costo'] * 100).fillna(0)
-            df['total_venta'] = df['precio_venta'] * df['cantidad']
-            df['total_costo'] = df['costo'] * df['cantidad']
-            df['total_margen'] = df['total_venta'] - df['total_costo']
-            
-            total_margen = df['total_margen'].sum()
-            total_venta = df['total_venta'].sum()
-            margen_promedio = (total_margen / total_venta * 100) if total_venta > 0 else 0
-            
-            productos_perdida = df[df['margen_unitario'] < 0]
-            num_perdidas = len(productos_perdida)
-            total_perdida = productos_perdida['total_margen'].sum()
-            
-            top_rentables = df.nlargest(5, 'margen_porcentaje')[['producto', 'margen_unitario']].to_dict('records') if 'producto' in df.columns else []
-            
-            return {
-                'status': 'success',
-                'total_venta': float(total_venta),
-                'total_costo': float(df['total_costo'].sum()),
-                'total_margen': float(total_margen),
-                'margen_promedio_porcentaje': float(margen_promedio),
-                'productos_con_perdida': int(num_perdidas),
-                'total_perdida': float(total_perdida),
-                'top_rentables': top_rentables[:5]
-            }
+            return self.finalize(self.fold(self.new_state(), frame))
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
 
+    def new_state(self) -> Dict:
+        return {'filas': 0, 'total_venta': 0.0, 'total_costo': 0.0, 'total_margen': 0.0,
+                'productos_con_perdida': 0, 'total_perdida': 0.0, 'top': None}
+
+    def fold(self, state: Dict, frame: MarcoAnalisis) -> Dict:
+        df = frame.with_columns('margen_unitario', 'margen_porcentaje', 'total', 'total_costo', 'total_margen')
+        
+        productos_perdida = df[df['margen_unitario'] < 0]
+        state['filas'] += len(df)
+        state['total_venta'] += float(df['total'].sum())
+        state['total_costo'] += float(df['total_costo'].sum())
+        state['total_margen'] += float(df['total_margen'].sum())
+        state['productos_con_perdida'] += len(productos_perdida)
+        state['total_perdida'] += float(productos_perdida['total_margen'].sum())
+        
+        if 'producto' in df.columns:
+            top = df[['producto', 'margen_unitario', 'margen_porcentaje']]
+            state['top'] = merge_top(state['top'], top, 5, 'margen_porcentaje')
+        return state
+
+    def merge(self, a: Dict, b: Dict) -> Dict:
+        state = {clave: a[clave] + b[clave] for clave in self.SUMAS}
+        state['top'] = merge_top(a['top'], b['top'], 5, 'margen_porcentaje')
+        return state
+
+    def finalize(self, state: Dict) -> Dict:
+        if state['filas'] == 0:
+            return {'status': 'error', 'error': 'Datos vacíos'}
+        
+        total_margen = state['total_margen']
+        total_venta = state['total_venta']
+        margen_promedio = (total_margen / total_venta * 100) if total_venta > 0 else 0
+        
+        top = state['top']
+        top_rentables = top[['producto', 'margen_unitario']].to_dict('records') if top is not None else []
+        
+        return {
+            'status': 'success',
+            'total_venta': float(total_venta),
+            'total_costo': float(state['total_costo']),
+            'total_margen': float(total_margen),
+            'margen_promedio_porcentaje': float(margen_promedio),
+            'productos_con_perdida': int(state['productos_con_perdida']),
+            'total_perdida': float(state['total_perdida']),
+            'top_rentables': top_rentables[:5]
+        }
+
 def run():
     logger.info("✅ AnalizadorRentabilidad configurado")
     return {'status': 'configured'}
@@ -1,26 +1,289 @@
 """Script 7: ANALYZER TENDENCIAS"""
+import os
+import numpy as np
 import pandas as pd
 import logging
-from typing import Dict
+from typing import Dict, List, Optional
+from core.marco_analisis import MarcoAnalisis
+from core.motor_agrupacion import MotorAgrupacion
 
 logger = logging.getLogger(__name__)
 
+# Días que puede abarcar la serie; con fechas más dispersas se toma la ventana con más transacciones
+TENDENCIAS_MAX_DIAS = int(os.environ.get("MVN_TENDENCIAS_MAX_DIAS", 3660))
+
+# Marca de día sin fecha en _days (las fechas anteriores a 1970 son días negativos válidos)
+SIN_DIA = np.iinfo(np.int64).min
+
 class AnalizadorTendencias:
+    """
+    Series de ventas por día o semana: total, por producto y por sucursal.
+
+    fold() agrega las ventas de cada chunk por (día, clave); finalize()
+    arma una matriz series × períodos y calcula medias móviles y la
+    pendiente de mínimos cuadrados de todas las series a la vez, con
+    operaciones de arrays (sin un loop por serie).
+
+    Los parciales por (día, clave) pueden tener millones de grupos, así
+    que no se combinan en cada chunk: se acumulan y se combinan cuando los
+    pendientes alcanzan el tamaño de lo ya combinado (costo lineal).
+
+    La matriz tiene una columna por período, así que el rango de fechas se
+    limita a `max_dias`: si las fechas abarcan más (p.ej. un año mal tipeado),
+    se usa la ventana con más transacciones y las filas que quedan afuera se
+    informan en `problemas`.
+    """
+
+    # Entradas (ver core/registro_analizadores.py)
+    COLUMNAS = ('precio_venta', 'cantidad')
+    DERIVADAS = ('total',)
+    PERFIL = False
+
+    DIMENSIONES = ('producto', 'sucursal')
+
+    # Con más días que esto, 'auto' agrupa por semana
+    DIAS_MAX_DIARIO = 92
+    VENTANA = {'dia': 7, 'semana': 4}
+
+    # Una serie crece/decrece si la recta ajustada varía más que esto sobre el
+    # período (en % de su promedio) y la pendiente es significativa (|t| > T_MIN)
+    UMBRAL_VARIACION_PCT = 10.0
+    T_MIN = 3.0
+
+    def __init__(self, frecuencia: str = 'auto', top: int = 10, max_dias: Optional[int] = None):
+        if frecuencia not in ('auto', 'dia', 'semana'):
+            raise ValueError(f"Frecuencia no soportada: {frecuencia}")
+        self.frecuencia = frecuencia
+        self.top = top
+        self.max_dias = max(int(max_dias or TENDENCIAS_MAX_DIAS), 1)
+        self.motor = MotorAgrupacion()
+
     def analyze(self, parsed_data: Dict) -> Dict:
         try:
-            df = parsed_data.get('data')
-            if df is None or df.empty:
+            frame = MarcoAnalisis.from_parsed(parsed_data)
+            if frame.empty:
                 return {'status': 'error', 'error': 'Datos vacíos'}
-            total_ventas = (df['precio_venta'] * df['cantidad']).sum()
-            return {
-                'status': 'success',
-                'total_ventas': float(total_ventas),
-                'transacciones': len(df),
-                'tendencia': 'estable'
-            }
+            return self.finalize(self.fold(self.new_state(), frame))
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
 
+    def new_state(self) -> Dict:
+        return {'filas': 0, 'total': 0.0, 'sin_fecha': 0, 'dia': [], 'producto': [], 'sucursal': []}
+
+    def fold(self, state: Dict, frame: MarcoAnalisis) -> Dict:
+        total = frame.column('total')
+        state['filas'] += len(frame)
+        state['total'] += float(total.sum())
+        if 'fecha' not in frame.columns:
+            return state
+
+        dias = frame.column('fecha').to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        state['sin_fecha'] += int(np.isnat(dias).sum())
+        df = pd.DataFrame({'dia': dias, 'total': total.to_numpy()}, index=total.index)
+        state['dia'] = self._push(state['dia'], self.motor.aggregate(df, 'dia'))
+        for dimension in self.DIMENSIONES:
+            if dimension in frame.columns:
+                df[dimension] = frame.column(dimension)
+                state[dimension] = self._push(state[dimension], self.motor.aggregate(df, ['dia', dimension]))
+        return state
+
+    def merge(self, a: Dict, b: Dict) -> Dict:
+        combinado = {
+            'filas': a['filas'] + b['filas'],
+            'total': a['total'] + b['total'],
+            'sin_fecha': a['sin_fecha'] + b['sin_fecha']
+        }
+        for clave in ('dia',) + self.DIMENSIONES:
+            partes = sorted(a[clave] + b[clave], key=len, reverse=True)
+            combinado[clave] = self._push(partes[:1], *partes[1:]) if partes else []
+        return combinado
+
+    def _push(self, partes: List[pd.DataFrame], *parciales: pd.DataFrame) -> List[pd.DataFrame]:
+        """Agrega parciales; combina todo cuando los pendientes igualan al primero"""
+        partes = partes + list(parciales)
+        if len(partes) > 1 and sum(len(p) for p in partes[1:]) >= len(partes[0]):
+            partes = [self.motor.merge(*partes)]
+        return partes
+
+    def finalize(self, state: Dict) -> Dict:
+        if state['filas'] == 0:
+            return {'status': 'error', 'error': 'Datos vacíos'}
+        resultado = {
+            'status': 'success',
+            'total_ventas': float(state['total']),
+            'transacciones': int(state['filas'])
+        }
+        # _matrix suma las celdas repetidas, así que los parciales pendientes sólo se concatenan
+        por_dia = pd.concat(state['dia']) if state['dia'] else None
+        dias = self._days(por_dia.index) if por_dia is not None else np.empty(0, dtype=np.int64)
+        if not (dias != SIN_DIA).any():
+            resultado['tendencia'] = 'sin_fecha'
+            return resultado
+
+        primero, fin = self._window(dias, por_dia['filas'].to_numpy())
+        inicio = primero
+        afuera = self._outside(dias, primero, fin)
+        if afuera.any():
+            dias = np.where(afuera, SIN_DIA, dias)
+            filas = int(por_dia['filas'].to_numpy()[afuera].sum())
+            epoca = np.datetime64('1970-01-01', 'D')
+            resultado['filas_fuera_de_rango'] = filas
+            resultado['problemas'] = [
+                f"{filas} filas con fecha fuera de {epoca + primero} a {epoca + fin} "
+                f"(rango máximo {self.max_dias} días) omitidas de la serie"
+            ]
+            logger.warning(resultado['problemas'][0])
+        frecuencia = self.frecuencia
+        if frecuencia == 'auto':
+            frecuencia = 'dia' if fin - inicio + 1 <= self.DIAS_MAX_DIARIO else 'semana'
+        paso = 1 if frecuencia == 'dia' else 7
+        if paso == 7:
+            # Semanas de lunes a domingo (el 1970-01-01 fue jueves)
+            inicio -= (inicio + 3) % 7
+        periodos = (fin - inicio) // paso + 1
+        # Días con datos posibles de cada período: la primera y la última semana pueden ser parciales
+        comienzos = inicio + np.arange(periodos) * paso
+        cobertura = np.minimum(comienzos + paso, fin + 1) - np.maximum(comienzos, primero)
+        escala = paso / cobertura
+
+        serie = self._matrix(dias, np.zeros(len(dias), dtype=np.int64), por_dia['suma'].to_numpy(),
+                             inicio, paso, periodos, 1)
+        ajuste = self._fit(serie * escala)
+        media_movil = self._moving_average(serie, self.VENTANA[frecuencia])
+        fechas = np.datetime64('1970-01-01', 'D') + inicio + np.arange(periodos) * paso
+
+        resultado.update({
+            'tendencia': ajuste['tendencia'][0],
+            'frecuencia': frecuencia,
+            'desde': str(fechas[0]),
+            'hasta': str(fechas[-1] + paso - 1),
+            'periodos': int(periodos),
+            'filas_sin_fecha': int(state['sin_fecha']),
+            'pendiente': float(ajuste['pendiente'][0]),
+            'variacion_pct': float(ajuste['variacion_pct'][0]),
+            'serie': [
+                {'periodo': str(f), 'ventas': float(v), 'media_movil': None if np.isnan(m) else float(m)}
+                for f, v, m in zip(fechas, serie[0], media_movil[0])
+            ]
+        })
+        for dimension in self.DIMENSIONES:
+            if state[dimension]:
+                parcial = pd.concat(state[dimension])
+                resultado[f'por_{dimension}'] = self._dimension(parcial, inicio, paso, periodos, escala,
+                                                                self.VENTANA[frecuencia], (primero, fin))
+        return resultado
+
+    def _dimension(self, parcial: pd.DataFrame, inicio: int, paso: int, periodos: int,
+                   escala: np.ndarray, ventana: int, rango: tuple) -> Dict:
+        """Pendiente y media móvil de cada serie (todas a la vez) y las que más suben / bajan"""
+        dias = self._days(parcial.index.get_level_values(0))
+        afuera = self._outside(dias, *rango)
+        if afuera.any():
+            # Sin filas fuera de la ventana para que no aparezcan claves sin ventas en ella
+            parcial, dias = parcial[~afuera], dias[~afuera]
+        codigos, claves = pd.factorize(parcial.index.get_level_values(1), sort=False)
+        matriz = self._matrix(dias, codigos, parcial['suma'].to_numpy(), inicio, paso, periodos, len(claves))
+        ajuste = self._fit(matriz * escala)
+        media_movil = self._moving_average(matriz, ventana)[:, -1]
+        ventas = matriz.sum(axis=1)
+        tendencia = ajuste['tendencia']
+
+        def filas(indices):
+            return [
+                {
+                    'clave': str(claves[i]),
+                    'ventas': float(ventas[i]),
+                    'pendiente': float(ajuste['pendiente'][i]),
+                    'variacion_pct': float(ajuste['variacion_pct'][i]),
+                    'media_movil': None if np.isnan(media_movil[i]) else float(media_movil[i])
+                }
+                for i in indices
+            ]
+
+        orden = np.argsort(ajuste['variacion_pct'], kind='stable')
+        crecientes = orden[::-1][tendencia[orden[::-1]] == 'creciente'][:self.top]
+        decrecientes = orden[tendencia[orden] == 'decreciente'][:self.top]
+        return {
+            'series': int(len(claves)),
+            'crecientes': int((tendencia == 'creciente').sum()),
+            'decrecientes': int((tendencia == 'decreciente').sum()),
+            'estables': int((tendencia == 'estable').sum()),
+            'top_crecientes': filas(crecientes),
+            'top_decrecientes': filas(decrecientes)
+        }
+
+    def _window(self, dias: np.ndarray, filas: np.ndarray) -> tuple:
+        """Primer y último día de la ventana de `max_dias` días con más filas"""
+        validos = dias != SIN_DIA
+        dias, filas = dias[validos], filas[validos]
+        orden = np.argsort(dias, kind='stable')
+        dias, acumulado = dias[orden], np.concatenate(([0], np.cumsum(filas[orden])))
+        if int(dias[-1]) - int(dias[0]) < self.max_dias:
+            return int(dias[0]), int(dias[-1])
+        # Ventanas que empiezan en cada día con datos; ante empate, la más reciente
+        hasta = np.searchsorted(dias, dias + self.max_dias, side='left')
+        cuentas = acumulado[hasta] - acumulado[:len(dias)]
+        mejor = len(cuentas) - 1 - int(np.argmax(cuentas[::-1]))
+        return int(dias[mejor]), int(dias[hasta[mejor] - 1])
+
+    @staticmethod
+    def _outside(dias: np.ndarray, primero: int, fin: int) -> np.ndarray:
+        """Días con fecha que quedan fuera de [primero, fin]"""
+        return (dias != SIN_DIA) & ((dias < primero) | (dias > fin))
+
+    @staticmethod
+    def _days(indice: pd.Index) -> np.ndarray:
+        """Días desde 1970-01-01, negativos antes de esa fecha (SIN_DIA para NaT)"""
+        valores = np.asarray(indice, dtype='datetime64[D]')
+        dias = valores.astype(np.int64)
+        dias[np.isnat(valores)] = SIN_DIA
+        return dias
+
+    @staticmethod
+    def _matrix(dias: np.ndarray, codigos: np.ndarray, sumas: np.ndarray,
+                inicio: int, paso: int, periodos: int, series: int) -> np.ndarray:
+        """Matriz series × períodos de ventas (0 donde no hubo ventas); ignora los días fuera del rango"""
+        validos = (dias >= inicio) & (dias < inicio + periodos * paso) & (codigos >= 0)
+        posiciones = (dias[validos] - inicio) // paso
+        celdas = codigos[validos] * periodos + posiciones
+        sumas = np.nan_to_num(sumas[validos].astype(np.float64))
+        return np.bincount(celdas, weights=sumas, minlength=series * periodos).reshape(series, periodos)
+
+    @classmethod
+    def _fit(cls, matriz: np.ndarray) -> Dict[str, np.ndarray]:
+        """Recta de mínimos cuadrados de cada fila y su clasificación"""
+        periodos = matriz.shape[1]
+        x = np.arange(periodos, dtype=np.float64)
+        xc = x - x.mean()
+        sxx = float((xc ** 2).sum())
+        media = matriz.mean(axis=1)
+        if sxx == 0:
+            ceros = np.zeros(len(matriz))
+            return {'pendiente': ceros, 'variacion_pct': ceros,
+                    'tendencia': np.full(len(matriz), 'estable', dtype=object)}
+
+        pendiente = matriz @ xc / sxx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variacion = np.where(media > 0, pendiente * (periodos - 1) / media * 100, 0.0)
+            residuo = ((matriz - media[:, None]) ** 2).sum(axis=1) - pendiente ** 2 * sxx
+            error = np.sqrt(np.maximum(residuo, 0) / max(periodos - 2, 1) / sxx)
+            t = np.where(error > 0, np.abs(pendiente) / error, np.inf)
+        significativa = (t > cls.T_MIN) & (periodos > 2)
+        tendencia = np.full(len(matriz), 'estable', dtype=object)
+        tendencia[significativa & (variacion > cls.UMBRAL_VARIACION_PCT)] = 'creciente'
+        tendencia[significativa & (variacion < -cls.UMBRAL_VARIACION_PCT)] = 'decreciente'
+        return {'pendiente': pendiente, 'variacion_pct': variacion, 'tendencia': tendencia}
+
+    @staticmethod
+    def _moving_average(matriz: np.ndarray, ventana: int) -> np.ndarray:
+        """Media móvil de `ventana` períodos por fila (NaN hasta completar la ventana)"""
+        resultado = np.full(matriz.shape, np.nan)
+        if matriz.shape[1] < ventana:
+            return resultado
+        acumulado = np.cumsum(np.pad(matriz, ((0, 0), (1, 0))), axis=1)
+        resultado[:, ventana - 1:] = (acumulado[:, ventana:] - acumulado[:, :-ventana]) / ventana
+        return resultado
+
 def run():
     logger.info("✅ AnalizadorTendencias configurado")
     return {'status': 'configured'}
@@ -1,55 +1,104 @@
 """Script 3: ANALYZER VENTAS"""
 import pandas as pd
 import logging
-from typing import Dict
+from typing import Dict, Optional
+from core.marco_analisis import MarcoAnalisis
+from core.motor_agrupacion import MotorAgrupacion
+from core.streaming import merge_top
+from core.sketches import SKETCHES_DEFAULT, HyperLogLog, SketchCuantiles, SpaceSaving
 
 logger = logging.getLogger(__name__)
 
 class AnalizadorVentas:
+    # Entradas (ver core/registro_analizadores.py)
+    COLUMNAS = ('precio_venta', 'cantidad')
+    DERIVADAS = ('total',)
+    PERFIL = False
+
+    def __init__(self, desglose_cruzado: bool = False, sketches: Optional[bool] = None):
+        self.desglose_cruzado = desglose_cruzado
+        self.sketches = SKETCHES_DEFAULT if sketches is None else sketches
+        self.motor = MotorAgrupacion()
+
     def analyze(self, parsed_data: Dict) -> Dict:
         try:
-            df = parsed_data.get('data')
-            if df is None or df.empty:
+            frame = MarcoAnalisis.from_parsed(parsed_data)
+            if frame.empty:
                 return {'status': 'error', 'error': 'Datos vacíos'}
-            
-            df['total'] = df['precio_venta'] * df['cantidad']
-            total_ventas = df['total'].sum()
-            num_transacciones = len(df)
-            
-            ventas_categoria = {}
-            if 'producto' in df.columns:
-                for prod in df['producto'].unique():
-                    df_prod = df[df['producto'] == prod]
-                    ventas_categoria[str(prod)] = {
-                        'total': float(df_prod['total'].sum()),
-                        'transacciones': int(len(df_prod)),
-                        'ticket_promedio': float(df_prod['total'].mean())
-                    }
-            
-            ventas_sucursal = {}
-            if 'sucursal' in df.columns:
-                for sucursal in df['sucursal'].unique():
-                    df_sucursal = df[df['sucursal'] == sucursal]
-                    ventas_sucursal[str(sucursal)] = {
-                        'total': float(df_sucursal['total'].sum()),
-                        'transacciones': int(len(df_sucursal)),
-                        'ticket_promedio': float(df_sucursal['total'].mean())
-                    }
-            
-            top_productos = df.nlargest(5, 'total')[['producto', 'precio_venta', 'cantidad']].to_dict('records') if 'producto' in df.columns else []
-            
-            return {
-                'status': 'success',
-                'total_ventas': float(total_ventas),
-                'transacciones': int(num_transacciones),
-                'ticket_promedio': float(total_ventas / num_transacciones) if num_transacciones > 0 else 0,
-                'ventas_por_categoria': ventas_categoria,
-                'ventas_por_sucursal': ventas_sucursal,
-                'top_productos': top_productos[:5]
-            }
+            return self.finalize(self.fold(self.new_state(), frame))
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
 
+    def new_state(self) -> Dict:
+        state = {'filas': 0, 'total': 0.0, 'producto': None, 'sucursal': None, 'cruzado': None, 'top': None}
+        if self.sketches:
+            # Memoria fija: productos distintos, percentiles del ticket y más vendidos
+            state['sketches'] = {'productos': HyperLogLog(), 'ticket': SketchCuantiles(), 'vendidos': SpaceSaving()}
+        return state
+
+    def fold(self, state: Dict, frame: MarcoAnalisis) -> Dict:
+        df = frame.with_columns('total')
+        state['filas'] += len(df)
+        state['total'] += float(df['total'].sum())
+
+        if self.sketches:
+            state['sketches']['ticket'].add(df['total'].to_numpy(dtype='float64', na_value=float('nan')))
+        if 'producto' in df.columns:
+            por_producto = self.motor.aggregate(df, 'producto')
+            state['producto'] = self.motor.merge(state['producto'], por_producto)
+            top = df[['producto', 'precio_venta', 'cantidad', 'total']]
+            state['top'] = merge_top(state['top'], top, 5, 'total')
+            if self.sketches:
+                state['sketches']['productos'].add(por_producto.index.to_series())
+                state['sketches']['vendidos'].add(por_producto['suma'])
+        if 'sucursal' in df.columns:
+            state['sucursal'] = self.motor.merge(state['sucursal'], self.motor.aggregate(df, 'sucursal'))
+        if self.desglose_cruzado and {'sucursal', 'producto'} <= set(df.columns):
+            cruzado = self.motor.aggregate(df, ['sucursal', 'producto'])
+            state['cruzado'] = self.motor.merge(state['cruzado'], cruzado)
+        return state
+
+    def merge(self, a: Dict, b: Dict) -> Dict:
+        combinado = {
+            'filas': a['filas'] + b['filas'],
+            'total': a['total'] + b['total'],
+            'producto': self.motor.merge(a['producto'], b['producto']),
+            'sucursal': self.motor.merge(a['sucursal'], b['sucursal']),
+            'cruzado': self.motor.merge(a['cruzado'], b['cruzado']),
+            'top': merge_top(a['top'], b['top'], 5, 'total')
+        }
+        if self.sketches:
+            combinado['sketches'] = {n: a['sketches'][n].merge(b['sketches'][n]) for n in a['sketches']}
+        return combinado
+
+    def finalize(self, state: Dict) -> Dict:
+        total_ventas = state['total']
+        num_transacciones = state['filas']
+        if num_transacciones == 0:
+            return {'status': 'error', 'error': 'Datos vacíos'}
+
+        top = state['top']
+        top_productos = top[['producto', 'precio_venta', 'cantidad']].to_dict('records') if top is not None else []
+
+        resultado = {
+            'status': 'success',
+            'total_ventas': float(total_ventas),
+            'transacciones': int(num_transacciones),
+            'ticket_promedio': float(total_ventas / num_transacciones) if num_transacciones > 0 else 0,
+            'ventas_por_categoria': self.motor.to_dict(state['producto']),
+            'ventas_por_sucursal': self.motor.to_dict(state['sucursal']),
+            'top_productos': top_productos[:5]
+        }
+        if self.desglose_cruzado and state['cruzado'] is not None:
+            resultado['ventas_por_sucursal_producto'] = self.motor.to_dict(state['cruzado'])
+        if self.sketches:
+            sketches = state['sketches']
+            if state['producto'] is not None:
+                resultado['productos_distintos'] = int(round(sketches['productos'].estimate()))
+                resultado['top_vendidos'] = sketches['vendidos'].top(10)
+            resultado['ticket_percentiles'] = sketches['ticket'].quantiles()
+        return resultado
+
 def run():
     logger.info("✅ AnalizadorVentas configurado")
     return {'status': 'configured'}
@@ -1,73 +1,95 @@
 """Script 2: DATA VALIDATOR"""
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
 import logging
+from core.marco_analisis import MarcoAnalisis
+from core.perfil_calidad import PerfilCalidad, frame_state
 
 logger = logging.getLogger(__name__)
 
 class DataValidator:
+    # Entradas (ver core/registro_analizadores.py)
+    COLUMNAS = ()
+    DERIVADAS = ()
+    PERFIL = True
+
     def __init__(self, min_confidence: float = 0.60):
         self.min_confidence = min_confidence
         self.issues = []
+        self.perfil = PerfilCalidad()
     
-    def validate(self, df: pd.DataFrame) -> Dict:
+    def validate(self, df: pd.DataFrame, frame: Optional[MarcoAnalisis] = None) -> Dict:
+        """Valida `df`; con el marco compartido del job reutiliza su perfil de calidad"""
         self.issues = []
         if df is None or df.empty:
             return {'quality_score': 0, 'valid': False, 'error': 'DataFrame vacío', 'issues': ['Datos vacíos']}
         
         try:
-            duplicates = self._check_duplicates(df)
-            nulls = self._check_nulls(df)
-            ranges = self._check_ranges(df)
-            types = self._check_types(df)
-            quality_score = self._calculate_score(duplicates, nulls, ranges, types)
-            
-            return {
-                'quality_score': quality_score,
-                'valid': quality_score >= (self.min_confidence * 100),
-                'duplicates': duplicates,
-                'nulls': nulls,
-                'ranges': ranges,
-                'types': types,
-                'issues': self.issues,
-                'recommendations': self._get_recommendations()
-            }
+            return self.finalize(frame_state(frame or MarcoAnalisis(df)))
         except Exception as e:
             return {'quality_score': 0, 'valid': False, 'error': str(e)}
     
-    def _check_duplicates(self, df: pd.DataFrame) -> Dict:
-        total_rows = len(df)
-        duplicates = df.duplicated().sum()
+    def new_state(self) -> Dict:
+        return self.perfil.new_state()
+    
+    def fold(self, state: Dict, frame: MarcoAnalisis) -> Dict:
+        return self.perfil.fold(state, frame)
+    
+    def merge(self, a: Dict, b: Dict) -> Dict:
+        return self.perfil.merge(a, b)
+    
+    def finalize(self, state: Dict) -> Dict:
+        self.issues = []
+        if state['filas'] == 0:
+            return {'quality_score': 0, 'valid': False, 'error': 'DataFrame vacío', 'issues': ['Datos vacíos']}
+        
+        duplicates = self._check_duplicates(state)
+        nulls = self._check_nulls(state)
+        ranges = self._check_ranges(state)
+        types = self._check_types(state)
+        quality_score = self._calculate_score(duplicates, nulls, ranges, types)
+        
+        return {
+            'quality_score': quality_score,
+            'valid': quality_score >= (self.min_confidence * 100),
+            'duplicates': duplicates,
+            'nulls': nulls,
+            'ranges': ranges,
+            'types': types,
+            'issues': self.issues,
+            'recommendations': self._get_recommendations()
+        }
+    
+    def _check_duplicates(self, state: Dict) -> Dict:
+        total_rows = state['filas']
+        duplicates = state['duplicados']
         pct = (duplicates / total_rows * 100) if total_rows > 0 else 0
         if duplicates > 0:
             self.issues.append(f"❌ {duplicates} filas duplicadas")
         return {'count': int(duplicates), 'percentage': float(pct)}
     
-    def _check_nulls(self, df: pd.DataFrame) -> Dict:
-        null_counts = df.isnull().sum()
-        total_cells = len(df) * len(df.columns)
-        total_nulls = null_counts.sum()
+    def _check_nulls(self, state: Dict) -> Dict:
+        total_cells = state['celdas']
+        total_nulls = state['nulos']
         pct = (total_nulls / total_cells * 100) if total_cells > 0 else 0
         if total_nulls > 0:
             self.issues.append(f"⚠️ {total_nulls} valores nulos")
         return {'total': int(total_nulls), 'percentage': float(pct)}
     
-    def _check_ranges(self, df: pd.DataFrame) -> Dict:
+    def _check_ranges(self, state: Dict) -> Dict:
         issues = {}
-        for col in df.select_dtypes(include=[np.number]).columns:
-            if col in ['precio_venta', 'costo', 'cantidad']:
-                negatives = (df[col] < 0).sum()
-                if negatives > 0:
-                    issues[col] = {'negative_values': int(negatives)}
-                    self.issues.append(f"❌ Columna {col}: {negatives} negativos")
+        for col, negatives in state['negativos'].items():
+            if negatives > 0:
+                issues[col] = {'negative_values': int(negatives)}
+                self.issues.append(f"❌ Columna {col}: {negatives} negativos")
         return {'issues': issues}
     
-    def _check_types(self, df: pd.DataFrame) -> Dict:
+    def _check_types(self, state: Dict) -> Dict:
         type_checks = {}
         expected = {'producto': 'object', 'precio_venta': 'number', 'cantidad': 'number', 'costo': 'number', 'sucursal': 'object'}
         for col, exp in expected.items():
-            if col not in df.columns:
+            if col not in state['columnas']:
                 self.issues.append(f"⚠️ Columna faltante: {col}")
                 type_checks[col] = {'status': 'MISSING'}
         return type_checks
@@ -0,0 +1,292 @@
+"""DATASET STORE - Datasets normalizados en formato columnar comprimido
+
+Cada dataset vive en `datasets/{dataset_id}/`:
+
+    meta.json          columnas, tipos, filas, partes y origen
+    part-00000.npz     una o más partes (np.savez_compressed, un array por columna)
+    state.pkl          estados plegados de los analizadores (para agregar deltas)
+
+Las columnas de texto se guardan codificadas como diccionario (códigos +
+categorías), las numéricas con su dtype y las nullable con una máscara.
+Volver a analizar un dataset no requiere parsear el archivo original, y
+agregarle un delta sólo parsea y pliega el delta.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DATASETS_DIR = os.environ.get("MVN_DATASETS_DIR", "datasets")
+
+# Un lock más viejo que esto es de un proceso que murió
+LOCK_STALE_S = 3600
+
+
+def _encode_column(serie: pd.Series) -> Tuple[Dict, Dict]:
+    """Devuelve (arrays, descripción) para una columna"""
+    dtype = serie.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        arrays = {
+            'codes': serie.cat.codes.to_numpy().astype(np.int32),
+            'categories': np.asarray([str(c) for c in dtype.categories], dtype=str)
+        }
+        return arrays, {'kind': 'dictionary', 'dtype': 'category'}
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        codigos, categorias = pd.factorize(serie, sort=False)
+        arrays = {
+            'codes': codigos.astype(np.int32),
+            'categories': np.asarray([str(c) for c in categorias], dtype=str)
+        }
+        return arrays, {'kind': 'dictionary', 'dtype': 'object'}
+    if pd.api.types.is_extension_array_dtype(dtype) and hasattr(dtype, 'numpy_dtype'):
+        # Int64 / Float64 / boolean: valores + máscara de nulos
+        arrays = {
+            'values': serie.to_numpy(dtype=dtype.numpy_dtype, na_value=0),
+            'mask': serie.isna().to_numpy()
+        }
+        return arrays, {'kind': 'masked', 'dtype': str(dtype)}
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return {'values': serie.to_numpy().view('int64')}, {'kind': 'datetime', 'dtype': str(dtype)}
+    return {'values': serie.to_numpy()}, {'kind': 'numpy', 'dtype': str(dtype)}
+
+
+def _decode_column(arrays: Dict, descripcion: Dict) -> pd.Series:
+    kind = descripcion['kind']
+    if kind == 'dictionary':
+        categorias = arrays['categories'].astype(object)
+        if descripcion['dtype'] == 'category':
+            return pd.Series(pd.Categorical.from_codes(arrays['codes'], categories=pd.Index(categorias)))
+        valores = np.empty(len(arrays['codes']), dtype=object)
+        validos = arrays['codes'] >= 0
+        valores[validos] = categorias[arrays['codes'][validos]]
+        valores[~validos] = np.nan
+        return pd.Series(valores, dtype=object)
+    if kind == 'masked':
+        dtype = pd.api.types.pandas_dtype(descripcion['dtype'])
+        return pd.Series(dtype.construct_array_type()(arrays['values'], arrays['mask']))
+    if kind == 'datetime':
+        return pd.Series(arrays['values'].view('datetime64[ns]')).astype(descripcion['dtype'])
+    return pd.Series(arrays['values'], dtype=descripcion['dtype'])
+
+
+class DatasetStore:
+    """Guarda y carga datasets normalizados por `dataset_id`"""
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self.base_dir = Path(base_dir or DATASETS_DIR)
+
+    def path(self, dataset_id: str) -> Path:
+        return self.base_dir / dataset_id
+
+    def exists(self, dataset_id: str) -> bool:
+        return (self.path(dataset_id) / 'meta.json').exists()
+
+    def info(self, dataset_id: str) -> Dict:
+        meta_path = self.path(dataset_id) / 'meta.json'
+        if not meta_path.exists():
+            raise KeyError(f"Dataset {dataset_id} no existe")
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def list(self) -> List[Dict]:
+        if not self.base_dir.exists():
+            return []
+        return [self.info(d.name) for d in sorted(self.base_dir.iterdir())
+                if '.tmp-' not in d.name and (d / 'meta.json').exists()]
+
+    def save(self, dataset_id: str, df: pd.DataFrame, meta: Optional[Dict] = None) -> Dict:
+        """Guarda un DataFrame completo como dataset de una sola parte"""
+        return self.write(dataset_id, [df], meta)
+
+    def write(self, dataset_id: str, chunks: Iterable[pd.DataFrame], meta: Optional[Dict] = None) -> Dict:
+        """Guarda un dataset a partir de chunks (una parte por chunk)"""
+        for _ in self.tee(dataset_id, chunks, meta):
+            pass
+        return self.info(dataset_id)
+
+    def tee(self, dataset_id: str, chunks: Iterable[pd.DataFrame], meta: Optional[Dict] = None) -> Iterator[pd.DataFrame]:
+        """Reenvía los chunks mientras los va guardando; meta.json se escribe al final"""
+        destino = self.path(dataset_id)
+        temporal = destino.with_name(f'{destino.name}.tmp-{uuid.uuid4().hex[:8]}')
+        temporal.mkdir(parents=True)
+        columnas = None
+        filas = 0
+        partes = 0
+        try:
+            for chunk in chunks:
+                columnas = self._write_part(temporal / f'part-{partes:05d}.npz', chunk, columnas)
+                filas += len(chunk)
+                partes += 1
+                yield chunk
+        except BaseException:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+
+        info = dict(meta or {})
+        info.update({
+            'dataset_id': dataset_id,
+            'created_at': datetime.now().isoformat(),
+            'rows': filas,
+            'parts': partes,
+            'columns': columnas or []
+        })
+        with open(temporal / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2, default=str)
+        shutil.rmtree(destino, ignore_errors=True)
+        try:
+            os.replace(temporal, destino)
+        except OSError:
+            # Otro job guardó el mismo dataset al mismo tiempo
+            shutil.rmtree(temporal, ignore_errors=True)
+        logger.info(f"Dataset {dataset_id} guardado: {filas} filas en {partes} partes")
+
+    def _write_part(self, path: Path, df: pd.DataFrame, columnas: Optional[List[Dict]]) -> List[Dict]:
+        arrays = {}
+        descripciones = []
+        for i, nombre in enumerate(df.columns):
+            datos, descripcion = _encode_column(df.iloc[:, i])
+            descripcion['name'] = str(nombre)
+            descripciones.append(descripcion)
+            for clave, valor in datos.items():
+                arrays[f'{i}.{clave}'] = valor
+        np.savez_compressed(path, **arrays)
+        with open(path.with_suffix('.json'), 'w', encoding='utf-8') as f:
+            json.dump(descripciones, f)
+        return columnas or descripciones
+
+    def append(self, dataset_id: str, chunks: Iterable[pd.DataFrame], delta: Dict) -> Iterator[pd.DataFrame]:
+        """
+        Agrega los chunks como partes nuevas mientras los reenvía.
+
+        Las partes se escriben con nombre temporal y sólo se incorporan (y se
+        actualiza meta.json) si se leyeron todos los chunks. `delta` describe
+        el archivo agregado (sha256, bytes, source_file, formato).
+        """
+        info = self.info(dataset_id)
+        directorio = self.path(dataset_id)
+        sufijo = f'.tmp-{uuid.uuid4().hex[:8]}'
+        columnas = info.get('columns') or None
+        nuevas = []
+        filas = 0
+        try:
+            for chunk in chunks:
+                parte = directorio / f'part-{info["parts"] + len(nuevas):05d}{sufijo}.npz'
+                columnas = self._write_part(parte, chunk, columnas)
+                nuevas.append(parte)
+                filas += len(chunk)
+                yield chunk
+        except BaseException:
+            for parte in nuevas:
+                self._remove_part(parte)
+            raise
+
+        for parte in nuevas:
+            final = parte.with_name(parte.name.replace(sufijo, ''))
+            os.replace(parte.with_suffix('.json'), final.with_suffix('.json'))
+            os.replace(parte, final)
+        encadenado = hashlib.sha256(f"{info.get('sha256', '')}:{delta.get('sha256', '')}".encode()).hexdigest()
+        info.update({
+            'rows': info['rows'] + filas,
+            'parts': info['parts'] + len(nuevas),
+            'columns': columnas or [],
+            'sha256': encadenado,
+            'bytes': (info.get('bytes') or 0) + (delta.get('bytes') or 0),
+            'updated_at': datetime.now().isoformat(),
+            'appends': info.get('appends', []) + [dict(delta, rows=filas, at=datetime.now().isoformat())]
+        })
+        self._write_meta(dataset_id, info)
+        logger.info(f"Dataset {dataset_id}: +{filas} filas en {len(nuevas)} partes")
+
+    def _remove_part(self, parte: Path):
+        for path in (parte, parte.with_suffix('.json')):
+            if path.exists():
+                path.unlink()
+
+    def _write_meta(self, dataset_id: str, info: Dict):
+        meta_path = self.path(dataset_id) / 'meta.json'
+        temporal = meta_path.with_name(f'meta.json.tmp-{uuid.uuid4().hex[:8]}')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2, default=str)
+        os.replace(temporal, meta_path)
+
+    def save_state(self, dataset_id: str, estados, fingerprint: str):
+        """Guarda los estados plegados del dataset tal como está ahora"""
+        path = self.path(dataset_id) / 'state.pkl'
+        temporal = path.with_name(f'state.pkl.tmp-{uuid.uuid4().hex[:8]}')
+        documento = {'fingerprint': fingerprint, 'sha256': self.info(dataset_id).get('sha256'), 'estados': estados}
+        with open(temporal, 'wb') as f:
+            pickle.dump(documento, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, path)
+
+    def load_state(self, dataset_id: str, fingerprint: str):
+        """Estados guardados, o None si no hay, si son de otra versión o de otro contenido"""
+        path = self.path(dataset_id) / 'state.pkl'
+        if not path.exists():
+            return None
+        with open(path, 'rb') as f:
+            documento = pickle.load(f)
+        if documento.get('fingerprint') != fingerprint or documento.get('sha256') != self.info(dataset_id).get('sha256'):
+            return None
+        return documento['estados']
+
+    @contextmanager
+    def lock(self, dataset_id: str, timeout: float = 600):
+        """Lock entre procesos para modificar un dataset (un archivo creado con O_EXCL)"""
+        path = self.path(dataset_id) / '.lock'
+        limite = time.time() + timeout
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime > LOCK_STALE_S:
+                        path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.time() > limite:
+                    raise TimeoutError(f"Dataset {dataset_id} ocupado")
+                time.sleep(0.2)
+        try:
+            yield
+        finally:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def iter_parts(self, dataset_id: str) -> Iterator[pd.DataFrame]:
+        """Lee el dataset parte por parte (memoria acotada al tamaño de una parte)"""
+        info = self.info(dataset_id)
+        for parte in range(info['parts']):
+            path = self.path(dataset_id) / f'part-{parte:05d}.npz'
+            with open(path.with_suffix('.json'), 'r', encoding='utf-8') as f:
+                descripciones = json.load(f)
+            with np.load(path, allow_pickle=False) as npz:
+                arrays = {}
+                for clave in npz.files:
+                    columna, campo = clave.split('.', 1)
+                    arrays.setdefault(int(columna), {})[campo] = npz[clave]
+            df = pd.DataFrame({i: _decode_column(arrays.get(i, {}), d) for i, d in enumerate(descripciones)})
+            df.columns = [d['name'] for d in descripciones]
+            yield df
+
+    def load(self, dataset_id: str) -> pd.DataFrame:
+        partes = list(self.iter_parts(dataset_id))
+        if len(partes) == 1:
+            return partes[0]
+        return pd.concat(partes, ignore_index=True)
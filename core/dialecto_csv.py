@@ -0,0 +1,241 @@
+"""DIALECTO CSV - Detección de encoding y dialecto con una muestra del archivo
+
+Lee sólo los primeros bytes y arma las opciones de pd.read_csv para una
+única lectura completa correcta:
+
+    - encoding: BOM, UTF-8 si la muestra decodifica, si no chardet
+      (exportaciones Latin-1 / Windows-1252 de los POS); con poca
+      confianza se lee como Windows-1252
+    - separador: el que da la misma cantidad de campos en más líneas
+      (`,` `;` tab `|`); comillas con csv.Sniffer
+    - separador decimal y de miles (`1.234,56` vs `1,234.56`)
+    - fila de encabezado: se saltan las líneas de título de algunos
+      reportes; sin encabezado reconocible se lee con header=None
+"""
+import codecs
+import csv
+import io
+import os
+import re
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MUESTRA_BYTES = int(os.environ.get("MVN_SNIFF_KB", 64)) * 1024
+
+SEPARADORES = ',;\t|'
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Números sin ambigüedad: con decimales, con o sin separador de miles
+_DECIMAL_COMA = re.compile(r'^[-+]?(?:\d{1,3}(?:\.\d{3})+|\d+),\d+$')
+_DECIMAL_PUNTO = re.compile(r'^[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)\.\d+$')
+_MILES_PUNTO = re.compile(r'^[-+]?\d{1,3}(?:\.\d{3})+(?:,\d+)?$')
+_MILES_COMA = re.compile(r'^[-+]?\d{1,3}(?:,\d{3})+(?:\.\d+)?$')
+# Símbolo o código de moneda y % alrededor de un número ("$ 1.234,56", "12,5 %", "ARS 100")
+_MONEDA = re.compile(r'^\s*(?:[$€£]|US\$|[A-Z]{3}\$?)?\s*|\s*(?:[$€£%]|[A-Z]{3})?\s*$')
+_NUMERO = re.compile(r'^[-+$€]?\s*[\d.,]+%?$')
+
+# Encodings de Europa occidental: se leen como cp1252 (ISO-8859-1 es su subconjunto imprimible)
+_OCCIDENTALES = ('cp1252', 'iso8859-1', 'iso8859-15', 'ascii')
+
+# Confianza de chardet por debajo de la cual se lee como cp1252: con pocas
+# líneas de texto en español detecta hebreo o cirílico con confianza ~0.04
+MIN_CONFIANZA = 0.5
+# Un encoding no occidental (cirílico, hebreo, ...) tiene que superar esto
+MIN_CONFIANZA_OTRAS = 0.8
+
+
+def _codec(nombre: Optional[str]) -> Optional[str]:
+    try:
+        return codecs.lookup(nombre).name if nombre else None
+    except LookupError:
+        return None
+
+
+class DetectorDialecto:
+    """
+    Opciones de lectura de un CSV a partir de una muestra.
+
+    `column_map` y `columnas` son los de PreParser: una fila con nombres
+    de columnas conocidos es el encabezado.
+    """
+
+    def __init__(self, column_map: Dict[str, str], columnas: Iterable[str],
+                 muestra_bytes: Optional[int] = None):
+        self.column_map = column_map
+        self.columnas = set(columnas)
+        self.muestra_bytes = muestra_bytes or MUESTRA_BYTES
+
+    def detect(self, file_path: str) -> Dict:
+        """Kwargs de pd.read_csv: encoding, sep, quotechar, decimal, thousands, skiprows, header"""
+        muestra, completa = self.read_sample(file_path)
+        return self.detect_sample(muestra, completa, nombre=os.path.basename(file_path))
+
+    def read_sample(self, file_path: str) -> Tuple[bytes, bool]:
+        """Primeros bytes del archivo y si son el archivo completo"""
+        with open(file_path, 'rb') as f:
+            muestra = f.read(self.muestra_bytes)
+        return muestra, len(muestra) < self.muestra_bytes
+
+    @staticmethod
+    def first_lines(muestra: bytes, encoding: str, n: int) -> List[str]:
+        """Primeras `n` líneas físicas de la muestra (la numeración de skiprows)"""
+        texto = codecs.getincrementaldecoder(encoding)(errors='replace').decode(muestra, final=False)
+        return [linea.rstrip('\r') for linea in texto.split('\n', n)[:n]]
+
+    def detect_sample(self, muestra: bytes, completa: bool, encoding: Optional[str] = None,
+                      nombre: str = '') -> Dict:
+        encoding = encoding or self.detect_encoding(muestra)
+        texto = codecs.getincrementaldecoder(encoding)(errors='replace').decode(muestra, final=completa)
+        lineas = texto.splitlines(keepends=True)
+        if not completa and len(lineas) > 1:
+            # La última línea puede estar cortada
+            lineas = lineas[:-1]
+        texto = ''.join(lineas)
+
+        sep = self.detect_separator(texto)
+        quotechar, skipinitialspace = self._quoting(texto, sep)
+        filas = self._rows(texto, sep, quotechar)
+        skiprows, header, datos = self._header(filas)
+        decimal, thousands = self.detect_decimal(datos, sep)
+
+        opciones = {
+            'encoding': encoding,
+            # Un byte inválido más adelante no hace fallar la lectura completa
+            'encoding_errors': 'replace',
+            'sep': sep,
+            'quotechar': quotechar,
+            'skipinitialspace': skipinitialspace,
+            'decimal': decimal,
+            'thousands': thousands,
+            'skiprows': skiprows,
+            'header': header
+        }
+        logger.info(f"CSV {nombre}: encoding {encoding}, sep {sep!r}, "
+                    f"decimal {decimal!r}, encabezado {'fila ' + str(skiprows + 1) if header == 0 else 'no'}")
+        return opciones
+
+    @classmethod
+    def detect_encoding(cls, muestra: bytes) -> str:
+        return cls.guess_encoding(muestra)[0]
+
+    @staticmethod
+    def guess_encoding(muestra: bytes) -> Tuple[str, bool]:
+        """(encoding, seguro): no es seguro si chardet no tuvo confianza y se usó cp1252"""
+        for bom, encoding in _BOMS:
+            if muestra.startswith(bom):
+                return encoding, True
+        try:
+            # final=False: un carácter multibyte cortado al final de la muestra no es error
+            codecs.getincrementaldecoder('utf-8')().decode(muestra, final=False)
+            return 'utf-8', True
+        except UnicodeDecodeError:
+            pass
+        import chardet
+        candidatos = [(c['confidence'], _codec(c['encoding'])) for c in chardet.detect_all(muestra)]
+        candidatos = [(confianza, nombre) for confianza, nombre in candidatos if nombre]
+        maxima = candidatos[0][0] if candidatos else 0.0
+        if maxima < MIN_CONFIANZA:
+            logger.info(f"Encoding dudoso ({candidatos[0][1] if candidatos else '?'}, confianza {maxima:.2f}): cp1252")
+            return 'cp1252', False
+        # Con muestras cortas cp1252 y cp1250 empatan: ante la duda, el de los POS en español
+        if any(nombre in _OCCIDENTALES and confianza >= maxima * 0.9 for confianza, nombre in candidatos):
+            return 'cp1252', True
+        if maxima < MIN_CONFIANZA_OTRAS:
+            logger.info(f"Encoding dudoso ({candidatos[0][1]}, confianza {maxima:.2f}): cp1252")
+            return 'cp1252', False
+        return candidatos[0][1], True
+
+    @staticmethod
+    def detect_separator(texto: str) -> str:
+        """Separador con la cantidad de campos más consistente entre líneas"""
+        mejor, puntaje_mejor = ',', (0.0, 0)
+        for sep in SEPARADORES:
+            cuentas = [len(fila) for fila in csv.reader(io.StringIO(texto), delimiter=sep) if fila]
+            if not cuentas:
+                continue
+            campos, veces = Counter(cuentas).most_common(1)[0]
+            if campos < 2:
+                continue
+            puntaje = (veces / len(cuentas), campos)
+            if puntaje > puntaje_mejor:
+                mejor, puntaje_mejor = sep, puntaje
+        return mejor
+
+    @staticmethod
+    def detect_decimal(filas: List[List[str]], sep: str) -> Tuple[str, Optional[str]]:
+        """Separador decimal y de miles según los números de las filas de datos"""
+        votos = Counter()
+        for fila in filas:
+            for campo in fila:
+                campo = _MONEDA.sub('', campo)
+                if not campo or not campo[-1].isdigit():
+                    continue
+                # "1.234" o "1,234" solos son ambiguos: no votan el decimal
+                if _DECIMAL_COMA.match(campo) and not _MILES_COMA.match(campo):
+                    votos['coma'] += 1
+                elif _DECIMAL_PUNTO.match(campo) and not _MILES_PUNTO.match(campo):
+                    votos['punto'] += 1
+                if _MILES_PUNTO.match(campo):
+                    votos['miles_punto'] += 1
+                elif _MILES_COMA.match(campo):
+                    votos['miles_coma'] += 1
+        if votos['coma'] > votos['punto'] and sep != ',':
+            return ',', '.' if votos['miles_punto'] else None
+        return '.', ',' if votos['miles_coma'] and sep != ',' else None
+
+    def _quoting(self, texto: str, sep: str) -> Tuple[str, bool]:
+        try:
+            dialecto = csv.Sniffer().sniff(texto, delimiters=sep)
+            return dialecto.quotechar or '"', bool(dialecto.skipinitialspace)
+        except csv.Error:
+            return '"', False
+
+    @staticmethod
+    def _rows(texto: str, sep: str, quotechar: str) -> List[Tuple[int, List[str]]]:
+        """Filas de la muestra con la línea física donde empiezan"""
+        lector = csv.reader(io.StringIO(texto), delimiter=sep, quotechar=quotechar)
+        filas, linea = [], 0
+        try:
+            for fila in lector:
+                filas.append((linea, fila))
+                linea = lector.line_num
+        except csv.Error:
+            pass
+        return filas
+
+    def _header(self, filas: List[Tuple[int, List[str]]]) -> Tuple[int, Optional[int], List[List[str]]]:
+        """
+        (skiprows, header, filas de datos). El encabezado es la primera fila
+        con la cantidad de campos habitual; las anteriores (títulos) se saltan.
+        """
+        con_datos = [(linea, fila) for linea, fila in filas if any(c.strip() for c in fila)]
+        if not con_datos:
+            return 0, 0, []
+        campos = Counter(len(fila) for _, fila in con_datos).most_common(1)[0][0]
+        primera = next(i for i, (_, fila) in enumerate(con_datos) if len(fila) == campos)
+        # Una fila con nombres conocidos antes de esa también sirve (datos con separador final)
+        conocidas = [i for i in range(primera + 1) if self._known(con_datos[i][1])]
+        inicio = conocidas[0] if conocidas else primera
+        linea, candidata = con_datos[inicio]
+        datos = [fila for _, fila in con_datos[inicio + 1:]]
+        if conocidas:
+            return linea, 0, datos
+
+        nombres = [c.strip() for c in candidata]
+        numericos = sum(bool(_NUMERO.match(n)) for n in nombres if n)
+        if numericos and datos and numericos >= sum(bool(_NUMERO.match(c.strip())) for c in datos[0] if c.strip()):
+            # La primera fila es tan numérica como los datos: no hay encabezado
+            logger.warning("CSV sin encabezado reconocible: columnas sin nombre")
+            return linea, None, [candidata] + datos
+        return linea, 0, datos
+
+    def _known(self, fila: List[str]) -> bool:
+        return any(self.column_map.get(c.strip(), c.strip()) in self.columnas for c in fila)
@@ -0,0 +1,177 @@
+"""LECTOR EXCEL - Lectura por filas de libros .xlsx (openpyxl en modo read-only)
+
+    - las filas se recorren en modo read-only (sin cargar el libro entero)
+      y sólo se conservan las columnas cuyo encabezado mapea a una columna
+      estándar
+    - las filas se convierten a DataFrame por lotes de `chunksize`
+    - se puede elegir una o varias hojas (por nombre o posición) o todas;
+      en una lectura completa (sin chunks) varias hojas se pueden leer en
+      paralelo, una por proceso
+
+El tiempo es el de pd.read_excel (que también abre el libro read-only): el
+XML de openpyxl domina. Lo que se gana es memoria: por chunks, el pico
+depende de `chunksize` y no del tamaño de la hoja.
+
+Los .xls (formato binario viejo) se siguen leyendo con pd.read_excel.
+"""
+import os
+import logging
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from core.punto_control import FILAS_CONTROL, checkpoint
+
+logger = logging.getLogger(__name__)
+
+EXCEL_WORKERS = int(os.environ.get("MVN_EXCEL_WORKERS", 1))
+
+TODAS_LAS_HOJAS = '*'
+
+
+class LectorExcel:
+    """
+    Lee hojas de un libro en DataFrames de registros (sin normalizar).
+
+    `column_map` y `columnas` son los de PreParser: se conservan las
+    columnas cuyo encabezado (mapeado) es estándar; si ninguna lo es, todas.
+    """
+
+    def __init__(self, column_map: Dict[str, str], columnas: Iterable[str], workers: Optional[int] = None):
+        self.column_map = column_map
+        self.columnas = set(columnas)
+        self.workers = workers or EXCEL_WORKERS
+
+    def sheet_names(self, file_path: str) -> List[str]:
+        if _es_xls(file_path):
+            return list(pd.ExcelFile(file_path).sheet_names)
+        with _libro(file_path) as libro:
+            return list(libro.sheetnames)
+
+    def select_sheets(self, file_path: str, hojas: Optional[str] = None) -> List[str]:
+        """
+        Hojas a leer según `hojas`: None → la primera, '*' → todas, o una lista
+        separada por comas de nombres o posiciones (1 = la primera).
+        """
+        disponibles = self.sheet_names(file_path)
+        if not disponibles:
+            raise ValueError("El libro no tiene hojas")
+        if not hojas:
+            return disponibles[:1]
+        if hojas.strip() == TODAS_LAS_HOJAS:
+            return disponibles
+
+        elegidas = []
+        for nombre in (h.strip() for h in hojas.split(',')):
+            if not nombre:
+                continue
+            if nombre in disponibles:
+                hoja = nombre
+            elif nombre.isdigit() and 1 <= int(nombre) <= len(disponibles):
+                hoja = disponibles[int(nombre) - 1]
+            else:
+                raise ValueError(f"Hoja '{nombre}' no encontrada; disponibles: {', '.join(disponibles)}")
+            if hoja not in elegidas:
+                elegidas.append(hoja)
+        return elegidas or disponibles[:1]
+
+    def read(self, file_path: str, hojas: Optional[str] = None) -> pd.DataFrame:
+        """Todas las filas de las hojas elegidas en un solo DataFrame"""
+        elegidas = self._sheets(file_path, hojas)
+        if self.workers > 1 and len(elegidas) > 1:
+            # Una hoja por proceso; cada una vuelve entera (el resultado también lo es)
+            context = multiprocessing.get_context("spawn")
+            argumentos = [(file_path, hoja, self.column_map, self.columnas) for hoja in elegidas]
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(elegidas)), mp_context=context) as pool:
+                partes = list(pool.map(_read_sheet, *zip(*argumentos)))
+        else:
+            partes = [frame for hoja in elegidas for frame in self.iter_sheet(file_path, hoja)]
+        partes = [f for f in partes if len(f)]
+        if not partes:
+            return pd.DataFrame()
+        # Columnas en orden de primera aparición, igual que un solo DataFrame(records)
+        return pd.concat(partes, ignore_index=True, sort=False) if len(partes) > 1 else partes[0]
+
+    def iter_frames(self, file_path: str, chunksize: int = 100_000,
+                    hojas: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """
+        Filas de las hojas elegidas en DataFrames de a lo sumo `chunksize` filas.
+        Las hojas se leen de a una en este proceso: en paralelo cada proceso
+        devolvería su hoja entera y la memoria dejaría de depender de `chunksize`.
+        """
+        for hoja in self._sheets(file_path, hojas):
+            for frame in self.iter_sheet(file_path, hoja, chunksize):
+                if len(frame):
+                    yield frame
+
+    def _sheets(self, file_path: str, hojas: Optional[str]) -> List[str]:
+        elegidas = self.select_sheets(file_path, hojas)
+        logger.info(f"Excel {os.path.basename(file_path)}: hojas {', '.join(elegidas)}")
+        return elegidas
+
+    def iter_sheet(self, file_path: str, hoja: str, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Filas de una hoja; el encabezado es la primera fila no vacía"""
+        if _es_xls(file_path):
+            frame = pd.read_excel(file_path, sheet_name=hoja)
+            frame = frame[self._keep(list(frame.columns))] if len(frame.columns) else frame
+            yield frame
+            return
+
+        with _libro(file_path) as libro:
+            filas = (f for f in libro[hoja].iter_rows(values_only=True) if any(v is not None for v in f))
+            encabezado = next(filas, None)
+            if encabezado is None:
+                return
+            nombres = [str(v) if v is not None else f"Unnamed: {i}" for i, v in enumerate(encabezado)]
+            conservar = set(self._keep(nombres))
+            indices = [i for i, nombre in enumerate(nombres) if nombre in conservar]
+            ancho = max(indices) + 1
+            tomar = itemgetter(*indices) if len(indices) > 1 else (lambda fila: (fila[indices[0]],))
+            columnas = [nombres[i] for i in indices]
+
+            lote = []
+            for num, fila in enumerate(filas, 1):
+                if num % FILAS_CONTROL == 0:
+                    checkpoint()
+                if len(fila) < ancho:
+                    fila = fila + (None,) * (ancho - len(fila))
+                lote.append(tomar(fila))
+                if chunksize and len(lote) >= chunksize:
+                    yield pd.DataFrame.from_records(lote, columns=columnas)
+                    lote = []
+            if lote or not chunksize:
+                yield pd.DataFrame.from_records(lote, columns=columnas)
+
+    def _keep(self, nombres: List[str]) -> List[str]:
+        """Encabezados que mapean a una columna estándar (todos si no hay ninguno)"""
+        estandar = [n for n in nombres if self.column_map.get(n, n) in self.columnas]
+        return estandar or nombres
+
+
+def _es_xls(file_path: str) -> bool:
+    """Libro .xls (OLE2), por extensión o por firma"""
+    if file_path.lower().endswith('.xls'):
+        return True
+    with open(file_path, 'rb') as f:
+        return f.read(4) == b'\xd0\xcf\x11\xe0'
+
+
+@contextmanager
+def _libro(file_path: str):
+    """Libro en modo read-only (desde el archivo abierto: los uploads pueden no tener extensión)"""
+    from openpyxl import load_workbook
+    with open(file_path, 'rb') as f:
+        libro = load_workbook(f, read_only=True, data_only=True, keep_links=False)
+        try:
+            yield libro
+        finally:
+            libro.close()
+
+
+def _read_sheet(file_path: str, hoja: str, column_map: Dict[str, str], columnas) -> pd.DataFrame:
+    """Lee una hoja completa (se ejecuta en un proceso del pool)"""
+    partes = list(LectorExcel(column_map, columnas, workers=1).iter_sheet(file_path, hoja))
+    return partes[0] if partes else pd.DataFrame()
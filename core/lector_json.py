@@ -0,0 +1,157 @@
+"""LECTOR JSON - Lectura incremental de JSON y JSON Lines en lotes columnares
+
+Acepta un arreglo de objetos (`[{...}, {...}]`), objetos uno tras otro
+(JSON Lines / NDJSON) o un único objeto. El archivo se lee por bloques y
+cada registro se decodifica con `raw_decode` sobre un buffer acotado: la
+memoria depende del lote, no del tamaño del archivo.
+
+    - sólo se conservan las claves que mapean a una columna estándar
+    - los registros se acumulan por columna y se entregan en DataFrames
+      de `chunksize` filas
+    - un registro mal formado (o que no es un objeto) se cuenta y se salta:
+      se sigue desde el próximo objeto del arreglo o la próxima línea
+"""
+import json
+import re
+import logging
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, TextIO
+
+from core.punto_control import FILAS_CONTROL, checkpoint
+
+logger = logging.getLogger(__name__)
+
+BLOQUE_CHARS = 1 << 20
+
+# Un registro más largo que esto sin poder decodificarse se da por inválido
+MAX_REGISTRO_CHARS = 1 << 22
+
+_SEPARADORES = re.compile(r'[\s,]*')
+# Literal o número cortado por el fin del buffer (el error se informa al comienzo del token)
+_TOKEN_CORTADO = re.compile(r'[\w.+\-]*')
+# Para retomar después de un registro inválido
+_PROXIMO_OBJETO = re.compile(r',\s*\{')
+_PROXIMA_LINEA = re.compile(r'\n')
+
+
+class LectorJson:
+    """
+    Lee registros JSON en DataFrames (sin normalizar).
+
+    `column_map` y `columnas` son los de PreParser. `invalidos` acumula los
+    registros saltados.
+    """
+
+    def __init__(self, column_map: Dict[str, str], columnas: Iterable[str]):
+        self.column_map = column_map
+        self.columnas = set(columnas)
+        self.invalidos = 0
+        self._conservar: Dict[str, bool] = {}
+
+    def read(self, file_path: str) -> pd.DataFrame:
+        """Todos los registros del archivo en un solo DataFrame"""
+        partes = list(self.iter_frames(file_path, chunksize=None))
+        if not partes:
+            return pd.DataFrame()
+        return pd.concat(partes, ignore_index=True, sort=False) if len(partes) > 1 else partes[0]
+
+    def iter_frames(self, file_path: str, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        """Registros en DataFrames de a lo sumo `chunksize` filas (None: uno solo)"""
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            valores: Dict[str, List] = {}
+            filas = 0
+            for registro in self.iter_records(f):
+                for clave, valor in registro.items():
+                    conservar = self._conservar.get(clave)
+                    if conservar is None:
+                        conservar = self._conservar[clave] = self.column_map.get(clave, clave) in self.columnas
+                    if conservar:
+                        columna = valores.get(clave)
+                        if columna is None:
+                            columna = valores[clave] = [None] * filas
+                        columna.append(valor)
+                filas += 1
+                for columna in valores.values():
+                    if len(columna) < filas:
+                        columna.append(None)
+                if chunksize and filas >= chunksize:
+                    yield self._frame(valores, filas)
+                    valores, filas = {}, 0
+            if filas:
+                yield self._frame(valores, filas)
+        if self.invalidos:
+            logger.warning(f"JSON {file_path}: {self.invalidos} registros inválidos omitidos")
+
+    def iter_records(self, f: TextIO) -> Iterator[Dict]:
+        """Objetos del archivo; los inválidos se cuentan en `invalidos`"""
+        for num, valor in enumerate(self._iter_values(f), 1):
+            if num % FILAS_CONTROL == 0:
+                checkpoint()
+            if isinstance(valor, dict):
+                yield valor
+            else:
+                self.invalidos += 1
+
+    def _iter_values(self, f: TextIO) -> Iterator:
+        decoder = json.JSONDecoder()
+        buffer, pos, eof = '', 0, False
+        en_arreglo = None
+
+        while True:
+            if pos >= BLOQUE_CHARS:
+                buffer, pos = buffer[pos:], 0
+            pos = _SEPARADORES.match(buffer, pos).end()
+            if pos >= len(buffer):
+                if eof:
+                    return
+                bloque = f.read(BLOQUE_CHARS)
+                eof = not bloque
+                buffer += bloque
+                continue
+
+            if en_arreglo is None:
+                en_arreglo = buffer[pos] == '['
+                pos += en_arreglo
+                continue
+            if en_arreglo and buffer[pos] in '[]':
+                pos += 1
+                continue
+
+            try:
+                valor, fin = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Puede ser un registro cortado por el fin del bloque: leer más
+                incompleto = (e.pos >= len(buffer) - 1 or e.msg.startswith('Unterminated string')
+                              or _TOKEN_CORTADO.fullmatch(buffer, e.pos) is not None)
+                if incompleto and not eof and len(buffer) - pos < MAX_REGISTRO_CHARS:
+                    bloque = f.read(BLOQUE_CHARS)
+                    eof = not bloque
+                    buffer += bloque
+                    continue
+                self.invalidos += 1
+                buffer, pos, eof = self._skip(f, buffer, pos, eof, en_arreglo)
+                continue
+            pos = fin
+            yield valor
+
+    @staticmethod
+    def _skip(f: TextIO, buffer: str, pos: int, eof: bool, en_arreglo: bool):
+        """Avanza hasta el próximo objeto del arreglo (o la próxima línea)"""
+        patron = _PROXIMO_OBJETO if en_arreglo else _PROXIMA_LINEA
+        while True:
+            match = patron.search(buffer, pos + 1)
+            if match:
+                return buffer, match.start(), eof
+            if eof:
+                return buffer, len(buffer), eof
+            # Conserva el final por si el separador quedó partido entre bloques
+            buffer, pos = buffer[-64:], 0
+            bloque = f.read(BLOQUE_CHARS)
+            eof = not bloque
+            buffer += bloque
+
+    @staticmethod
+    def _frame(valores: Dict[str, List], filas: int) -> pd.DataFrame:
+        if not valores:
+            return pd.DataFrame(index=pd.RangeIndex(filas))
+        return pd.DataFrame(valores)
@@ -0,0 +1,154 @@
+"""LECTOR TXT - Parser compilado para archivos TXT de formato mixto
+
+Produce exactamente los mismos registros que el parser línea por línea
+original (se conserva como referencia en tests/test_lector_txt.py), con
+menos trabajo por línea:
+
+    - patrones precompilados (con lookbehind `(?<!\\w)`, que no cambia los
+      matches pero evita reintentar desde la mitad de cada palabra)
+    - reemplazos y clasificación (pipe / clave=valor / clave: valor) una vez
+      por línea, sin recorrer los patrones que no aplican
+    - los campos entre pipes se repiten mucho (sucursal, cantidad, producto):
+      se memoizan en una caché acotada
+
+Los archivos grandes se pueden repartir por rangos de bytes entre procesos.
+"""
+import os
+import re
+import logging
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.punto_control import FILAS_CONTROL, checkpoint
+
+logger = logging.getLogger(__name__)
+
+TXT_WORKERS = int(os.environ.get("MVN_TXT_WORKERS", 1))
+TXT_PARALLEL_MB = float(os.environ.get("MVN_TXT_PARALLEL_MB", 64))
+
+# Mismos patrones que el parser original. Un match nunca empieza a mitad
+# de palabra: si \w+ falla desde el inicio de la palabra, falla desde cualquier
+# posición posterior de la misma palabra (termina en el mismo lugar).
+PATRON_CLAVE_VALOR = re.compile(r'(?<!\w)(\w+)\s*[=:]\s*([^\|,]+)')
+PATRON_CLAVE_ESPACIO = re.compile(r'(?<!\w)(\w+)\s+([^|,]+)')
+
+MAX_CACHE_CAMPOS = 200_000
+
+
+class LectorTxt:
+    """Lee TXT de formato mixto en DataFrames de registros (sin normalizar)"""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or TXT_WORKERS
+        self._campos: Dict[str, Tuple] = {}
+
+    def read(self, file_path: str) -> pd.DataFrame:
+        """Todos los registros del archivo (en paralelo si es grande y hay workers)"""
+        tamano = os.path.getsize(file_path)
+        logger.info(f"TXT {file_path}: {tamano} bytes")
+
+        if self.workers > 1 and tamano > TXT_PARALLEL_MB * 1024 * 1024:
+            rangos = _byte_ranges(file_path, self.workers)
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=len(rangos), mp_context=context) as pool:
+                partes = [p for p in pool.map(_read_range, [file_path] * len(rangos), rangos) if len(p)]
+            if len(partes) > 1:
+                # Columnas en orden de primera aparición, igual que un solo DataFrame(records)
+                return pd.concat(partes, ignore_index=True, sort=False)
+            return partes[0] if partes else pd.DataFrame()
+
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return pd.DataFrame(list(self.iter_records(f)))
+
+    def iter_frames(self, file_path: str, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        """Registros en DataFrames de `chunksize` filas (el último puede ser menor)"""
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            registros = self.iter_records(f)
+            while True:
+                lote = list(islice(registros, chunksize))
+                if not lote:
+                    break
+                yield pd.DataFrame(lote)
+
+    def parse_lines(self, lineas: Iterable[str]) -> pd.DataFrame:
+        """DataFrame de los registros no vacíos de `lineas`"""
+        return pd.DataFrame(list(self.iter_records(lineas)))
+
+    def iter_records(self, lineas: Iterable[str]) -> Iterator[Dict]:
+        for num, linea in enumerate(lineas, 1):
+            if num % FILAS_CONTROL == 0:
+                checkpoint()
+            linea = self._clean(linea)
+            if linea:
+                registro = self.parse_line(linea)
+                if registro:
+                    yield registro
+
+    def parse_line(self, line: str) -> Optional[Dict]:
+        """Registro de una línea ya limpia (None si no tiene campos)"""
+        line = line.replace('€', '').replace('ñ', 'n').replace('é', 'e')
+        record = {}
+
+        if '|' in line:
+            for part in line.split('|'):
+                campos = self._campos.get(part)
+                if campos is None:
+                    campos = self._parse_part(part)
+                    if len(self._campos) >= MAX_CACHE_CAMPOS:
+                        self._campos.clear()
+                    self._campos[part] = campos
+                for key, value in campos:
+                    record[key] = value
+
+        elif ':' in line or '=' in line:
+            for key, value in PATRON_CLAVE_VALOR.findall(line):
+                record[key.lower()] = value.strip().replace('$', '')
+            for key, value in PATRON_CLAVE_ESPACIO.findall(line):
+                record[key.lower()] = value.strip().replace('$', '')
+
+        return record if record else None
+
+    @staticmethod
+    def _parse_part(part: str) -> Tuple:
+        """(clave, valor) de cada patrón que matchea en un campo entre pipes"""
+        part = part.strip()
+        campos = []
+        for patron in (PATRON_CLAVE_VALOR, PATRON_CLAVE_ESPACIO):
+            match = patron.search(part)
+            if match:
+                campos.append((match.group(1).lower(), match.group(2).strip().replace('$', '')))
+        return tuple(campos)
+
+    @staticmethod
+    def _clean(linea: str) -> str:
+        linea = linea.strip()
+        if not linea or linea[0] in '-#':
+            return ''
+        return linea
+
+
+def _byte_ranges(file_path: str, partes: int) -> List[Tuple[int, int]]:
+    """Divide el archivo en rangos que terminan en un salto de línea"""
+    tamano = os.path.getsize(file_path)
+    cortes = [0]
+    with open(file_path, 'rb') as f:
+        for i in range(1, partes):
+            f.seek(max(tamano * i // partes, cortes[-1]))
+            f.readline()
+            cortes.append(min(f.tell(), tamano))
+    cortes.append(tamano)
+    return [(a, b) for a, b in zip(cortes, cortes[1:]) if b > a]
+
+
+def _read_range(file_path: str, rango: Tuple[int, int]) -> pd.DataFrame:
+    """Registros de un rango de bytes (se ejecuta en un proceso worker)"""
+    inicio, fin = rango
+    with open(file_path, 'rb') as f:
+        f.seek(inicio)
+        texto = f.read(fin - inicio).decode('utf-8', errors='ignore')
+    # Mismos saltos de línea que la lectura en modo texto
+    texto = texto.replace('\r\n', '\n').replace('\r', '\n')
+    return LectorTxt().parse_lines(texto.split('\n'))
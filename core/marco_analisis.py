@@ -0,0 +1,112 @@
+"""MARCO DE ANÁLISIS - Columnas derivadas compartidas entre analizadores"""
+import numpy as np
+import pandas as pd
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _como_float(serie: pd.Series) -> np.ndarray:
+    return serie.to_numpy(dtype='float64', na_value=np.nan)
+
+
+class MarcoAnalisis:
+    """
+    Envuelve el DataFrame normalizado de un job y calcula columnas derivadas.
+
+    Las columnas derivadas se calculan una sola vez, a demanda, y quedan en
+    caché hasta que se invaliden. Los analizadores reciben vistas nuevas
+    (sin copiar datos) y nunca el DataFrame compartido: agregar o quitar
+    columnas en una vista no afecta a los demás, por lo que el resultado no
+    depende del orden en que se ejecuten. Las vistas son de solo lectura
+    por contrato; no se deben escribir valores in situ.
+
+    Los analizadores de un job corren en paralelo sobre el mismo marco: una
+    columna ya calculada se lee sin lock, y el perfil de calidad (memo) se
+    calcula con un lock propio para no frenar a los que piden columnas.
+    """
+
+    # nombre -> (columnas de entrada, función sobre un dict de arrays float64)
+    DERIVADAS = {
+        'total': (('precio_venta', 'cantidad'), lambda c: c['precio_venta'] * c['cantidad']),
+        'total_costo': (('costo', 'cantidad'), lambda c: c['costo'] * c['cantidad']),
+        'margen_unitario': (('precio_venta', 'costo'), lambda c: c['precio_venta'] - c['costo']),
+        'margen_porcentaje': (('margen_unitario', 'costo'),
+                              lambda c: np.nan_to_num(c['margen_unitario'] / c['costo'] * 100, nan=0.0,
+                                                      posinf=np.inf, neginf=-np.inf)),
+        'total_margen': (('total', 'total_costo'), lambda c: c['total'] - c['total_costo']),
+    }
+
+    def __init__(self, df: Optional[pd.DataFrame]):
+        self._cache: Dict[str, pd.Series] = {}
+        self._memo: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._memo_lock = threading.RLock()
+        self._base = df
+
+    @classmethod
+    def from_parsed(cls, parsed_data: Dict) -> 'MarcoAnalisis':
+        """Usa el marco compartido del job si existe; si no, crea uno local"""
+        marco = parsed_data.get('frame')
+        if marco is None:
+            marco = cls(parsed_data.get('data'))
+        return marco
+
+    @property
+    def base(self) -> pd.DataFrame:
+        return self._base
+
+    @property
+    def empty(self) -> bool:
+        return self._base is None or self._base.empty
+
+    @property
+    def columns(self) -> list:
+        return list(self._base.columns) if self._base is not None else []
+
+    def __len__(self) -> int:
+        return 0 if self._base is None else len(self._base)
+
+    def column(self, nombre: str) -> pd.Series:
+        """Devuelve una columna base o derivada (calculándola si hace falta)"""
+        if nombre in self._base.columns:
+            return self._base[nombre]
+        serie = self._cache.get(nombre)
+        if serie is not None:
+            return serie
+        if nombre not in self.DERIVADAS:
+            raise KeyError(nombre)
+        with self._lock:
+            if nombre not in self._cache:
+                entradas, funcion = self.DERIVADAS[nombre]
+                valores = {col: _como_float(self.column(col)) for col in entradas}
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    serie = pd.Series(funcion(valores), index=self._base.index, name=nombre)
+                self._cache[nombre] = serie
+            return self._cache[nombre]
+
+    def with_columns(self, *derivadas: str) -> pd.DataFrame:
+        """Vista con las columnas base más las derivadas pedidas"""
+        return pd.concat([self._base] + [self.column(nombre) for nombre in derivadas], axis=1, copy=False)
+
+    def memo(self, clave: str, funcion: Callable[['MarcoAnalisis'], Any]) -> Any:
+        """Resultado de funcion(marco) calculado una sola vez (p.ej. el perfil de calidad)"""
+        with self._memo_lock:
+            if clave not in self._memo:
+                self._memo[clave] = funcion(self)
+            return self._memo[clave]
+
+    def invalidate(self, nombre: Optional[str] = None):
+        """Descarta una columna derivada (y las que dependen de ella) o todo el caché"""
+        if nombre is None:
+            with self._lock, self._memo_lock:
+                self._cache.clear()
+                self._memo.clear()
+            return
+        with self._lock:
+            self._cache.pop(nombre, None)
+            for otra, (entradas, _) in self.DERIVADAS.items():
+                if nombre in entradas and otra in self._cache:
+                    self.invalidate(otra)
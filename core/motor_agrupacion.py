@@ -0,0 +1,68 @@
+"""MOTOR DE AGRUPACIÓN - Agregaciones por clave en una sola pasada"""
+import pandas as pd
+import logging
+from typing import Dict, List, Union
+
+from core.punto_control import checkpoint
+
+logger = logging.getLogger(__name__)
+
+Claves = Union[str, List[str]]
+
+
+class MotorAgrupacion:
+    """
+    Agrega una columna de valores por una o varias claves.
+
+    Cada agregación factoriza las claves una sola vez (groupby vectorizado),
+    sin importar cuántos valores distintos tenga la clave. Los resultados
+    parciales (suma, filas, no_nulos) se pueden combinar entre sí.
+    """
+
+    COLUMNAS_PARCIALES = ['suma', 'filas', 'no_nulos']
+
+    def aggregate(self, df: pd.DataFrame, claves: Claves, columna: str = 'total') -> pd.DataFrame:
+        """Devuelve los agregados parciales de `columna` indexados por `claves`"""
+        # Cada agregación es una etapa de un análisis de una sola pasada: se puede cortar entre ellas
+        checkpoint()
+        claves = [claves] if isinstance(claves, str) else list(claves)
+        grupos = df.groupby(claves, sort=False, dropna=False, observed=True)[columna]
+        parcial = grupos.agg(['sum', 'size', 'count'])
+        parcial.columns = self.COLUMNAS_PARCIALES
+        return parcial
+
+    def merge(self, *parciales: pd.DataFrame) -> pd.DataFrame:
+        """Combina agregados parciales de la misma clave (p.ej. de distintos chunks)"""
+        parciales = [p for p in parciales if p is not None]
+        if not parciales:
+            return None
+        if len(parciales) == 1:
+            return parciales[0]
+        combinado = pd.concat(parciales)
+        niveles = list(range(combinado.index.nlevels))
+        return combinado.groupby(level=niveles, sort=False, dropna=False).sum()
+
+    def to_dict(self, parcial: pd.DataFrame) -> Dict:
+        """Convierte un parcial al formato JSON de los analizadores (anidado si hay varias claves)"""
+        resultado = {}
+        if parcial is None:
+            return resultado
+        multiple = parcial.index.nlevels > 1
+        for clave, suma, filas, no_nulos in zip(parcial.index, parcial['suma'], parcial['filas'], parcial['no_nulos']):
+            entrada = {
+                'total': float(suma),
+                'transacciones': int(filas),
+                'ticket_promedio': float(suma / no_nulos) if no_nulos > 0 else float('nan')
+            }
+            if multiple:
+                destino = resultado
+                for nivel in clave[:-1]:
+                    destino = destino.setdefault(str(nivel), {})
+                destino[str(clave[-1])] = entrada
+            else:
+                resultado[str(clave)] = entrada
+        return resultado
+
+    def breakdown(self, df: pd.DataFrame, claves: Claves, columna: str = 'total') -> Dict:
+        """Atajo: agrega y convierte a dict en un solo paso"""
+        return self.to_dict(self.aggregate(df, claves, columna))
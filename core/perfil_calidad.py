@@ -0,0 +1,101 @@
+"""PERFIL DE CALIDAD - Nulos, duplicados, negativos y columnas en una pasada
+
+El perfil de cada chunk se calcula una sola vez por MarcoAnalisis (memo) y
+lo consumen tanto el DataValidator como el AnalizadorAuditoria, así que el
+hash de filas completas (lo más caro del pipeline) se hace una sola vez.
+El estado acumulado sigue el protocolo new_state / fold / merge y también
+es uno solo: por chunks lo pliega core/streaming una vez (PERFIL_CLAVE) y
+sobre un solo marco queda en su memo (frame_state); ambos finalizan desde
+el mismo estado, con un único conjunto de hashes.
+"""
+import pandas as pd
+import logging
+from typing import Dict
+
+from core.marco_analisis import MarcoAnalisis
+from core.streaming import VACIO, hash_rows, unique_hashes, fold_unique, merge_hashes
+
+logger = logging.getLogger(__name__)
+
+# Columnas numéricas en las que un valor negativo es un error de rango
+COLUMNAS_RANGO = ['precio_venta', 'costo', 'cantidad']
+
+
+def frame_profile(frame: MarcoAnalisis) -> Dict:
+    """Perfil de un chunk (memoizado en el marco)"""
+    return frame.memo('perfil_calidad', _compute_profile)
+
+
+def frame_state(frame: MarcoAnalisis) -> Dict:
+    """Estado plegado de un solo marco (memoizado: el validador y la auditoría lo comparten)"""
+    perfil = PerfilCalidad()
+    return frame.memo('perfil_estado', lambda marco: perfil.fold(perfil.new_state(), marco))
+
+
+def _compute_profile(frame: MarcoAnalisis) -> Dict:
+    df = frame.base
+    nulos = df.isna().sum()
+    unicos, duplicados = unique_hashes(hash_rows(df))
+
+    negativos = {}
+    for i, col in enumerate(df.columns):
+        serie = df.iloc[:, i]
+        if col in COLUMNAS_RANGO and pd.api.types.is_numeric_dtype(serie.dtype):
+            negativos[col] = negativos.get(col, 0) + int((serie < 0).sum())
+
+    return {
+        'filas': len(df),
+        'celdas': len(df) * len(df.columns),
+        'nulos': int(nulos.sum()),
+        'nulos_por_columna': {col: int(n) for col, n in nulos.groupby(level=0, sort=False).sum().items()},
+        'hashes': unicos,
+        'duplicados_mascara': duplicados,
+        'duplicados': int(duplicados.sum()),
+        'negativos': negativos,
+        'columnas': list(dict.fromkeys(df.columns))
+    }
+
+
+class PerfilCalidad:
+    """Estado de calidad acumulado sobre uno o más chunks"""
+
+    # Se pliega antes que los demás analizadores del chunk (ver run_analyzers)
+    PERFIL = True
+
+    def new_state(self) -> Dict:
+        return {'filas': 0, 'celdas': 0, 'nulos': 0, 'nulos_por_columna': {}, 'duplicados': 0,
+                'hashes': VACIO, 'negativos': {}, 'columnas': []}
+
+    def fold(self, state: Dict, frame: MarcoAnalisis) -> Dict:
+        perfil = frame_profile(frame)
+        state['filas'] += perfil['filas']
+        state['celdas'] += perfil['celdas']
+        state['nulos'] += perfil['nulos']
+        _add_counts(state['nulos_por_columna'], perfil['nulos_por_columna'])
+        state['hashes'], ya_vistos = fold_unique(state['hashes'], perfil['hashes'])
+        state['duplicados'] += perfil['duplicados'] + ya_vistos
+        _add_counts(state['negativos'], perfil['negativos'])
+        state['columnas'] += [col for col in perfil['columnas'] if col not in state['columnas']]
+        return state
+
+    def merge(self, a: Dict, b: Dict) -> Dict:
+        hashes, comunes = merge_hashes(a['hashes'], b['hashes'])
+        nulos_por_columna = dict(a['nulos_por_columna'])
+        _add_counts(nulos_por_columna, b['nulos_por_columna'])
+        negativos = dict(a['negativos'])
+        _add_counts(negativos, b['negativos'])
+        return {
+            'filas': a['filas'] + b['filas'],
+            'celdas': a['celdas'] + b['celdas'],
+            'nulos': a['nulos'] + b['nulos'],
+            'nulos_por_columna': nulos_por_columna,
+            'duplicados': a['duplicados'] + b['duplicados'] + comunes,
+            'hashes': hashes,
+            'negativos': negativos,
+            'columnas': a['columnas'] + [col for col in b['columnas'] if col not in a['columnas']]
+        }
+
+
+def _add_counts(destino: Dict, origen: Dict):
+    for col, n in origen.items():
+        destino[col] = destino.get(col, 0) + n
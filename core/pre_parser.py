@@ -3,15 +3,30 @@ Script 1: PRE-PARSER - Convertidor Universal de Formatos
 Detecta y convierte: CSV, JSON, TSV, TXT, Excel → CSV normalizado
 """
 
+import numpy as np
 import pandas as pd
-import json
+from pandas.api.types import union_categoricals
+import os
 import re
 import logging
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.lector_txt import LectorTxt
+from core.lector_excel import LectorExcel
+from core.lector_json import LectorJson
+from core.dialecto_csv import DetectorDialecto
+from core.registro_layouts import MapaColumnas, RegistroLayouts, header_signature, registro_layouts
+from core.punto_control import checkpoint
 
 logger = logging.getLogger(__name__)
 
+# Modo compacto por defecto (categóricas + numéricos reducidos sin pérdida)
+COMPACT_DEFAULT = os.environ.get("MVN_COMPACT", "0") == "1"
+
+# Filas por bloque al leer un CSV entero (entre bloques se puede cortar el job)
+CSV_BLOQUE_FILAS = 500_000
+
 class PreParser:
     """Convertidor universal de formatos a CSV estándar"""
     
@@ -20,21 +35,94 @@ class PreParser:
         'precio_venta': float,
         'cantidad': int,
         'costo': float,
-        'sucursal': str
+        'sucursal': str,
+        'cliente': str,
+        'fecha': pd.Timestamp,
+        'hora': pd.Timedelta
+    }
+    
+    COLUMN_MAP = {
+        'product line': 'producto', 'Product line': 'producto', 'PRODUCTO': 'producto',
+        'unit price': 'precio_venta', 'Unit price': 'precio_venta', 'price': 'precio_venta',
+        'quantity': 'cantidad', 'Quantity': 'cantidad', 'Qty': 'cantidad',
+        'cogs': 'costo', 'costo': 'costo', 'Costo': 'costo', 'cost': 'costo',
+        'branch': 'sucursal', 'Branch': 'sucursal', 'sucursal': 'sucursal', 'tienda': 'sucursal',
+        'cliente': 'cliente', 'Cliente': 'cliente', 'id_cliente': 'cliente', 'customer': 'cliente',
+        'customer_id': 'cliente', 'Customer ID': 'cliente', 'client_id': 'cliente',
+        'Date': 'fecha', 'date': 'fecha', 'fecha': 'fecha', 'Fecha': 'fecha', 'FECHA': 'fecha',
+        'datetime': 'fecha', 'timestamp': 'fecha', 'order_date': 'fecha', 'Order Date': 'fecha',
+        'Time': 'hora', 'time': 'hora', 'hora': 'hora', 'Hora': 'hora',
     }
     
-    def parse(self, file_path: str) -> Dict:
+    # Números con moneda o unidades: se deja sólo dígitos, signo y separadores
+    PATRON_NO_NUMERICO = re.compile(r'[^\d,.\-]')
+    
+    # Fechas dd/mm/aaaa o mm/dd/aaaa (el orden se decide con el primer valor que no es ambiguo)
+    PATRON_FECHA = re.compile(r'^\s*(\d{1,2})[/.-](\d{1,2})[/.-]\d{2,4}')
+    
+    # Tipos aplicados al leer un CSV con plan (ver _plan_csv). Fechas y horas
+    # como texto: con separador de miles '.', "01.02.2024" se leería como número
+    PLAN_DTYPES = {
+        'producto': 'category',
+        'sucursal': 'category',
+        'fecha': 'object',
+        'hora': 'object'
+    }
+    
+    # Líneas de título que puede haber antes del encabezado de un layout conocido
+    MAX_FILAS_TITULO = 20
+    
+    # Columnas de texto que se codifican como categóricas en modo compacto
+    COLUMNAS_CATEGORICAS = ('producto', 'sucursal', 'cliente')
+    
+    FORMATOS_POR_EXTENSION = {
+        '.csv': 'csv', '.tsv': 'csv',
+        '.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl',
+        '.txt': 'txt',
+        '.xlsx': 'excel', '.xls': 'excel'
+    }
+    
+    def __init__(self, compact: Optional[bool] = None, hojas: Optional[str] = None,
+                 layouts: Optional[RegistroLayouts] = None):
+        self.compact = COMPACT_DEFAULT if compact is None else compact
+        # Hojas de Excel a leer: None la primera, '*' todas, o nombres/posiciones separados por comas
+        self.hojas = hojas
+        # Bytes de los DataFrames normalizados (suma de chunks), antes y después de compactar
+        self.memoria = {'antes': 0, 'despues': 0}
+        # Registros JSON mal formados que se saltaron (suma de chunks)
+        self.registros_invalidos = 0
+        # Orden día/mes de las fechas, fijo para todos los chunks de un archivo
+        self.dayfirst: Optional[bool] = None
+        # Opciones de lectura del último CSV (encoding, separadores, encabezado)
+        self.dialecto: Optional[Dict] = None
+        # Layouts conocidos por firma de encabezado y mapeo de nombres sin mayúsculas ni acentos
+        self.layouts = layouts or registro_layouts()
+        self.mapa = MapaColumnas(self.COLUMN_MAP, self.STANDARD_COLUMNS, self.layouts)
+        # Layout del último CSV ({'firma', 'conocido'}) y columnas numéricas a limpiar
+        self.layout: Optional[Dict] = None
+        self.limpieza: Dict[str, Dict] = {}
+    
+    def detect_format(self, file_path: str, formato: Optional[str] = None) -> str:
+        """Formato por extensión; si no hay una conocida, usa el detectado en el upload"""
+        file_ext = Path(file_path).suffix.lower()
+        if file_ext in self.FORMATOS_POR_EXTENSION:
+            return self.FORMATOS_POR_EXTENSION[file_ext]
+        if formato:
+            return formato
+        return 'txt' if file_ext == '' else 'csv'
+    
+    def parse(self, file_path: str, formato: Optional[str] = None) -> Dict:
         """Parse un archivo en cualquier formato"""
         try:
-            file_ext = Path(file_path).suffix.lower()
+            formato = self.detect_format(file_path, formato)
             
-            if file_ext == '.csv':
-                return self._parse_csv(file_path)
-            elif file_ext == '.json':
+            if formato == 'json':
                 return self._parse_json(file_path)
-            elif file_ext in ['.txt', '']:
+            elif formato == 'jsonl':
+                return self._parse_json_lines(file_path)
+            elif formato == 'txt':
                 return self._parse_txt(file_path)
-            elif file_ext in ['.xlsx', '.xls']:
+            elif formato == 'excel':
                 return self._parse_excel(file_path)
             else:
                 return self._parse_csv(file_path)
@@ -43,64 +131,263 @@ class PreParser:
             logger.error(f"Error parsing {file_path}: {e}")
             return {'status': 'error', 'error': str(e), 'format_detected': 'unknown'}
     
+    def iter_chunks(self, file_path: str, chunksize: int = 100_000,
+                    formato: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """Lee el archivo en chunks normalizados de a lo sumo `chunksize` filas"""
+        formato = self.detect_format(file_path, formato)
+        
+        if formato == 'txt':
+            yield from self._iter_txt(file_path, chunksize)
+        elif formato in ['json', 'jsonl']:
+            lector = self._json()
+            try:
+                for chunk in lector.iter_frames(file_path, chunksize):
+                    yield self._normalize_columns(chunk)
+            finally:
+                self.registros_invalidos += lector.invalidos
+        elif formato == 'excel':
+            for chunk in self._excel().iter_frames(file_path, chunksize, self.hojas):
+                yield self._normalize_columns(chunk)
+        else:
+            opciones, plan = self._csv_read(file_path)
+            if plan is None:
+                for chunk in pd.read_csv(file_path, chunksize=chunksize, **opciones):
+                    yield self._normalize_columns(chunk)
+                return
+            reader = pd.read_csv(file_path, chunksize=chunksize, usecols=plan['usecols'],
+                                 dtype=plan['dtype'], **opciones)
+            for chunk in reader:
+                yield self._finish_planned(chunk, plan)
+    
+    def _iter_txt(self, file_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+        for chunk in LectorTxt().iter_frames(file_path, chunksize):
+            yield self._normalize_columns(chunk)
+    
     def _parse_csv(self, file_path: str) -> Dict:
         """Parse CSV"""
         try:
-            df = pd.read_csv(file_path, encoding='utf-8')
-            normalized = self._normalize_columns(df)
+            opciones, plan = self._csv_read(file_path)
+            if plan is None:
+                normalized = self._normalize_columns(self._read_csv_blocks(file_path, **opciones))
+            else:
+                df = self._read_csv_blocks(file_path, usecols=plan['usecols'], dtype=plan['dtype'], **opciones)
+                normalized = self._finish_planned(df, plan)
             return {
                 'data': normalized,
                 'format_detected': 'csv',
                 'rows': len(normalized),
                 'columns': list(normalized.columns),
+                'dialect': opciones,
+                'layout': self.layout,
                 'status': 'success'
             }
         except Exception as e:
             return {'status': 'error', 'error': str(e), 'format_detected': 'csv'}
     
-    def _parse_json(self, file_path: str) -> Dict:
-        """Parse JSON"""
+    @staticmethod
+    def _read_csv_blocks(file_path: str, **opciones) -> pd.DataFrame:
+        """CSV entero leído por bloques, con un punto de control entre bloques"""
+        partes = []
+        for parte in pd.read_csv(file_path, chunksize=CSV_BLOQUE_FILAS, **opciones):
+            partes.append(parte)
+            checkpoint()
+        if len(partes) == 1:
+            return partes[0]
+        # Cada bloque tiene sus propias categorías: se unen (ordenadas, como en una sola lectura)
+        for columna in [c for c in partes[0].columns if isinstance(partes[0][c].dtype, pd.CategoricalDtype)]:
+            categorias = union_categoricals([p[columna] for p in partes], sort_categories=True).categories
+            for parte in partes:
+                parte[columna] = parte[columna].cat.set_categories(categorias)
+        return pd.concat(partes, ignore_index=True)
+    
+    def _csv_read(self, file_path: str) -> Tuple[Dict, Optional[Dict]]:
+        """
+        Opciones de read_csv y plan de columnas. Con un encabezado ya
+        registrado salen del layout (sólo se detecta el encoding); si no, se
+        detectan con una muestra (ver core/dialecto_csv.py) y se registran.
+        Un encabezado con acentos leído con un encoding dudoso no se registra:
+        sus nombres y su firma dependen de ese encoding.
+        """
+        detector = DetectorDialecto(self.mapa, self.STANDARD_COLUMNS)
+        muestra, completa = detector.read_sample(file_path)
+        encoding, encoding_seguro = detector.guess_encoding(muestra)
+        lineas = detector.first_lines(muestra, encoding, self.MAX_FILAS_TITULO + 1)
+        firma, layout = self._known_layout(lineas)
+        
+        if layout is not None:
+            # Nombres del layout: el mismo encabezado puede venir con otras mayúsculas o acentos
+            opciones = dict(layout['dialecto'], encoding=encoding, encoding_errors='replace',
+                            names=layout['encabezado'])
+            plan = {'usecols': layout['usecols'], 'nombres': layout['mapeo'], 'dtype': layout['dtypes']}
+            self.limpieza = layout.get('limpieza', {})
+            if self.dayfirst is None:
+                self.dayfirst = layout.get('dayfirst')
+            self.layout = {'firma': firma, 'conocido': True}
+        else:
+            opciones = detector.detect_sample(muestra, completa, encoding, nombre=Path(file_path).name)
+            plan = self._plan_csv(file_path, opciones)
+            self.limpieza = self._detect_values(file_path, opciones, plan) if plan else {}
+            # La firma es la de la fila de encabezado, no la de un título previo
+            skiprows = opciones['skiprows']
+            firma = header_signature(lineas[skiprows]) if skiprows < len(lineas) else None
+            self.layout = {'firma': firma, 'conocido': False}
+            if firma is not None and not encoding_seguro and not lineas[skiprows].isascii():
+                logger.warning(f"CSV {Path(file_path).name}: encabezado leído con encoding dudoso "
+                               f"({encoding}), no se registra el layout")
+                firma = None
+            if plan is not None and opciones['header'] == 0 and firma is not None:
+                self._register_layout(firma, {
+                    'formato': 'csv',
+                    'encabezado': plan['encabezado'],
+                    'mapeo': plan['nombres'],
+                    'usecols': plan['usecols'],
+                    'dtypes': plan['dtype'],
+                    'dialecto': {k: v for k, v in opciones.items() if k not in ('encoding', 'encoding_errors')},
+                    'limpieza': self.limpieza,
+                    'dayfirst': self.dayfirst
+                })
+        self.dialecto = opciones
+        return dict(opciones), plan
+    
+    def _known_layout(self, lineas: List[str]) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        (firma, layout) del encabezado registrado en estas líneas. Un layout
+        sólo vale si su encabezado está en la misma línea que cuando se
+        registró (sus `skiprows`): una línea de título nunca lo identifica.
+        """
+        for i, linea in enumerate(lineas):
+            if not linea.strip():
+                continue
+            firma = header_signature(linea)
+            layout = self.layouts.get(firma)
+            if layout is not None and layout['dialecto'].get('skiprows', 0) == i:
+                return firma, layout
+        return None, None
+    
+    def _register_layout(self, firma: str, layout: Dict):
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if isinstance(data, list):
-                df = pd.DataFrame(data)
-            elif isinstance(data, dict):
-                df = pd.DataFrame([data])
-            else:
-                raise ValueError("JSON debe ser lista de objetos o un objeto")
+            self.layouts.register(firma, layout)
+        except (OSError, TimeoutError) as e:
+            # Sin registro se sigue leyendo igual, sólo que sin atajo la próxima vez
+            logger.warning(f"No se pudo registrar el layout {firma}: {e}")
+    
+    def _plan_csv(self, file_path: str, opciones: Dict) -> Optional[Dict]:
+        """
+        Plan de lectura a partir del encabezado: posiciones de las columnas
+        estándar (usecols), su nombre normalizado y el dtype a aplicar al leer.
+        None si no hay columnas estándar; en ese caso se lee todo y se
+        normaliza como siempre.
+        """
+        header = [str(c) for c in pd.read_csv(file_path, nrows=0, **opciones).columns]
+        nombres = self._mapping(header)
+        if not nombres:
+            return None
+        usecols = [i for i, col in enumerate(header) if col in nombres]
+        dtype = {col: self.PLAN_DTYPES[n] for col, n in nombres.items() if n in self.PLAN_DTYPES}
+        if len(nombres) < len(header):
+            logger.info(f"CSV {Path(file_path).name}: leyendo {len(nombres)} de {len(header)} columnas")
+        return {'usecols': usecols, 'nombres': nombres, 'dtype': dtype, 'encabezado': header}
+    
+    def _detect_values(self, file_path: str, opciones: Dict, plan: Dict, filas: int = 500) -> Dict[str, Dict]:
+        """
+        Con las primeras filas: el orden día/mes de las fechas y las columnas
+        numéricas que sólo se leen como número quitando moneda o unidades.
+        """
+        muestra = pd.read_csv(file_path, nrows=filas, usecols=plan['usecols'], dtype=plan['dtype'], **opciones)
+        for col, nombre in plan['nombres'].items():
+            if nombre == 'fecha' and self.dayfirst is None:
+                self.dayfirst = self._detect_dayfirst(muestra[col].dropna().astype(str))
+        limpieza = {}
+        for col, nombre in plan['nombres'].items():
+            if self.STANDARD_COLUMNS[nombre] not in (float, int) or muestra[col].dtype != object:
+                continue
+            valores = muestra[col].dropna()
+            limpios = self._clean_numbers(valores, opciones['decimal'])
+            if len(valores) and limpios.notna().sum() > pd.to_numeric(valores, errors='coerce').notna().sum():
+                limpieza[nombre] = {'decimal': opciones['decimal']}
+        if limpieza:
+            logger.info(f"CSV {Path(file_path).name}: se quitan moneda / unidades de {', '.join(limpieza)}")
+        return limpieza
+    
+    def _clean_numbers(self, serie: pd.Series, decimal: str = '.') -> pd.Series:
+        """"$ 1.234,56" → 1234.56: quita todo salvo dígitos, signo y separadores"""
+        texto = serie.astype(str).str.replace(self.PATRON_NO_NUMERICO, '', regex=True)
+        if decimal == ',':
+            texto = texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        else:
+            texto = texto.str.replace(',', '', regex=False)
+        return pd.to_numeric(texto.where(serie.notna()), errors='coerce')
+    
+    def _mapping(self, columnas: List) -> Dict:
+        """Columna original → estándar, una por estándar (ver _sources)"""
+        return {columnas[posiciones[0]]: nombre for nombre, posiciones in self._sources(columnas).items()}
+    
+    def _sources(self, columnas: List) -> Dict[str, List[int]]:
+        """
+        Posiciones de las columnas que dan cada columna estándar (exacta o sin
+        mayúsculas ni acentos): primero las coincidencias exactas, después en
+        el orden del encabezado. Ordenado por la primera posición.
+        """
+        fuentes: Dict[str, List[int]] = {}
+        for exacta in (True, False):
+            for i, col in enumerate(columnas):
+                nombre = self.COLUMN_MAP.get(col, col) if exacta else self.mapa.get(col, col)
+                if nombre in self.STANDARD_COLUMNS and i not in fuentes.get(nombre, ()):
+                    fuentes.setdefault(nombre, []).append(i)
+        return dict(sorted(fuentes.items(), key=lambda item: min(item[1])))
+    
+    def _finish_planned(self, df: pd.DataFrame, plan: Dict) -> pd.DataFrame:
+        """Completa una lectura con plan: mismos valores que _normalize_columns"""
+        df = df.rename(columns=plan['nombres'])
+        for col in df.columns:
+            if self.PLAN_DTYPES.get(col) == 'category':
+                categorias = df[col].cat.categories
+                if len(categorias) and pd.to_numeric(categorias, errors='coerce').notna().all():
+                    # Sin el dtype, read_csv habría inferido una columna numérica
+                    df[col] = pd.to_numeric(df[col].astype(object))
+        df = self._coerce_types(df)
+        if 'cantidad' in df.columns and pd.api.types.is_integer_dtype(df['cantidad']):
+            # Int32 si todos los valores entran (el Int32 de read_csv no controla overflow)
+            rango = np.iinfo(np.int32)
+            minimo, maximo = df['cantidad'].min(), df['cantidad'].max()
+            if pd.isna(minimo) or (minimo >= rango.min and maximo <= rango.max):
+                df['cantidad'] = df['cantidad'].astype('Int32')
+        return self._finish(df)
+    
+    def _parse_json(self, file_path: str, formato: str = 'json') -> Dict:
+        """Parse JSON: arreglo de objetos, un objeto o JSON Lines (registros inválidos se saltan)"""
+        try:
+            lector = self._json()
+            df = lector.read(file_path)
+            self.registros_invalidos += lector.invalidos
+            if df.empty and lector.invalidos:
+                raise ValueError("JSON sin registros válidos: debe ser lista de objetos, un objeto o JSON Lines")
             
             normalized = self._normalize_columns(df)
             return {
                 'data': normalized,
-                'format_detected': 'json',
+                'format_detected': formato,
                 'rows': len(normalized),
                 'columns': list(normalized.columns),
+                'invalid_records': lector.invalidos,
                 'status': 'success'
             }
         except Exception as e:
-            return {'status': 'error', 'error': str(e), 'format_detected': 'json'}
+            return {'status': 'error', 'error': str(e), 'format_detected': formato}
+    
+    def _parse_json_lines(self, file_path: str) -> Dict:
+        """Parse JSON Lines (un objeto por línea)"""
+        return self._parse_json(file_path, 'jsonl')
+    
+    def _json(self) -> LectorJson:
+        return LectorJson(self.mapa, self.STANDARD_COLUMNS)
     
     def _parse_txt(self, file_path: str) -> Dict:
         """Parse TXT con formatos mixtos"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            records = []
-            lines = content.split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith('-') or line.startswith('#'):
-                    continue
-                record = self._parse_line(line)
-                if record:
-                    records.append(record)
+            df = LectorTxt().read(file_path)
             
-            if records:
-                df = pd.DataFrame(records)
+            if len(df):
                 normalized = self._normalize_columns(df)
                 return {
                     'data': normalized,
@@ -117,7 +404,7 @@ class PreParser:
     def _parse_excel(self, file_path: str) -> Dict:
         """Parse Excel"""
         try:
-            df = pd.read_excel(file_path)
+            df = self._excel().read(file_path, self.hojas)
             normalized = self._normalize_columns(df)
             return {
                 'data': normalized,
@@ -129,61 +416,139 @@ class PreParser:
         except Exception as e:
             return {'status': 'error', 'error': str(e), 'format_detected': 'excel'}
     
-    def _parse_line(self, line: str) -> Optional[Dict]:
-        """Parsea una línea"""
-        record = {}
-        patterns = [
-            r'(\w+)\s*[=:]\s*([^\|,]+)',
-            r'(\w+)\s+([^|,]+)',
-        ]
-        
-        line = line.replace('€', '').replace('ñ', 'n').replace('é', 'e')
-        
-        if '|' in line:
-            parts = [p.strip() for p in line.split('|')]
-            for part in parts:
-                for pattern in patterns:
-                    match = re.search(pattern, part)
-                    if match:
-                        key = match.group(1).lower().replace(' ', '_')
-                        value = match.group(2).strip().replace('$', '')
-                        record[key] = value
-        
-        elif ':' in line or '=' in line:
-            for pattern in patterns:
-                for match in re.finditer(pattern, line):
-                    key = match.group(1).lower().replace(' ', '_')
-                    value = match.group(2).strip().replace('$', '')
-                    record[key] = value
-        
-        return record if record else None
+    def _excel(self) -> LectorExcel:
+        return LectorExcel(self.mapa, self.STANDARD_COLUMNS)
     
     def _normalize_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Normaliza nombres de columnas"""
-        column_map = {
-            'product line': 'producto', 'Product line': 'producto', 'PRODUCTO': 'producto',
-            'unit price': 'precio_venta', 'Unit price': 'precio_venta', 'price': 'precio_venta',
-            'quantity': 'cantidad', 'Quantity': 'cantidad', 'Qty': 'cantidad',
-            'cogs': 'costo', 'costo': 'costo', 'Costo': 'costo', 'cost': 'costo',
-            'branch': 'sucursal', 'Branch': 'sucursal', 'sucursal': 'sucursal', 'tienda': 'sucursal',
-        }
-        
-        df.rename(columns=column_map, inplace=True)
-        valid_cols = [col for col in df.columns if col in self.STANDARD_COLUMNS]
-        if valid_cols:
-            df = df[valid_cols]
+        fuentes = self._sources(list(df.columns))
+        if fuentes:
+            columnas = {}
+            for nombre, posiciones in fuentes.items():
+                serie = df.iloc[:, posiciones[0]]
+                # Hojas o registros con otro encabezado: cada fuente completa los nulos de la anterior
+                for i in posiciones[1:]:
+                    serie = serie.astype(object).fillna(df.iloc[:, i].astype(object))
+                columnas[nombre] = serie
+            df = pd.DataFrame(columnas, index=df.index)
         
+        return self._finish(self._coerce_types(df))
+    
+    def _coerce_types(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Convierte las columnas estándar numéricas (valores inválidos → NaN)"""
         for col in df.columns:
             if col in self.STANDARD_COLUMNS:
                 try:
+                    if col in self.limpieza and df[col].dtype == object:
+                        df[col] = self._clean_numbers(df[col], self.limpieza[col]['decimal'])
                     if self.STANDARD_COLUMNS[col] == float:
                         df[col] = pd.to_numeric(df[col], errors='coerce')
                     elif self.STANDARD_COLUMNS[col] == int:
                         df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+                    elif self.STANDARD_COLUMNS[col] == pd.Timestamp:
+                        df[col] = self._parse_dates(df[col])
                 except:
                     pass
         
+        if 'hora' in df.columns:
+            # La hora se suma a la fecha (Date + Time de "Supermarket sales")
+            if 'fecha' in df.columns and pd.api.types.is_datetime64_any_dtype(df['fecha']):
+                df['fecha'] = df['fecha'] + self._parse_times(df['hora']).fillna(pd.Timedelta(0))
+            df = df.drop(columns='hora')
+        return df
+    
+    def _parse_dates(self, serie: pd.Series) -> pd.Series:
+        """Fechas a datetime64[ns] sin zona; cada valor distinto se parsea una sola vez"""
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie.dt.tz_localize(None) if serie.dt.tz is not None else serie
+        codigos, unicos = pd.factorize(serie.astype(object), sort=False)
+        textos = pd.Series(unicos, dtype=object).astype(str)
+        if self.dayfirst is None:
+            self.dayfirst = self._detect_dayfirst(textos)
+        fechas = pd.to_datetime(textos, errors='coerce', dayfirst=bool(self.dayfirst))
+        if fechas.dt.tz is not None:
+            fechas = fechas.dt.tz_convert(None)
+        valores = fechas.to_numpy(dtype='datetime64[ns]').take(codigos)
+        valores[codigos < 0] = np.datetime64('NaT')
+        return pd.Series(valores, index=serie.index, name=serie.name)
+    
+    def _detect_dayfirst(self, textos: pd.Series) -> Optional[bool]:
+        """True si algún valor es dd/mm, False si alguno es mm/dd, None si todos son ambiguos"""
+        partes = textos.str.extract(self.PATRON_FECHA).dropna().astype(int)
+        if partes.empty:
+            return None
+        if (partes[0] > 12).any():
+            return True
+        if (partes[1] > 12).any():
+            return False
+        return None
+    
+    @staticmethod
+    def _parse_times(serie: pd.Series) -> pd.Series:
+        """Horas "HH:MM" o "HH:MM:SS" a timedelta (inválidas → NaT)"""
+        codigos, unicos = pd.factorize(serie.astype(object), sort=False)
+        textos = pd.Series(unicos, dtype=object).astype(str).str.strip()
+        textos = textos.where(textos.str.count(':') != 1, textos + ':00')
+        horas = pd.to_timedelta(textos, errors='coerce').to_numpy(dtype='timedelta64[ns]').take(codigos)
+        horas[codigos < 0] = np.timedelta64('NaT')
+        return pd.Series(horas, index=serie.index, name=serie.name)
+
+    def _finish(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Compacta si corresponde y registra la memoria del DataFrame normalizado"""
+        antes = int(df.memory_usage(deep=True).sum())
+        if self.compact:
+            df = self._compact(df)
+            despues = int(df.memory_usage(deep=True).sum())
+        else:
+            despues = antes
+        self.memoria['antes'] += antes
+        self.memoria['despues'] += despues
+        return df
+    
+    def _compact(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Representación compacta con los mismos valores: texto repetido como
+        categórica, enteros al ancho mínimo y float32 sólo si es exacto.
+        Las columnas derivadas se calculan en float64, así que los agregados
+        no cambian.
+        """
+        df = df.copy(deep=False)
+        for i, col in enumerate(df.columns):
+            serie = df.iloc[:, i]
+            dtype = serie.dtype
+            if col in self.COLUMNAS_CATEGORICAS and dtype == object:
+                if pd.api.types.infer_dtype(serie, skipna=True) == 'string' and serie.nunique() <= len(serie) // 2:
+                    df.isetitem(i, serie.astype('category'))
+            elif pd.api.types.is_integer_dtype(dtype):
+                df.isetitem(i, self._downcast_int(serie))
+            elif dtype == np.float64:
+                reducida = serie.to_numpy().astype(np.float32)
+                if np.array_equal(reducida.astype(np.float64), serie.to_numpy(), equal_nan=True):
+                    df.isetitem(i, pd.Series(reducida, index=serie.index))
         return df
+    
+    @staticmethod
+    def _downcast_int(serie: pd.Series) -> pd.Series:
+        minimo, maximo = serie.min(), serie.max()
+        if pd.isna(minimo):
+            return serie
+        for bits in (8, 16, 32):
+            rango = np.iinfo(f'int{bits}')
+            if minimo >= rango.min and maximo <= rango.max:
+                if pd.api.types.is_extension_array_dtype(serie.dtype):
+                    return serie.astype(f'Int{bits}')
+                return serie.astype(f'int{bits}')
+        return serie
+    
+    def memory_report(self) -> Dict:
+        """Memoria del dataset normalizado antes y después de compactar"""
+        antes, despues = self.memoria['antes'], self.memoria['despues']
+        return {
+            'compact': self.compact,
+            'bytes_antes': antes,
+            'bytes_despues': despues,
+            'reduccion_pct': round((1 - despues / antes) * 100, 2) if antes else 0.0
+        }
 
 def run():
     """Función requerida"""
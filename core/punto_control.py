@@ -0,0 +1,41 @@
+"""PUNTO DE CONTROL - Corte cooperativo de etapas largas
+
+Los lectores llaman a checkpoint() cada FILAS_CONTROL registros y los
+analizadores antes de empezar, también dentro de un parse o un análisis
+de una sola pasada (sin chunks). Fuera de un job no hace nada; el worker
+de la API instala con set_checkpoint() una función que lanza Interrupcion
+si el job se canceló o venció su plazo.
+
+Interrupcion deriva de BaseException (como asyncio.CancelledError) para
+que los `except Exception` de lectores y analizadores, que convierten un
+error en un resultado con status 'error', no la traguen.
+"""
+from typing import Callable, Optional
+
+# Registros entre puntos de control en los loops de lectura
+FILAS_CONTROL = 20_000
+
+_checkpoint: Optional[Callable[[], None]] = None
+
+
+class Interrupcion(BaseException):
+    """La etapa se cortó desde afuera; `status` es 'cancelled' o 'timed_out'"""
+
+    def __init__(self, status: str, mensaje: str = ""):
+        super().__init__(status, mensaje)
+        self.status = status
+
+    def __str__(self) -> str:
+        return self.args[1] or self.args[0]
+
+
+def set_checkpoint(funcion: Optional[Callable[[], None]]):
+    """Instala (o quita, con None) el punto de control del proceso"""
+    global _checkpoint
+    _checkpoint = funcion
+
+
+def checkpoint():
+    """Lanza Interrupcion si la función instalada lo pide"""
+    if _checkpoint is not None:
+        _checkpoint()
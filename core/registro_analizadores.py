@@ -0,0 +1,150 @@
+"""REGISTRO DE ANALIZADORES - Qué corre cada modo y con qué entradas
+
+Cada analizador de datos declara en su clase lo que lee del marco:
+
+    COLUMNAS    columnas base que necesita (sin ellas no se ejecuta)
+    DERIVADAS   columnas derivadas del MarcoAnalisis que usa
+    PERFIL      si usa el perfil de calidad (el paso más caro); su estado es
+                el perfil (`self.perfil`), que se pliega una vez y comparten
+
+y su salida es la sección del resultado con su nombre. Como no dependen
+unos de otros, corren en paralelo (ver core/streaming.run_analyzers).
+
+Los análisis posteriores no leen datos sino las secciones ya calculadas;
+declaran en `usa` las secciones que necesitan y corren después, en orden
+de dependencias.
+
+Un modo es un conjunto de análisis: los de MODOS, los definidos en
+MVN_MODOS (`resumen=ventas+clientes;margen=rentabilidad+auditoria`) o
+nombres unidos con `+` en la misma petición (`?modo=ventas+tendencias`).
+"""
+import os
+import time
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.analyzer_ventas import AnalizadorVentas
+from core.analyzer_rentabilidad import AnalizadorRentabilidad
+from core.analyzer_auditoria import AnalizadorAuditoria
+from core.analyzer_clientes import AnalizadorClientes
+from core.analyzer_tendencias import AnalizadorTendencias
+from validators.triple_validator import TripleValidator
+from validators.confidence_badge import ConfidenceBadge
+
+logger = logging.getLogger(__name__)
+
+
+class Posterior:
+    """Análisis sobre las secciones de otros análisis (`funcion(resultados)`)"""
+
+    def __init__(self, funcion: Callable[[Dict], Dict], usa: Iterable[str] = ()):
+        self.funcion = funcion
+        self.usa = tuple(usa)
+
+
+# Analizadores de datos, en el orden de las secciones del resultado
+ANALIZADORES: Dict[str, type] = {
+    'ventas': AnalizadorVentas,
+    'rentabilidad': AnalizadorRentabilidad,
+    'auditoria': AnalizadorAuditoria,
+    'clientes': AnalizadorClientes,
+    'tendencias': AnalizadorTendencias,
+}
+
+POSTERIORES: Dict[str, Posterior] = {
+    'triple_validacion': Posterior(lambda resultados: TripleValidator().validate(resultados)),
+    'confianza': Posterior(
+        lambda resultados: ConfidenceBadge().calculate(resultados, resultados['triple_validacion']),
+        usa=('triple_validacion',)
+    ),
+}
+
+MODOS: Dict[str, Tuple[str, ...]] = {
+    'completo': tuple(ANALIZADORES) + ('triple_validacion', 'confianza'),
+}
+
+
+def _parse_modes(texto: str) -> Dict[str, Tuple[str, ...]]:
+    """`nombre=a+b;otro=c` → {'nombre': ('a', 'b'), 'otro': ('c',)}"""
+    modos = {}
+    for definicion in filter(None, (d.strip() for d in texto.split(';'))):
+        nombre, _, analisis = definicion.partition('=')
+        if not nombre.strip() or not analisis.strip():
+            logger.warning(f"MVN_MODOS: definición inválida '{definicion}'")
+            continue
+        modos[nombre.strip()] = tuple(a.strip() for a in analisis.split('+') if a.strip())
+    return modos
+
+
+# Se validan al usarlos: pueden nombrar análisis registrados después (p.ej. desde la API)
+MODOS.update(_parse_modes(os.environ.get("MVN_MODOS", "")))
+
+
+def register_analyzer(nombre: str, clase: type):
+    """Agrega un analizador de datos (protocolo new_state / fold / merge / finalize)"""
+    ANALIZADORES[nombre] = clase
+
+
+def register_dependent(nombre: str, funcion: Callable[[Dict], Dict], usa: Iterable[str] = ()):
+    """Agrega un análisis posterior que lee las secciones `usa` del resultado"""
+    POSTERIORES[nombre] = Posterior(funcion, usa)
+
+
+def register_mode(nombre: str, analisis: Iterable[str]):
+    MODOS[nombre] = tuple(analisis)
+
+
+def resolve_mode(modo: str) -> Tuple[List[str], List[str]]:
+    """
+    (analizadores de datos, análisis posteriores) de un modo.
+
+    Incluye lo que declaran en `usa` los posteriores pedidos; los datos van
+    en el orden del registro y los posteriores después de lo que usan.
+    Lanza ValueError con un modo o análisis desconocido.
+    """
+    pedidos = MODOS.get(modo)
+    if pedidos is None:
+        pedidos = tuple(n.strip() for n in (modo or '').split('+') if n.strip())
+    desconocidos = [n for n in pedidos if n not in ANALIZADORES and n not in POSTERIORES]
+    if not pedidos or desconocidos:
+        raise ValueError(f"Modo desconocido: '{modo}'. Modos: {', '.join(available_modes())}")
+
+    datos = set(n for n in pedidos if n in ANALIZADORES)
+    posteriores: List[str] = []
+
+    def agregar(nombre: str, camino: Tuple[str, ...]):
+        if nombre in posteriores:
+            return
+        if nombre in camino:
+            raise ValueError(f"Dependencia circular: {' → '.join(camino + (nombre,))}")
+        for usado in POSTERIORES[nombre].usa:
+            if usado in POSTERIORES:
+                agregar(usado, camino + (nombre,))
+            elif usado in ANALIZADORES:
+                datos.add(usado)
+        posteriores.append(nombre)
+
+    for nombre in pedidos:
+        if nombre in POSTERIORES:
+            agregar(nombre, ())
+    return [n for n in ANALIZADORES if n in datos], posteriores
+
+
+def available_modes() -> List[str]:
+    """Modos con nombre más cada análisis por separado"""
+    return list(dict.fromkeys(list(MODOS) + list(ANALIZADORES) + list(POSTERIORES)))
+
+
+def run_dependents(nombres: Iterable[str], resultados: Dict,
+                   tiempos: Optional[Dict[str, float]] = None) -> Dict:
+    """Agrega a `resultados` la sección de cada análisis posterior (en el orden dado)"""
+    tiempos = {} if tiempos is None else tiempos
+    for nombre in nombres:
+        inicio = time.perf_counter()
+        try:
+            # Una copia: el reporte guarda las secciones y no debe contenerse a sí mismo
+            resultados[nombre] = POSTERIORES[nombre].funcion(dict(resultados))
+        except Exception as e:
+            resultados[nombre] = {'status': 'error', 'error': str(e)}
+        tiempos[nombre] = tiempos.get(nombre, 0.0) + time.perf_counter() - inicio
+    return resultados
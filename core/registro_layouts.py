@@ -0,0 +1,272 @@
+"""REGISTRO DE LAYOUTS - Encabezados ya vistos y cómo leerlos
+
+Los archivos de cada día vienen de unos pocos sistemas POS. Cada layout
+se identifica por la firma de su encabezado (sin mayúsculas, acentos ni
+puntuación) y guarda todo lo que hizo falta resolver la primera vez:
+
+    mapeo       nombre original → columna estándar
+    usecols     posiciones de las columnas estándar
+    dtypes      tipos a aplicar al leer
+    dialecto    separador, comillas, decimal, miles, filas a saltar
+    limpieza    columnas numéricas con moneda / unidades (`$ 1.234,56`)
+
+Un encabezado conocido pasa directo a la lectura planificada. Los nombres
+de columnas se comparan sin mayúsculas ni acentos (`PRECIO VENTA`,
+`Precio_Venta`) y se pueden agregar alias por la API.
+
+El registro vive en un JSON (MVN_LAYOUTS_FILE) compartido por la API y
+los workers: cada proceso lo relee cuando cambia.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+import threading
+import unicodedata
+import uuid
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LAYOUTS_FILE = os.environ.get("MVN_LAYOUTS_FILE", "layouts.json")
+LAYOUTS_MAX = int(os.environ.get("MVN_LAYOUTS_MAX", 1000))
+
+# Un lock más viejo que esto es de un proceso que murió
+LOCK_STALE_S = 60
+
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_name(nombre) -> str:
+    """Nombre de columna sin mayúsculas, acentos ni puntuación ("Precio_Venta ($)" → "precio venta")"""
+    texto = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode('ascii')
+    return _NO_ALFANUMERICO.sub(' ', texto.lower()).strip()
+
+
+def header_signature(encabezado: str) -> str:
+    """Firma de una línea de encabezado (sin mayúsculas, acentos ni espacios sobrantes)"""
+    texto = unicodedata.normalize('NFKD', encabezado.strip()).encode('ascii', 'ignore').decode('ascii')
+    texto = re.sub(r'\s+', ' ', texto.lower())
+    return hashlib.sha256(texto.encode()).hexdigest()[:16]
+
+
+class MapaColumnas:
+    """
+    Nombre de columna → columna estándar.
+
+    Primero el nombre exacto de `column_map`, después el nombre normalizado
+    contra los de `column_map`, las columnas estándar y los alias del
+    registro. Se usa como `column_map.get(nombre, nombre)`.
+    """
+
+    def __init__(self, column_map: Dict[str, str], columnas: Iterable[str], registro: 'RegistroLayouts'):
+        self.column_map = column_map
+        self.columnas = tuple(columnas)
+        self.registro = registro
+        self._version = object()
+        self._indice: Dict[str, str] = {}
+        self._resueltos: Dict[str, Optional[str]] = {}
+
+    def get(self, nombre, default=None):
+        if nombre in self.column_map:
+            return self.column_map[nombre]
+        if self._version != self.registro.version:
+            self._rebuild()
+        if nombre not in self._resueltos:
+            self._resueltos[nombre] = self._indice.get(normalize_name(nombre))
+        resuelto = self._resueltos[nombre]
+        return default if resuelto is None else resuelto
+
+    def _rebuild(self):
+        indice = {}
+        for columna in self.columnas:
+            indice[normalize_name(columna)] = columna
+        for nombre, columna in self.column_map.items():
+            indice.setdefault(normalize_name(nombre), columna)
+        # Los alias agregados por la API tienen prioridad
+        indice.update(self.registro.aliases())
+        self._indice = indice
+        self._resueltos = {}
+        self._version = self.registro.version
+
+
+class RegistroLayouts:
+    """Layouts por firma de encabezado y alias de columnas, persistidos en un JSON"""
+
+    def __init__(self, path: Optional[str] = None, max_layouts: Optional[int] = None):
+        self.path = Path(path or LAYOUTS_FILE)
+        self.max_layouts = max_layouts or LAYOUTS_MAX
+        self._datos = {'layouts': {}, 'aliases': {}}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Viaja a los procesos de lectura (MapaColumnas) sin el lock
+        estado = self.__dict__.copy()
+        del estado['_lock']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Cambia cuando cambia el archivo (lo relee si hace falta)"""
+        self._reload()
+        return self._mtime
+
+    def get(self, firma: str) -> Optional[Dict]:
+        self._reload()
+        return self._datos['layouts'].get(firma)
+
+    def list(self) -> List[Dict]:
+        self._reload()
+        return sorted(self._datos['layouts'].values(), key=lambda l: l.get('creado', ''))
+
+    def aliases(self) -> Dict[str, str]:
+        self._reload()
+        return dict(self._datos['aliases'])
+
+    def aliases_signature(self) -> str:
+        """Hash de los alias: cambian cómo se parsea un mismo archivo"""
+        aliases = self.aliases()
+        if not aliases:
+            return ''
+        return hashlib.sha256(json.dumps(aliases, sort_keys=True).encode()).hexdigest()[:8]
+
+    def register(self, firma: str, layout: Dict, origen: str = 'auto') -> Dict:
+        """Guarda el layout resuelto para `firma`"""
+        layout = dict(layout, firma=firma, origen=origen, creado=datetime.now().isoformat())
+
+        def agregar(datos):
+            layouts = datos['layouts']
+            layouts[firma] = layout
+            if len(layouts) > self.max_layouts:
+                # Se descartan los más viejos (se vuelven a aprender si reaparecen)
+                for viejo in sorted(layouts, key=lambda f: layouts[f].get('creado', ''))[:len(layouts) - self.max_layouts]:
+                    del layouts[viejo]
+
+        self._update(agregar)
+        logger.info(f"Layout {firma} registrado: {len(layout.get('mapeo', {}))} columnas estándar")
+        return layout
+
+    def delete(self, firma: str) -> bool:
+        """Olvida un layout (se vuelve a resolver en el próximo archivo)"""
+        self._reload()
+        existia = firma in self._datos['layouts']
+        self._update(lambda datos: datos['layouts'].pop(firma, None))
+        return existia
+
+    def add_alias(self, nombre: str, columna: str) -> Dict[str, str]:
+        """
+        `nombre` (comparado sin mayúsculas ni acentos) se lee como `columna`.
+        Los layouts que tienen esa columna se olvidan para resolverlos de nuevo.
+        """
+        clave = normalize_name(nombre)
+        if not clave:
+            raise ValueError("Nombre de columna vacío")
+
+        def agregar(datos):
+            datos['aliases'][clave] = columna
+            self._forget(datos, clave)
+
+        self._update(agregar)
+        return {clave: columna}
+
+    def remove_alias(self, nombre: str) -> bool:
+        clave = normalize_name(nombre)
+        existia = clave in self.aliases()
+
+        def quitar(datos):
+            datos['aliases'].pop(clave, None)
+            self._forget(datos, clave)
+
+        self._update(quitar)
+        return existia
+
+    @staticmethod
+    def _forget(datos: Dict, clave: str):
+        """Quita los layouts con una columna de nombre normalizado `clave`"""
+        for firma in [f for f, l in datos['layouts'].items()
+                      if clave in (normalize_name(n) for n in l.get('encabezado', []))]:
+            del datos['layouts'][firma]
+
+    def _reload(self):
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            self._datos = self._read()
+            self._mtime = mtime
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except FileNotFoundError:
+            datos = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Registro de layouts ilegible ({e}), se empieza vacío")
+            datos = {}
+        return {'layouts': datos.get('layouts', {}), 'aliases': datos.get('aliases', {})}
+
+    def _update(self, cambio):
+        """Aplica `cambio` sobre la versión del disco y la escribe (lock entre procesos)"""
+        with self._lock, self._file_lock():
+            datos = self._read()
+            cambio(datos)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporal = self.path.with_name(f'{self.path.name}.tmp-{uuid.uuid4().hex[:8]}')
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, indent=2, ensure_ascii=False, default=str)
+            os.replace(temporal, self.path)
+            self._datos = datos
+            self._mtime = self.path.stat().st_mtime_ns
+
+    @contextmanager
+    def _file_lock(self, timeout: float = 10):
+        """Lock entre procesos (un archivo creado con O_EXCL, como en DatasetStore)"""
+        path = self.path.with_name(f'{self.path.name}.lock')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        limite = time.time() + timeout
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime > LOCK_STALE_S:
+                        path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.time() > limite:
+                    raise TimeoutError("Registro de layouts ocupado")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+_registro: Optional[RegistroLayouts] = None
+
+
+def registro_layouts() -> RegistroLayouts:
+    """Registro compartido del proceso (MVN_LAYOUTS_FILE)"""
+    global _registro
+    if _registro is None:
+        _registro = RegistroLayouts()
+    return _registro
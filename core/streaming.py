@@ -0,0 +1,331 @@
+"""STREAMING - Análisis por chunks con agregados parciales combinables
+
+Cada analizador (y el DataValidator) expone el mismo protocolo:
+
+    state = analizador.new_state()
+    state = analizador.fold(state, marco)    # una vez por chunk
+    state = analizador.merge(state_a, state_b)
+    resultado = analizador.finalize(state)
+
+`analyze()` es el caso de un solo chunk, así que ambos caminos producen el
+mismo resultado. Los analizadores con PERFIL (validador y auditoría) no
+tienen estado propio: su estado es el perfil de calidad, que se pliega una
+sola vez por chunk bajo PERFIL_CLAVE y del que finalizan ambos. Los analizadores de un chunk son independientes (cada uno
+con su estado, leyendo del mismo marco) y corren en paralelo en un pool de
+hilos (MVN_ANALYZER_THREADS): pandas y numpy liberan el GIL en las
+operaciones pesadas, así que el tiempo de un chunk se acerca al del
+analizador más lento. La memoria depende del tamaño del chunk y de la
+cardinalidad de los grupos, no del tamaño del archivo, salvo la detección
+exacta de duplicados: guarda un hash de 8 bytes por fila distinta (80 MB
+cada 10 millones de filas distintas, más una copia transitoria al unir
+corridas; ver ConjuntoHashes).
+"""
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.marco_analisis import MarcoAnalisis
+from core.punto_control import checkpoint
+
+logger = logging.getLogger(__name__)
+
+ANALYZER_THREADS = int(os.environ.get("MVN_ANALYZER_THREADS", os.cpu_count() or 1))
+
+# Estado compartido de los analizadores con PERFIL en los estados plegados
+PERFIL_CLAVE = 'perfil_calidad'
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def hash_rows(df: pd.DataFrame) -> np.ndarray:
+    """Hash de 64 bits por fila (independiente del índice y del ancho numérico)"""
+    # Int8/int32/float32 hashean distinto que sus versiones de 64 bits; los chunks
+    # de un mismo archivo pueden tener anchos distintos (ver PreParser._compact)
+    columnas = [df.iloc[:, i] for i in range(df.shape[1])]
+    anchas = [_widen(c) for c in columnas]
+    if any(a is not c for a, c in zip(anchas, columnas)):
+        df = pd.concat(anchas, axis=1)
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _widen(serie: pd.Series) -> pd.Series:
+    dtype = serie.dtype
+    if pd.api.types.is_integer_dtype(dtype) and dtype.itemsize < 8:
+        return serie.astype('Int64' if pd.api.types.is_extension_array_dtype(dtype) else np.int64)
+    if pd.api.types.is_float_dtype(dtype) and dtype.itemsize < 8:
+        return serie.astype('Float64' if pd.api.types.is_extension_array_dtype(dtype) else np.float64)
+    return serie
+
+
+def unique_hashes(hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashes únicos ordenados y máscara de filas que repiten una fila anterior"""
+    unicos, primeras = np.unique(hashes, return_index=True)
+    mascara = np.ones(len(hashes), dtype=bool)
+    mascara[primeras] = False
+    return unicos, mascara
+
+
+class ConjuntoHashes:
+    """
+    Conjunto de hashes como corridas ordenadas y disjuntas.
+
+    Cada chunk agrega una corrida con sus hashes nuevos y se unen las
+    últimas mientras la anterior no duplique a la nueva, así que quedan
+    O(log n) corridas y cada hash se copia O(log n) veces en total (en
+    lugar de reordenar todo lo visto en cada chunk). Inmutable: agregar
+    devuelve un conjunto nuevo.
+    """
+
+    __slots__ = ('corridas',)
+
+    def __init__(self, corridas: Tuple[np.ndarray, ...] = ()):
+        self.corridas = corridas
+
+    def __len__(self) -> int:
+        return sum(len(c) for c in self.corridas)
+
+    def __getstate__(self):
+        return self.corridas
+
+    def __setstate__(self, corridas):
+        self.corridas = corridas
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Máscara de los `hashes` que ya están en el conjunto"""
+        presentes = np.zeros(len(hashes), dtype=bool)
+        for corrida in self.corridas:
+            posiciones = np.searchsorted(corrida, hashes).clip(max=len(corrida) - 1)
+            presentes |= corrida[posiciones] == hashes
+        return presentes
+
+    def add(self, unicos: np.ndarray) -> Tuple['ConjuntoHashes', int]:
+        """Agrega hashes únicos ordenados; devuelve (conjunto, cuántos ya estaban)"""
+        ya_vistos = self.contains(unicos)
+        nuevos = unicos[~ya_vistos]
+        if not len(nuevos):
+            return self, int(ya_vistos.sum())
+        return ConjuntoHashes(_compact(list(self.corridas) + [nuevos])), int(ya_vistos.sum())
+
+    def union(self, otro: 'ConjuntoHashes') -> Tuple['ConjuntoHashes', int]:
+        """Unión con `otro`; devuelve (unión, cuántos de `otro` ya estaban)"""
+        corridas, comunes = list(self.corridas), 0
+        for corrida in sorted(otro.corridas, key=len, reverse=True):
+            presentes = self.contains(corrida)
+            comunes += int(presentes.sum())
+            corridas.append(corrida[~presentes])
+        compactas: List[np.ndarray] = []
+        for corrida in sorted((c for c in corridas if len(c)), key=len, reverse=True):
+            compactas = list(_compact(compactas + [corrida]))
+        return ConjuntoHashes(tuple(compactas)), comunes
+
+    def to_array(self) -> np.ndarray:
+        if not self.corridas:
+            return np.empty(0, dtype=np.uint64)
+        return np.sort(np.concatenate(self.corridas), kind='stable')
+
+
+def _compact(corridas: List[np.ndarray]) -> Tuple[np.ndarray, ...]:
+    """Une las últimas corridas mientras la anterior no duplique a la última"""
+    while len(corridas) > 1 and len(corridas[-2]) <= 2 * len(corridas[-1]):
+        ultima = corridas.pop()
+        # Dos corridas ordenadas: el sort estable (timsort) las intercala en tiempo lineal
+        corridas[-1] = np.sort(np.concatenate([corridas[-1], ultima]), kind='stable')
+    return tuple(corridas)
+
+
+VACIO = ConjuntoHashes()
+
+
+def fold_unique(vistos: ConjuntoHashes, unicos: np.ndarray) -> Tuple[ConjuntoHashes, int]:
+    """Agrega hashes únicos ordenados a los vistos; devuelve (vistos, cuántos ya estaban)"""
+    return vistos.add(unicos)
+
+
+def fold_hashes(vistos: ConjuntoHashes, df: pd.DataFrame) -> Tuple[ConjuntoHashes, int]:
+    """Agrega las filas de un chunk a los hashes vistos; devuelve (vistos, duplicados del chunk)"""
+    unicos, mascara = unique_hashes(hash_rows(df))
+    vistos, ya_vistos = fold_unique(vistos, unicos)
+    return vistos, int(mascara.sum()) + ya_vistos
+
+
+def merge_hashes(a: ConjuntoHashes, b: ConjuntoHashes) -> Tuple[ConjuntoHashes, int]:
+    """Une dos conjuntos de hashes; devuelve (unión, filas de b que ya estaban en a)"""
+    return a.union(b)
+
+
+def merge_top(actual: Optional[pd.DataFrame], nuevo: Optional[pd.DataFrame],
+              n: int, columna: str) -> Optional[pd.DataFrame]:
+    """Top-N combinable: ante empates conserva la fila que apareció primero"""
+    if actual is None:
+        return nuevo.nlargest(n, columna) if nuevo is not None else None
+    if nuevo is None:
+        return actual
+    return pd.concat([actual, nuevo.nlargest(n, columna)]).nlargest(n, columna)
+
+
+def analyze_chunks(chunks: Iterable[pd.DataFrame], analizadores: Dict,
+                   tiempos: Optional[Dict[str, float]] = None) -> Dict:
+    """Pliega cada chunk en el estado de cada analizador y finaliza al terminar
+
+    Si se pasa `tiempos`, acumula ahí los segundos de cada analizador
+    (fold de todos los chunks más finalize).
+    """
+    tiempos = {} if tiempos is None else tiempos
+    estados, errores = fold_chunks(chunks, analizadores, tiempos)
+    return finalize_states(analizadores, estados, errores, tiempos)
+
+
+def fold_chunks(chunks: Iterable[pd.DataFrame], analizadores: Dict,
+                tiempos: Optional[Dict[str, float]] = None) -> Tuple[Dict, Dict]:
+    """Estados plegados sin finalizar, y el error de cada analizador que falló"""
+    tiempos = {} if tiempos is None else tiempos
+    plegables = _foldables(analizadores)
+    estados = {nombre: plegable.new_state() for nombre, plegable in plegables.items()}
+    errores = {}
+    filas = 0
+    for num, chunk in enumerate(chunks):
+        marco = MarcoAnalisis(chunk)
+        activos = {nombre: p for nombre, p in plegables.items() if nombre not in errores}
+        plegados, fallidos = run_analyzers(
+            activos, lambda nombre, plegable: plegable.fold(estados[nombre], marco), marco, tiempos
+        )
+        estados.update(plegados)
+        errores.update(fallidos)
+        filas += len(chunk)
+        logger.debug(f"Chunk {num}: {len(chunk)} filas (acumulado {filas})")
+    return estados, _analyzer_errors(analizadores, errores)
+
+
+def finalize_states(analizadores: Dict, estados: Dict, errores: Dict,
+                    tiempos: Optional[Dict[str, float]] = None) -> Dict:
+    """Resultado final de cada analizador (o su error)"""
+    activos = {nombre: a for nombre, a in analizadores.items() if nombre not in errores}
+    finales, fallidos = run_analyzers(
+        activos, lambda nombre, analizador: analizador.finalize(estados[_state_key(nombre, analizador)]),
+        tiempos=tiempos
+    )
+    return {nombre: errores.get(nombre) or fallidos.get(nombre) or finales[nombre] for nombre in analizadores}
+
+
+def merge_states(analizadores: Dict, partes: List[Tuple[Dict, Dict]]) -> Tuple[Dict, Dict]:
+    """Combina los (estados, errores) de varias fuentes, analizador por analizador
+
+    Un analizador que falló en una fuente se combina con las demás; sólo
+    queda con error si falló en todas.
+    """
+    estados = {}
+    errores = {}
+    partes = [(e, _fold_errors(analizadores, err)) for e, err in partes]
+    for nombre, plegable in _foldables(analizadores).items():
+        validos = [e[nombre] for e, err in partes if nombre not in err and nombre in e]
+        if not validos:
+            fallidos = [err[nombre] for _, err in partes if nombre in err]
+            errores[nombre] = fallidos[0] if fallidos else {'status': 'error', 'error': 'Sin datos'}
+            continue
+        estado = validos[0]
+        for otro in validos[1:]:
+            estado = plegable.merge(estado, otro)
+        estados[nombre] = estado
+    return estados, _analyzer_errors(analizadores, errores)
+
+
+def _uses_profile(analizador) -> bool:
+    return getattr(analizador, 'PERFIL', False)
+
+
+def _state_key(nombre: str, analizador) -> str:
+    return PERFIL_CLAVE if _uses_profile(analizador) else nombre
+
+
+def _foldables(analizadores: Dict) -> Dict:
+    """Lo que se pliega: los analizadores sin PERFIL y, si alguno lo usa, un solo perfil de calidad"""
+    plegables = {nombre: a for nombre, a in analizadores.items() if not _uses_profile(a)}
+    perfiles = [a.perfil for a in analizadores.values() if _uses_profile(a)]
+    if perfiles:
+        plegables[PERFIL_CLAVE] = perfiles[0]
+    return plegables
+
+
+def _analyzer_errors(analizadores: Dict, errores: Dict) -> Dict:
+    """Errores por analizador: un error del perfil es el de todos los que lo usan"""
+    return {nombre: errores[_state_key(nombre, a)] for nombre, a in analizadores.items()
+            if _state_key(nombre, a) in errores}
+
+
+def _fold_errors(analizadores: Dict, errores: Dict) -> Dict:
+    """Errores por plegable (lo inverso de _analyzer_errors)"""
+    return {_state_key(nombre, a): errores[nombre] for nombre, a in analizadores.items() if nombre in errores}
+
+
+def run_analyzers(analizadores: Dict, tarea: Callable[[str, Any], Any], marco: Optional[MarcoAnalisis] = None,
+                  tiempos: Optional[Dict[str, float]] = None) -> Tuple[Dict, Dict]:
+    """
+    Ejecuta `tarea(nombre, analizador)` para cada analizador, en paralelo.
+
+    Con `marco`, antes de repartir se calculan una vez las columnas
+    derivadas que declaran los analizadores (DERIVADAS), para que ninguno
+    espere a otro, y los que usan el perfil de calidad (PERFIL, lo más caro)
+    salen primero. Un analizador sin las columnas que declara (COLUMNAS) no
+    se ejecuta. Devuelve (resultados, errores) en el orden de `analizadores`.
+    """
+    tiempos = {} if tiempos is None else tiempos
+    errores = _prepare(analizadores, marco) if marco is not None and not marco.empty else {}
+    pendientes = sorted((nombre for nombre in analizadores if nombre not in errores),
+                        key=lambda nombre: not getattr(analizadores[nombre], 'PERFIL', False))
+
+    def ejecutar(nombre: str):
+        # Un job cortado no empieza los analizadores que faltan (Interrupcion no es un Exception)
+        checkpoint()
+        inicio = time.perf_counter()
+        try:
+            return tarea(nombre, analizadores[nombre]), None, time.perf_counter() - inicio
+        except Exception as e:
+            return None, {'status': 'error', 'error': str(e)}, time.perf_counter() - inicio
+
+    if ANALYZER_THREADS > 1 and len(pendientes) > 1:
+        salidas = dict(zip(pendientes, _analyzer_pool().map(ejecutar, pendientes)))
+    else:
+        salidas = {nombre: ejecutar(nombre) for nombre in pendientes}
+
+    resultados = {}
+    for nombre in analizadores:
+        if nombre not in salidas:
+            continue
+        valor, error, segundos = salidas[nombre]
+        tiempos[nombre] = tiempos.get(nombre, 0.0) + segundos
+        if error is None:
+            resultados[nombre] = valor
+        else:
+            errores[nombre] = error
+    return resultados, {nombre: errores[nombre] for nombre in analizadores if nombre in errores}
+
+
+def _prepare(analizadores: Dict, marco: MarcoAnalisis) -> Dict:
+    """Calcula las columnas derivadas declaradas; devuelve el error de los que no tienen sus columnas"""
+    errores = {}
+    columnas = set(marco.columns)
+    derivadas = []
+    for nombre, analizador in analizadores.items():
+        faltan = [c for c in getattr(analizador, 'COLUMNAS', ()) if c not in columnas]
+        if faltan:
+            errores[nombre] = {'status': 'error', 'error': f"Faltan columnas: {', '.join(faltan)}"}
+            continue
+        derivadas.extend(d for d in getattr(analizador, 'DERIVADAS', ()) if d not in derivadas)
+    for derivada in derivadas:
+        marco.column(derivada)
+    return errores
+
+
+def _analyzer_pool() -> ThreadPoolExecutor:
+    """Pool de hilos de los analizadores (uno por proceso, compartido entre jobs)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=ANALYZER_THREADS, thread_name_prefix='analizador')
+        return _pool
@@ -0,0 +1,41 @@
+"""Fixtures de la API: corre en un directorio temporal (uploads/, results/, datasets/, jobs.db)"""
+import os
+import time
+
+import pytest
+
+ESPERA_S = 120
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    """El módulo api.main, importado con un directorio de trabajo temporal"""
+    anterior = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('api'))
+    os.makedirs('logs', exist_ok=True)
+    import api.main as main
+    yield main
+    main.executor.shutdown()
+    os.chdir(anterior)
+
+
+@pytest.fixture(scope='session')
+def client(api):
+    """TestClient abierto toda la sesión: las tareas de fondo (run_analysis, run_batch) siguen corriendo"""
+    from fastapi.testclient import TestClient
+    with TestClient(api.app) as c:
+        yield c
+
+
+@pytest.fixture
+def wait(client):
+    """wait(url) espera a que el job (o batch) de `url` llegue a un estado final y lo devuelve"""
+    def esperar(url, estados=('completed', 'failed', 'cancelled', 'timed_out')):
+        limite = time.time() + ESPERA_S
+        while time.time() < limite:
+            estado = client.get(url).json()
+            if estado['status'] in estados:
+                return estado
+            time.sleep(0.1)
+        raise AssertionError(f"{url} no terminó: {estado}")
+    return esperar
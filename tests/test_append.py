@@ -0,0 +1,80 @@
+"""Agregar un delta combina sus estados con los guardados: el resultado es el de re-analizar todo"""
+import os
+
+import pandas as pd
+import pytest
+
+BASE = pd.DataFrame({
+    'fecha': ['2024-03-01', '2024-03-01', '2024-03-02', '2024-03-02'],
+    'producto': ['Leche', 'Pan', 'Leche', 'Café'],
+    'precio_venta': [1.5, 0.5, 1.5, 12.25],
+    'cantidad': [3, 24, 2, 1],
+    'costo': [1.0, 0.2, 1.0, 8.0],
+    'sucursal': ['Centro', 'Norte', 'Centro', 'Norte'],
+    'cliente': ['C1', 'C2', 'C1', 'C3'],
+})
+HOY = pd.DataFrame({
+    'fecha': ['2024-03-03', '2024-03-03'], 'producto': ['Pan', 'Té'], 'precio_venta': [0.5, 2.0],
+    'cantidad': [10, 4], 'costo': [0.2, 1.1], 'sucursal': ['Sur', 'Centro'], 'cliente': ['C2', 'C4'],
+})
+MANANA = HOY.assign(fecha='2024-03-04', cantidad=[7, 1])
+
+# Secciones que dependen de cómo se corrió el job y no del contenido
+PROPIAS_DEL_JOB = {'memoria', 'metricas', 'delta', 'layout', 'streaming', 'dataset_id'}
+
+
+def csv(df):
+    return df.to_csv(index=False).encode()
+
+
+@pytest.fixture
+def subir(client, wait):
+    def subir_archivo(url, nombre, df, **params):
+        respuesta = client.post(url, params=params, files={'file': (nombre, csv(df))})
+        assert respuesta.status_code == 200, respuesta.text
+        job_id = respuesta.json()['job_id']
+        assert wait(f'/status/{job_id}')['status'] == 'completed'
+        return respuesta.json(), client.get(f'/results/{job_id}/json').json()
+    return subir_archivo
+
+
+def assert_same_analysis(resultado, esperado):
+    secciones = set(esperado) - PROPIAS_DEL_JOB
+    assert secciones <= set(resultado)
+    for seccion in secciones:
+        assert resultado[seccion] == esperado[seccion], seccion
+
+
+def test_append_equals_full_reanalysis(api, client, wait, subir):
+    base, _ = subir('/upload', 'historial.csv', BASE)
+    dataset_id = base['dataset_id']
+    assert dataset_id
+
+    primero, resultado = subir(f'/datasets/{dataset_id}/append', 'hoy.csv', HOY)
+    assert primero['dataset_id'] == dataset_id
+    assert resultado['delta']['filas'] == len(HOY) and resultado['delta']['archivo'] == 'hoy.csv'
+    _, todo = subir('/upload', 'todo.csv', pd.concat([BASE, HOY], ignore_index=True), stream=True)
+    assert_same_analysis(resultado, todo)
+    # Los estados quedan guardados: el próximo append no vuelve a leer el historial
+    assert os.path.exists(os.path.join('datasets', dataset_id, 'state.pkl'))
+
+    _, resultado = subir(f'/datasets/{dataset_id}/append', 'manana.csv', MANANA)
+    info = client.get(f'/datasets/{dataset_id}').json()
+    assert info['rows'] == len(BASE) + len(HOY) + len(MANANA)
+    assert [a['source_file'] for a in info['appends']] == ['hoy.csv', 'manana.csv']
+
+    # Re-analizar el dataset lee todas sus partes (el contenido cambió: no es un hit de caché)
+    respuesta = client.post(f'/datasets/{dataset_id}/analyze', params={'stream': True})
+    job_id = respuesta.json()['job_id']
+    assert api.job_store.get(job_id).get('cache_hit') is None
+    assert wait(f'/status/{job_id}')['status'] == 'completed'
+    assert_same_analysis(resultado, client.get(f'/results/{job_id}/json').json())
+
+    # El archivo original ya no identifica al dataset con deltas
+    otra_vez, _ = subir('/upload', 'historial.csv', BASE)
+    assert otra_vez['dataset_id'] is None
+
+
+def test_append_to_unknown_dataset(client):
+    respuesta = client.post('/datasets/no-existe/append', files={'file': ('hoy.csv', csv(HOY))})
+    assert respuesta.status_code == 404
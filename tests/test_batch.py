@@ -0,0 +1,91 @@
+"""Un batch analiza cada archivo por separado y consolida sus estados como si fuera un solo archivo"""
+import io
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from api.batch import BatchError, extract_zip, is_zip_archive
+from api.uploads import UploadTooLargeError
+
+NORTE = pd.DataFrame({'producto': ['Leche', 'Pan', 'Leche'], 'precio_venta': [1.5, 0.5, 1.5],
+                      'cantidad': [3, 24, 2], 'costo': [1.0, 0.2, 1.0]})
+SUR = pd.DataFrame({'producto': ['Café', 'Pan'], 'precio_venta': [12.25, 0.5],
+                    'cantidad': [1, 10], 'costo': [8.0, 0.2]})
+CENTRO = NORTE.assign(sucursal='Centro')
+
+
+def csv(df):
+    return df.to_csv(index=False).encode()
+
+
+def zip_bytes(archivos):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for nombre, datos in archivos.items():
+            zf.writestr(nombre, datos)
+    return buffer.getvalue()
+
+
+def test_extract_zip_skips_folders_hidden_and_nested(tmp_path):
+    path = tmp_path / 'noche.zip'
+    path.write_bytes(zip_bytes({
+        'ventas/norte.csv': csv(NORTE), 'ventas/sub/sur.csv': csv(SUR), '.DS_Store': b'x',
+        '__MACOSX/ventas/._norte.csv': b'x', 'viejo.zip': zip_bytes({'a.csv': b'a'})
+    }))
+    assert is_zip_archive(str(path))
+    destino = str(tmp_path / 'extraidos')
+    miembros = extract_zip(str(path), destino, max_bytes=10_000)
+    assert miembros == [('norte.csv', os.path.join(destino, '000_norte.csv')),
+                        ('sur.csv', os.path.join(destino, '001_sur.csv'))]
+    assert pd.read_csv(miembros[1][1]).equals(SUR)
+
+    with pytest.raises(UploadTooLargeError):
+        extract_zip(str(path), str(tmp_path / 'grande'), max_bytes=10)
+    assert not (tmp_path / 'grande').exists()
+    with pytest.raises(BatchError, match='más de 1'):
+        extract_zip(str(path), str(tmp_path / 'muchos'), max_bytes=10_000, max_files=1)
+
+
+def test_xlsx_and_broken_zip(tmp_path):
+    libro = tmp_path / 'libro.xlsx'
+    Workbook().save(libro)
+    assert not is_zip_archive(str(libro))
+    roto = tmp_path / 'roto.zip'
+    roto.write_bytes(b'PK\x03\x04basura')
+    assert not is_zip_archive(str(roto))
+    with pytest.raises(BatchError, match='ZIP inválido'):
+        extract_zip(str(roto), str(tmp_path / 'roto'), max_bytes=10_000)
+
+
+def test_consolidated_report_matches_single_file(client, wait):
+    archivos = [('files', ('noche.zip', zip_bytes({'norte.csv': csv(NORTE), 'sur.csv': csv(SUR)}))),
+                ('files', ('centro.csv', csv(CENTRO)))]
+    respuesta = client.post('/batch', params={'modo': 'ventas+rentabilidad'}, files=archivos)
+    assert respuesta.status_code == 200, respuesta.text
+    assert [m['file'] for m in respuesta.json()['miembros']] == ['norte.csv', 'sur.csv', 'centro.csv']
+    batch_id = respuesta.json()['batch_id']
+    assert wait(f'/batch/{batch_id}')['status'] == 'completed'
+    consolidado = client.get(f'/results/{batch_id}/json').json()
+    assert [(m['file'], m['status'], m['filas']) for m in consolidado['miembros']] == [
+        ('norte.csv', 'completed', 3), ('sur.csv', 'completed', 2), ('centro.csv', 'completed', 3)
+    ]
+
+    # Los archivos sin sucursal toman el nombre del archivo
+    todo = pd.concat([NORTE.assign(sucursal='norte'), SUR.assign(sucursal='sur'), CENTRO], ignore_index=True)
+    unico = client.post('/upload', params={'modo': 'ventas+rentabilidad', 'stream': True},
+                        files={'file': ('todo.csv', csv(todo))}).json()['job_id']
+    assert wait(f'/status/{unico}')['status'] == 'completed'
+    completo = client.get(f'/results/{unico}/json').json()
+    for seccion in ('ventas', 'rentabilidad', 'validation'):
+        assert consolidado[seccion] == completo[seccion], seccion
+    assert set(consolidado['ventas']['ventas_por_sucursal']) == {'norte', 'sur', 'Centro'}
+
+
+def test_invalid_batches(client):
+    assert client.post('/batch', files=[('files', ('x.zip', b'PK\x03\x04basura'))]).status_code == 400
+    vacio = client.post('/batch', files=[('files', ('vacio.zip', zip_bytes({'.oculto': b'x'})))])
+    assert vacio.status_code == 400 and 'no tiene archivos' in vacio.json()['detail']
+    assert client.post('/batch', params={'modo': 'nada'}, files=[('files', ('a.csv', csv(NORTE)))]).status_code == 400
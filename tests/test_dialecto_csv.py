@@ -0,0 +1,101 @@
+"""DetectorDialecto arma las opciones de read_csv de exportaciones con distintos dialectos"""
+import pandas as pd
+import pytest
+
+from core.dialecto_csv import DetectorDialecto
+from core.pre_parser import PreParser
+from core.registro_layouts import RegistroLayouts
+
+
+FILAS = [('Leche 1L', 1234.5, 3, 'Centro'), ('Café "Premium"', 12.25, 1, 'Norte'), ('Pan', 0.5, 24, 'Sur')]
+
+
+def detector():
+    return DetectorDialecto(PreParser.COLUMN_MAP, PreParser.STANDARD_COLUMNS)
+
+
+def parse(path, tmp_path):
+    resultado = PreParser(layouts=RegistroLayouts(str(tmp_path / 'layouts.json'))).parse(str(path))
+    assert resultado['status'] == 'success', resultado
+    return resultado
+
+
+def assert_ventas(df):
+    assert df['producto'].astype(str).tolist() == [f[0] for f in FILAS]
+    assert df['precio_venta'].tolist() == pytest.approx([f[1] for f in FILAS])
+    assert df['cantidad'].tolist() == [f[2] for f in FILAS]
+    assert df['sucursal'].astype(str).tolist() == [f[3] for f in FILAS]
+
+
+def test_semicolon_with_decimal_comma(tmp_path):
+    path = tmp_path / 'europeo.csv'
+    lineas = ['producto;precio_venta;cantidad;sucursal']
+    lineas += ['Leche 1L;1.234,50;3;Centro', '"Café ""Premium""";12,25;1;Norte', 'Pan;0,5;24;Sur']
+    path.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+
+    opciones = detector().detect(str(path))
+    assert (opciones['encoding'], opciones['sep'], opciones['decimal'], opciones['thousands']) == ('utf-8', ';', ',', '.')
+    assert (opciones['skiprows'], opciones['header']) == (0, 0)
+    assert_ventas(parse(path, tmp_path)['data'])
+
+
+def test_comma_with_decimal_point(tmp_path):
+    path = tmp_path / 'ingles.csv'
+    lineas = ['Product line,Unit price,Quantity,Branch']
+    lineas += ['Leche 1L,"1,234.50",3,Centro', '"Café ""Premium""",12.25,1,Norte', 'Pan,0.5,24,Sur']
+    path.write_text('\r\n'.join(lineas) + '\r\n', encoding='utf-8')
+
+    opciones = detector().detect(str(path))
+    assert (opciones['sep'], opciones['decimal']) == (',', '.')
+    assert_ventas(parse(path, tmp_path)['data'])
+
+
+def test_latin1_with_title_rows(tmp_path):
+    path = tmp_path / 'pos.csv'
+    lineas = ['Reporte de ventas - Sucursal Año 2024', '', 'PRODUCTO\tprecio_venta\tcantidad\ttienda']
+    lineas += ['Leche 1L\t1234.5\t3\tCentro', 'Café "Premium"\t12.25\t1\tNorte', 'Pan\t0.5\t24\tSur']
+    path.write_bytes(('\n'.join(lineas) + '\n').encode('latin-1'))
+
+    opciones = detector().detect(str(path))
+    assert opciones['encoding'] == 'cp1252'
+    assert (opciones['sep'], opciones['skiprows'], opciones['header']) == ('\t', 2, 0)
+    assert_ventas(parse(path, tmp_path)['data'])
+
+
+def test_latin1_spanish_with_low_confidence(tmp_path):
+    # Pocas líneas en Latin-1: chardet propone cp1251/cp1255 con confianza ~0.04
+    muestra = "producto;sucursal\nCafé ñandú;Año Nuevo\n".encode('latin-1')
+    assert DetectorDialecto.guess_encoding(muestra) == ('cp1252', False)
+
+    layouts = RegistroLayouts(str(tmp_path / 'layouts.json'))
+    path = tmp_path / 'ventas.csv'
+    path.write_bytes("producto;precio_venta;cantidad;sucursal\nCafé ñandú;1.234,50;3;Año Nuevo\n"
+                     "Té;12,25;1;Peñalolén\n".encode('latin-1'))
+    df = PreParser(layouts=layouts).parse(str(path))['data']
+    assert df['producto'].astype(str).tolist() == ['Café ñandú', 'Té']
+    assert df['sucursal'].astype(str).tolist() == ['Año Nuevo', 'Peñalolén']
+    assert df['precio_venta'].tolist() == [1234.5, 12.25]
+    # El encabezado es ASCII: el layout no depende del encoding y se registra
+    assert len(layouts.list()) == 1
+
+    # Con acentos en el encabezado y encoding dudoso no se registra
+    path.write_bytes("Producto;Año;Cantidad\nCafé ñandú;2024;3\n".encode('latin-1'))
+    resultado = PreParser(layouts=layouts).parse(str(path))
+    assert resultado['data']['producto'].astype(str).tolist() == ['Café ñandú']
+    assert resultado['layout']['conocido'] is False and len(layouts.list()) == 1
+
+
+def test_utf8_multibyte_cut_by_sample():
+    # Un carácter multibyte partido al final de la muestra no hace caer a chardet
+    muestra = 'producto,cantidad\nñandú,1\n'.encode('utf-8') * 50 + 'ñ'.encode('utf-8')[:1]
+    assert DetectorDialecto.detect_encoding(muestra) == 'utf-8'
+    assert DetectorDialecto.detect_encoding(b'\xef\xbb\xbfproducto\n') == 'utf-8-sig'
+
+
+def test_without_header(tmp_path):
+    path = tmp_path / 'sin_encabezado.csv'
+    path.write_text('1,2.5,3\n4,5.5,6\n7,8.5,9\n', encoding='utf-8')
+    opciones = detector().detect(str(path))
+    assert opciones['header'] is None
+    df = pd.read_csv(path, **opciones)
+    assert df.shape == (3, 3)
@@ -0,0 +1,84 @@
+"""Un job cancelado o vencido se corta en el próximo punto de control y deja de ocupar disco"""
+import os
+import time
+
+import pytest
+
+from api import job_executor
+from api.job_executor import JobCancelled, _run_job, request_cancel
+from core.pre_parser import PreParser
+from core.punto_control import FILAS_CONTROL, Interrupcion, checkpoint, set_checkpoint
+from core.registro_layouts import RegistroLayouts
+
+CSV = b'producto,precio_venta,cantidad,sucursal\nLeche,1.5,3,Centro\nPan,0.5,24,Norte\n'
+
+
+@pytest.fixture
+def cancel_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_executor, 'CANCEL_DIR', str(tmp_path / 'cancel'))
+
+
+def test_checkpoint_stops_a_single_pass_parse(tmp_path):
+    path = tmp_path / 'ventas.txt'
+    filas = ''.join(f"P{i}\t1.5\t2\n" for i in range(FILAS_CONTROL * 2))
+    path.write_text('producto\tprecio_venta\tcantidad\n' + filas, encoding='utf-8')
+    llamadas = []
+
+    def cortar():
+        llamadas.append(1)
+        raise Interrupcion('cancelled', 'Job cancelado')
+
+    set_checkpoint(cortar)
+    try:
+        # No termina en un resultado con status 'error': la interrupción sale del parser
+        with pytest.raises(Interrupcion):
+            PreParser(layouts=RegistroLayouts(str(tmp_path / 'layouts.json'))).parse(str(path))
+    finally:
+        set_checkpoint(None)
+    assert llamadas == [1]
+    checkpoint()
+
+
+def test_run_job_checks_cancel_and_deadline(cancel_dir):
+    def job(job_id, filas):
+        for _ in range(filas):
+            checkpoint()
+        return job_id
+
+    assert _run_job(job, 'a', time.time() + 60, 3) == 'a'
+    with pytest.raises(JobCancelled) as vencido:
+        _run_job(job, 'b', time.time() - 1, 3)
+    assert vencido.value.status == 'timed_out'
+
+    request_cancel('c')
+    with pytest.raises(JobCancelled) as cancelado:
+        _run_job(job, 'c', None, 3)
+    assert cancelado.value.status == 'cancelled'
+    # Fuera del job el punto de control vuelve a no hacer nada
+    checkpoint()
+
+
+def test_cancel_batch_member_removes_its_upload(api, client, wait, monkeypatch):
+    # Un archivo por vez: el segundo espera su turno mientras se cancela
+    monkeypatch.setattr(api.executor, 'max_workers', 1)
+    respuesta = client.post('/batch', params={'modo': 'ventas'},
+                            files=[('files', ('norte.csv', CSV)), ('files', ('sur.csv', CSV + b'Te,2,1,Sur\n'))])
+    assert respuesta.status_code == 200, respuesta.text
+    batch_id = respuesta.json()['batch_id']
+    primero, segundo = [m['job_id'] for m in respuesta.json()['miembros']]
+    rutas = [api.job_store.get(m)['upload_path'] for m in (primero, segundo)]
+    assert all(os.path.exists(ruta) for ruta in rutas)
+
+    assert client.delete(f'/jobs/{segundo}').json() == {'job_id': segundo, 'status': 'cancelled'}
+    assert not os.path.exists(rutas[1])
+
+    batch = wait(f'/batch/{batch_id}')
+    assert batch['status'] == 'completed'
+    assert [m['status'] for m in batch['miembros']] == ['completed', 'cancelled']
+    assert os.path.exists(rutas[0])
+    assert client.get(f'/results/{segundo}').status_code == 410
+    assert client.get(f'/results/{batch_id}/json').json()['ventas']
+
+    assert client.delete(f'/jobs/{batch_id}').status_code == 409
+    assert client.delete('/jobs/no-existe').status_code == 404
+    assert client.post('/upload', params={'timeout_min': -1}, files={'file': ('v.csv', CSV)}).status_code == 400
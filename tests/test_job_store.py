@@ -0,0 +1,91 @@
+"""update() combina campos sin perder escrituras concurrentes; los jobs vencidos se purgan"""
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from api.job_store import MemoryJobStore, SQLiteJobStore
+
+ESCRITURAS = 60
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryJobStore(ttl_s=3600)
+    return SQLiteJobStore(str(tmp_path / 'jobs.db'), ttl_s=3600)
+
+
+def write_fields(path, escritor):
+    """Cada escritor actualiza sólo su campo; ninguno debe pisar los de los demás"""
+    store = SQLiteJobStore(path, ttl_s=3600)
+    for n in range(1, ESCRITURAS + 1):
+        store.update('job', {f"escritor_{escritor}": n, 'progress': n})
+
+
+def test_concurrent_updates_keep_all_fields(store):
+    store.create('job', {'status': 'processing'})
+
+    def escribir(escritor):
+        for n in range(1, ESCRITURAS + 1):
+            store.update('job', {f"escritor_{escritor}": n, 'progress': n})
+
+    hilos = [threading.Thread(target=escribir, args=(i,)) for i in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    job = store.get('job')
+    assert all(job[f"escritor_{i}"] == ESCRITURAS for i in range(4))
+    assert job['status'] == 'processing'
+
+
+def test_concurrent_processes_keep_all_fields(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    SQLiteJobStore(path).create('job', {'status': 'processing'})
+    contexto = multiprocessing.get_context('spawn')
+    procesos = [contexto.Process(target=write_fields, args=(path, i)) for i in range(3)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join(60)
+        assert proceso.exitcode == 0
+    job = SQLiteJobStore(path).get('job')
+    assert all(job[f"escritor_{i}"] == ESCRITURAS for i in range(3))
+
+
+def test_progress_does_not_override_final_state(store):
+    store.create('job', {'status': 'processing', 'progress': 10})
+    assert store.update('job', {'progress': 50}, progress=True)['progress'] == 50
+    store.update('job', {'status': 'cancelled', 'progress': 50})
+    assert store.update('job', {'status': 'processing', 'progress': 90}, progress=True) is None
+    assert store.get('job') == {'status': 'cancelled', 'progress': 50}
+    # Sin progress=True sí se escribe (p.ej. el resultado de un job que terminó igual)
+    assert store.update('job', {'status': 'completed'})['status'] == 'completed'
+    assert store.update('otro', {'progress': 1}) is None
+    assert store.count() == {'completed': 1}
+
+
+def test_purge_expired_and_on_purge(store):
+    purgados = []
+    store.on_purge = purgados.extend
+    store.create('viejo', {'status': 'completed'})
+    store.create('activo', {'status': 'processing'})
+    store.create('nuevo', {'status': 'queued'})
+    store.update('nuevo', {'status': 'failed'})
+
+    store.ttl_s = 0.2
+    time.sleep(0.3)
+    store.update('activo', {'progress': 5}, progress=True)
+    store.create('reciente', {'status': 'completed'})
+    store._last_purge = 0.0
+    store.maybe_purge()
+    assert sorted(purgados) == ['nuevo', 'viejo']
+    assert store.get('viejo') is None and store.get('activo') is not None and store.get('reciente') is not None
+    # Una vez por PURGE_INTERVAL_S
+    time.sleep(0.3)
+    store.maybe_purge()
+    assert sorted(purgados) == ['nuevo', 'viejo']
+    assert store.purge_expired() == ['reciente']
+
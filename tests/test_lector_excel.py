@@ -0,0 +1,70 @@
+"""LectorExcel recorre las hojas elegidas por filas y conserva sólo las columnas reconocidas"""
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from core.lector_excel import LectorExcel
+from core.pre_parser import PreParser
+from core.registro_layouts import RegistroLayouts
+
+HOJAS = {
+    'Norte': [('Leche', 1.5, 3), ('Pan', 0.5, 24), ('Café', 12.25, 1)],
+    'Sur': [('Té', 2.0, 5), ('Arroz', 1.1, 2)],
+}
+
+
+@pytest.fixture
+def libro(tmp_path):
+    wb = Workbook()
+    wb.remove(wb.active)
+    for nombre, filas in HOJAS.items():
+        hoja = wb.create_sheet(nombre)
+        hoja.append(['PRODUCTO', 'Unit price', 'Quantity', 'Notas'])
+        for fila in filas:
+            hoja.append(list(fila) + ['x'])
+    wb.create_sheet('Vacía')
+    # Sin extensión, como llegan los uploads
+    path = str(tmp_path / 'upload')
+    wb.save(path)
+    return path
+
+
+def lector(workers=1):
+    return LectorExcel(PreParser.COLUMN_MAP, PreParser.STANDARD_COLUMNS, workers=workers)
+
+
+def test_select_sheets(libro):
+    assert lector().select_sheets(libro) == ['Norte']
+    assert lector().select_sheets(libro, '2, Norte, Sur') == ['Sur', 'Norte']
+    assert lector().select_sheets(libro, '*') == ['Norte', 'Sur', 'Vacía']
+    with pytest.raises(ValueError, match='Norte, Sur, Vacía'):
+        lector().select_sheets(libro, 'Oeste')
+
+
+def test_read_keeps_standard_columns(libro):
+    df = lector().read(libro, '*')
+    # 'Notas' no es una columna estándar y la hoja vacía no aporta filas
+    assert list(df.columns) == ['PRODUCTO', 'Unit price', 'Quantity']
+    assert df['PRODUCTO'].tolist() == [f[0] for filas in HOJAS.values() for f in filas]
+    assert df['Quantity'].tolist() == [f[2] for filas in HOJAS.values() for f in filas]
+
+
+def test_chunks_match_full_read(libro):
+    chunks = list(lector().iter_frames(libro, chunksize=2, hojas='Norte,Sur'))
+    assert [len(c) for c in chunks] == [2, 1, 2]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), lector().read(libro, 'Norte,Sur'))
+
+
+def test_parallel_read_matches_sequential(libro):
+    pd.testing.assert_frame_equal(lector(workers=2).read(libro, '*'), lector().read(libro, '*'))
+    # Por chunks las hojas se leen de a una aunque haya workers
+    assert [len(c) for c in lector(workers=2).iter_frames(libro, chunksize=2, hojas='*')] == [2, 1, 2]
+
+
+def test_parser_reads_selected_sheets(libro, tmp_path):
+    parser = PreParser(hojas='Sur', layouts=RegistroLayouts(str(tmp_path / 'layouts.json')))
+    resultado = parser.parse(libro, 'excel')
+    assert resultado['status'] == 'success', resultado
+    df = resultado['data']
+    assert df['producto'].astype(str).tolist() == ['Té', 'Arroz']
+    assert df['precio_venta'].tolist() == [2.0, 1.1]
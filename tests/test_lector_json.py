@@ -0,0 +1,83 @@
+"""LectorJson lee arreglos y JSON Lines por bloques y salta registros mal formados"""
+import json
+
+import pandas as pd
+import pytest
+
+from core import lector_json
+from core.lector_json import LectorJson
+
+
+def lector():
+    return LectorJson({'qty': 'cantidad'}, ['producto', 'cantidad'])
+
+
+def registros(n):
+    return [{'producto': f"P{i}", 'qty': i, 'ignorada': 'x' * (i % 7)} for i in range(n)]
+
+
+def esperado(regs):
+    return pd.DataFrame({'producto': [r['producto'] for r in regs], 'qty': [r['qty'] for r in regs]})
+
+
+@pytest.fixture(autouse=True)
+def bloques_chicos(monkeypatch):
+    # Bloques de pocos caracteres: registros, números y strings quedan partidos entre bloques
+    monkeypatch.setattr(lector_json, 'BLOQUE_CHARS', 37)
+
+
+@pytest.mark.parametrize('formato', ['arreglo', 'lineas'])
+def test_read_matches_records(tmp_path, formato):
+    regs = registros(500)
+    path = tmp_path / 'datos.json'
+    if formato == 'arreglo':
+        path.write_text(json.dumps(regs, indent=1), encoding='utf-8')
+    else:
+        path.write_text('\n'.join(json.dumps(r) for r in regs) + '\n', encoding='utf-8')
+    leido = lector()
+    pd.testing.assert_frame_equal(leido.read(str(path)), esperado(regs))
+    assert leido.invalidos == 0
+
+
+def test_iter_frames_chunks(tmp_path):
+    regs = registros(1000)
+    path = tmp_path / 'datos.json'
+    path.write_text(json.dumps(regs), encoding='utf-8')
+    partes = list(lector().iter_frames(str(path), chunksize=300))
+    assert [len(p) for p in partes] == [300, 300, 300, 100]
+    pd.testing.assert_frame_equal(pd.concat(partes, ignore_index=True), esperado(regs))
+
+
+def test_array_resyncs_after_malformed_record(tmp_path):
+    regs = registros(50)
+    partes = [json.dumps(r) for r in regs]
+    partes[10] = '{"producto": "P10", "qty": 1O}'
+    partes[30] = '{"producto": "P30" "qty": 30}'
+    path = tmp_path / 'datos.json'
+    path.write_text('[' + ',\n '.join(partes) + ']', encoding='utf-8')
+    leido = lector()
+    validos = [r for i, r in enumerate(regs) if i not in (10, 30)]
+    pd.testing.assert_frame_equal(leido.read(str(path)), esperado(validos))
+    assert leido.invalidos == 2
+
+
+def test_json_lines_resync_and_non_objects(tmp_path):
+    regs = registros(40)
+    lineas = [json.dumps(r) for r in regs]
+    lineas[5] = '{"producto": "P5", "qty": '
+    lineas[20] = '[1, 2, 3]'
+    lineas[33] = 'basura sin comillas'
+    path = tmp_path / 'datos.jsonl'
+    path.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+    leido = lector()
+    validos = [r for i, r in enumerate(regs) if i not in (5, 20, 33)]
+    pd.testing.assert_frame_equal(leido.read(str(path)), esperado(validos))
+    assert leido.invalidos == 3
+
+
+def test_single_object_and_empty(tmp_path):
+    path = tmp_path / 'uno.json'
+    path.write_text('﻿{"producto": "único", "qty": 3}', encoding='utf-8')
+    pd.testing.assert_frame_equal(lector().read(str(path)), pd.DataFrame({'producto': ['único'], 'qty': [3]}))
+    path.write_text('[]', encoding='utf-8')
+    assert lector().read(str(path)).empty
@@ -0,0 +1,116 @@
+"""LectorTxt produce los mismos registros que el parser línea por línea original"""
+import random
+import re
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pytest
+
+from benchmarks.generador import GeneradorVentas
+from core import lector_txt
+from core.lector_txt import LectorTxt
+
+
+def parse_line_original(line: str) -> Optional[Dict]:
+    """PreParser._parse_line tal como estaba antes de LectorTxt (referencia)"""
+    record = {}
+    patterns = [
+        r'(\w+)\s*[=:]\s*([^\|,]+)',
+        r'(\w+)\s+([^|,]+)',
+    ]
+
+    line = line.replace('€', '').replace('ñ', 'n').replace('é', 'e')
+
+    if '|' in line:
+        parts = [p.strip() for p in line.split('|')]
+        for part in parts:
+            for pattern in patterns:
+                match = re.search(pattern, part)
+                if match:
+                    key = match.group(1).lower().replace(' ', '_')
+                    value = match.group(2).strip().replace('$', '')
+                    record[key] = value
+
+    elif ':' in line or '=' in line:
+        for pattern in patterns:
+            for match in re.finditer(pattern, line):
+                key = match.group(1).lower().replace(' ', '_')
+                value = match.group(2).strip().replace('$', '')
+                record[key] = value
+
+    return record if record else None
+
+
+def read_original(path) -> pd.DataFrame:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    records = []
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('-') or line.startswith('#'):
+            continue
+        record = parse_line_original(line)
+        if record:
+            records.append(record)
+    return pd.DataFrame(records)
+
+
+def random_lines(n: int, seed: int = 0) -> List[str]:
+    """Líneas mezcladas: pipes, clave=valor, clave: valor, separadores, comentarios y basura"""
+    rng = random.Random(seed)
+    claves = ['producto', 'precio_venta', 'Qty', 'cantidad', 'costo', 'cost', 'sucursal', 'tienda', 'Año', 'café']
+    valores = ['Leche 1L', '$1.234,50', '12', '€ 3.5', 'niño', '  7 ', 'A', 'x y z', '', '-4']
+    seps = ['=', ': ', ' : ', ' ', '=', ':']
+    lineas = []
+    for _ in range(n):
+        tipo = rng.random()
+        campos = [f"{rng.choice(claves)}{rng.choice(seps)}{rng.choice(valores)}" for _ in range(rng.randint(1, 5))]
+        if tipo < 0.4:
+            lineas.append(' | '.join(campos) + rng.choice(['', ' |', '|']))
+        elif tipo < 0.8:
+            lineas.append(rng.choice([', ', ',', ' , ']).join(campos))
+        elif tipo < 0.85:
+            lineas.append('-' * rng.randint(1, 40))
+        elif tipo < 0.9:
+            lineas.append('# ' + ' '.join(campos))
+        elif tipo < 0.95:
+            lineas.append('')
+        else:
+            lineas.append(' '.join(campos) + '\r')
+    return lineas
+
+
+@pytest.fixture
+def mixed_file(tmp_path):
+    path = tmp_path / 'mixto.txt'
+    path.write_text('\n'.join(random_lines(5000)), encoding='utf-8')
+    return path
+
+
+def test_parse_line_matches_original():
+    lector = LectorTxt()
+    for linea in random_lines(5000, seed=1):
+        linea = linea.strip()
+        if not linea or linea[0] in '-#':
+            continue
+        assert lector.parse_line(linea) == parse_line_original(linea), linea
+
+
+def test_read_matches_original(mixed_file):
+    pd.testing.assert_frame_equal(LectorTxt(workers=1).read(str(mixed_file)), read_original(mixed_file))
+
+
+def test_iter_frames_matches_original(mixed_file):
+    partes = list(LectorTxt().iter_frames(str(mixed_file), chunksize=700))
+    assert all(len(p) <= 700 for p in partes)
+    pd.testing.assert_frame_equal(pd.concat(partes, ignore_index=True, sort=False), read_original(mixed_file))
+
+
+def test_parallel_read_matches_original(mixed_file, monkeypatch):
+    monkeypatch.setattr(lector_txt, 'TXT_PARALLEL_MB', 0)
+    pd.testing.assert_frame_equal(LectorTxt(workers=3).read(str(mixed_file)), read_original(mixed_file))
+
+
+def test_generated_pos_dump(tmp_path):
+    path = GeneradorVentas(filas=3000, seed=7).write(str(tmp_path), 'txt')
+    pd.testing.assert_frame_equal(LectorTxt().read(str(path)), read_original(path))
@@ -0,0 +1,77 @@
+"""El perfil de calidad que comparten DataValidator y AnalizadorAuditoria"""
+import pandas as pd
+import pytest
+
+from core.analyzer_auditoria import AnalizadorAuditoria
+from core.data_validator import DataValidator
+from core.marco_analisis import MarcoAnalisis
+from core.perfil_calidad import PerfilCalidad, frame_state
+from core.streaming import PERFIL_CLAVE, finalize_states, fold_chunks, merge_states
+
+
+@pytest.fixture
+def ventas():
+    return pd.DataFrame({
+        'producto': ['Pan', 'Pan', 'Pan', 'Leche'],
+        'precio_venta': [1.5, 1.5, 1.5, None],
+        'cantidad': [2, 2, 2, 1],
+        'fecha': pd.to_datetime(['2024-03-01 10:00', '2024-03-02 10:00', '2024-03-02 10:00', None]),
+    })
+
+
+def test_date_is_part_of_duplicates_and_nulls(ventas):
+    resultado = DataValidator().validate(ventas)
+    # Las dos primeras filas sólo difieren en la fecha: una sola duplicada
+    assert resultado['duplicates']['count'] == 1
+    # 16 celdas contando la fecha: precio y fecha vacíos en la última fila
+    assert resultado['nulls']['total'] == 2
+    assert resultado['nulls']['percentage'] == pytest.approx(2 / 16 * 100)
+
+    sin_fecha = DataValidator().validate(ventas.drop(columns='fecha'))
+    assert sin_fecha['duplicates']['count'] == 2
+    assert sin_fecha['nulls']['percentage'] == pytest.approx(1 / 12 * 100)
+
+
+def test_auditor_sees_the_same_duplicates(ventas):
+    resultado = AnalizadorAuditoria().analyze({'data': ventas})
+    assert resultado['status'] == 'success'
+    assert resultado['anomalias'] == ['2 valores nulos', '1 filas duplicadas']
+
+
+def test_chunks_fold_one_profile(monkeypatch):
+    df = pd.DataFrame({'producto': list('ABCA') * 50, 'precio_venta': [1.0, 2.0, 3.0, 1.0] * 50,
+                       'cantidad': [1, 2, 3, 1] * 50})
+    chunks = [df.iloc[i:i + 30] for i in range(0, len(df), 30)]
+    pliegues = []
+    fold = PerfilCalidad.fold
+    monkeypatch.setattr(PerfilCalidad, 'fold', lambda self, state, frame: pliegues.append(1) or fold(self, state, frame))
+
+    analizadores = {'auditoria': AnalizadorAuditoria(), 'validation': DataValidator()}
+    estados, errores = fold_chunks(chunks, analizadores)
+    # Un solo estado (un solo conjunto de hashes) plegado una vez por chunk
+    assert not errores and set(estados) == {PERFIL_CLAVE} and len(pliegues) == len(chunks)
+    assert len(estados[PERFIL_CLAVE]['hashes']) == 3
+
+    por_chunks = finalize_states(analizadores, estados, errores)
+    assert por_chunks['validation'] == DataValidator().validate(df)
+    assert por_chunks['auditoria'] == AnalizadorAuditoria().analyze({'data': df})
+
+    # Combinar las partes de un batch (o un append) también combina un solo perfil
+    partes = [fold_chunks(chunks[:3], analizadores), fold_chunks(chunks[3:], analizadores)]
+    combinados, errores = merge_states(analizadores, partes)
+    assert set(combinados) == {PERFIL_CLAVE}
+    assert finalize_states(analizadores, combinados, errores) == por_chunks
+
+
+def test_profile_error_is_reported_for_every_user():
+    analizadores = {'auditoria': AnalizadorAuditoria(), 'validation': DataValidator()}
+    estados, errores = fold_chunks([pd.DataFrame({'a': [[1]]})], analizadores)
+    assert set(errores) == {'auditoria', 'validation'} and errores['auditoria'] == errores['validation']
+
+
+def test_single_frame_state_is_shared(ventas):
+    marco = MarcoAnalisis(ventas)
+    DataValidator().validate(ventas, marco)
+    estado = frame_state(marco)
+    AnalizadorAuditoria().analyze({'data': ventas, 'frame': marco})
+    assert frame_state(marco) is estado
@@ -0,0 +1,110 @@
+"""Los modos resuelven qué analizadores corren; un analizador nuevo se registra sin tocar el pipeline"""
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from core import registro_analizadores as registro
+from core.registro_analizadores import available_modes, resolve_mode, run_dependents
+from core.streaming import analyze_chunks
+
+VENTAS = pd.DataFrame({'producto': ['Pan', 'Leche', 'Pan'], 'precio_venta': [0.5, 1.5, 0.5],
+                       'cantidad': [24, 3, 10]})
+
+
+class Conteo:
+    """Analizador mínimo: filas por producto"""
+    COLUMNAS = ('producto',)
+    DERIVADAS = ()
+    PERFIL = False
+
+    def new_state(self):
+        return {}
+
+    def fold(self, state, frame):
+        for producto, filas in frame.column('producto').value_counts().items():
+            state[producto] = state.get(producto, 0) + int(filas)
+        return state
+
+    def merge(self, a, b):
+        return {k: a.get(k, 0) + b.get(k, 0) for k in set(a) | set(b)}
+
+    def finalize(self, state):
+        return {'status': 'success', 'filas': dict(sorted(state.items()))}
+
+
+@pytest.fixture
+def registros(monkeypatch):
+    """Registro aislado: lo que registre el test no queda para los demás"""
+    for nombre in ('ANALIZADORES', 'POSTERIORES', 'MODOS'):
+        monkeypatch.setattr(registro, nombre, dict(getattr(registro, nombre)))
+
+
+def test_resolve_mode():
+    datos, posteriores = resolve_mode('completo')
+    assert datos == ['ventas', 'rentabilidad', 'auditoria', 'clientes', 'tendencias']
+    assert posteriores == ['triple_validacion', 'confianza']
+    # Combinaciones con '+', en el orden del registro
+    assert resolve_mode('tendencias+ventas') == (['ventas', 'tendencias'], [])
+    # Un posterior trae lo que usa
+    assert resolve_mode('confianza') == ([], ['triple_validacion', 'confianza'])
+    for invalido in ('ventas+nada', '', '+'):
+        with pytest.raises(ValueError, match='Modo desconocido'):
+            resolve_mode(invalido)
+
+
+def test_registered_analyzer_and_dependent(registros):
+    registro.register_analyzer('conteo', Conteo)
+    registro.register_dependent('productos', lambda r: {'distintos': len(r['conteo']['filas'])}, usa=('conteo',))
+    registro.register_mode('inventario', ('productos',))
+    assert {'conteo', 'productos', 'inventario'} <= set(available_modes())
+
+    datos, posteriores = resolve_mode('inventario')
+    assert (datos, posteriores) == (['conteo'], ['productos'])
+    analizadores = {nombre: registro.ANALIZADORES[nombre]() for nombre in datos}
+    resultados = analyze_chunks([VENTAS.iloc[:2], VENTAS.iloc[2:]], analizadores)
+    run_dependents(posteriores, resultados)
+    assert resultados['conteo']['filas'] == {'Leche': 1, 'Pan': 2}
+    assert resultados['productos'] == {'distintos': 2}
+
+
+def test_missing_columns_and_failing_dependent(registros):
+    resultados = analyze_chunks([VENTAS], {'ventas': registro.ANALIZADORES['ventas'](),
+                                           'rentabilidad': registro.ANALIZADORES['rentabilidad']()})
+    assert resultados['ventas']['status'] == 'success'
+    assert resultados['rentabilidad'] == {'status': 'error', 'error': 'Faltan columnas: costo'}
+
+    registro.register_dependent('roto', lambda r: r['no_existe'])
+    assert run_dependents(['roto'], {})['roto']['status'] == 'error'
+    registro.register_dependent('a', lambda r: {}, usa=('b',))
+    registro.register_dependent('b', lambda r: {}, usa=('a',))
+    with pytest.raises(ValueError, match='circular'):
+        resolve_mode('a')
+
+
+def test_modes_from_environment():
+    codigo = ("from core.registro_analizadores import resolve_mode, MODOS; "
+              "print(resolve_mode('resumen'), 'malo' in MODOS)")
+    entorno = dict(os.environ, MVN_MODOS='resumen=clientes+ventas+confianza; malo; =x')
+    salida = subprocess.run([sys.executable, '-c', codigo], env=entorno, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+    assert salida.stdout.strip() == "(['ventas', 'clientes'], ['triple_validacion', 'confianza']) False"
+
+
+def test_modes_endpoint_and_combined_upload(client, wait):
+    modos = client.get('/modos').json()['modos']
+    assert modos['completo']['posteriores'] == ['triple_validacion', 'confianza']
+    assert modos['reporte']['posteriores'] == ['triple_validacion', 'confianza', 'reporte']
+    assert modos['tendencias'] == {'analizadores': ['tendencias'], 'posteriores': []}
+
+    respuesta = client.post('/upload', params={'modo': 'ventas+tendencias'},
+                            files={'file': ('modos.csv', VENTAS.to_csv(index=False).encode())})
+    job_id = respuesta.json()['job_id']
+    assert wait(f'/status/{job_id}')['status'] == 'completed'
+    resultado = client.get(f'/results/{job_id}/json').json()
+    assert {'ventas', 'tendencias', 'validation'} <= set(resultado)
+    assert not {'rentabilidad', 'auditoria', 'clientes', 'confianza'} & set(resultado)
+    assert client.post('/upload', params={'modo': 'ventas+nada'},
+                       files={'file': ('modos.csv', b'producto\nPan\n')}).status_code == 400
@@ -0,0 +1,87 @@
+"""Un encabezado ya visto se lee con su layout registrado; un título nunca identifica un layout"""
+import pandas as pd
+import pytest
+
+from core.pre_parser import PreParser
+from core.registro_layouts import RegistroLayouts, header_signature, normalize_name
+
+TITULO = 'Reporte de ventas diario'
+
+
+@pytest.fixture
+def layouts(tmp_path):
+    return RegistroLayouts(str(tmp_path / 'layouts.json'))
+
+
+def write(path, lineas):
+    path.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def parse(path, layouts):
+    resultado = PreParser(layouts=layouts).parse(path)
+    assert resultado['status'] == 'success', resultado
+    return resultado
+
+
+def test_known_header_reuses_layout(tmp_path, layouts):
+    encabezado = 'Producto;Precio Venta ($);Cantidad;Notas;Sucursal'
+    primero = write(tmp_path / 'dia1.csv', [TITULO, encabezado, 'Pan;$ 1.234,50;2;x;Centro', 'Leche;$ 3,25;1;;Norte'])
+    resultado = parse(primero, layouts)
+    firma = header_signature(encabezado)
+    assert resultado['layout'] == {'firma': firma, 'conocido': False}
+
+    registrado = layouts.get(firma)
+    assert registrado['dialecto']['skiprows'] == 1 and registrado['dialecto']['sep'] == ';'
+    assert set(registrado['mapeo'].values()) == {'producto', 'precio_venta', 'cantidad', 'sucursal'}
+    assert registrado['limpieza']
+
+    # Mismo encabezado con otras mayúsculas y acentos, otro título
+    segundo = write(tmp_path / 'dia2.csv', ['Reporte del martes', encabezado.upper().replace('PRODUCTO', 'PRODÚCTO'),
+                                            'Pan;$ 1.234,50;2;x;Centro', 'Leche;$ 3,25;1;;Norte'])
+    reusado = parse(segundo, layouts)
+    assert reusado['layout'] == {'firma': firma, 'conocido': True}
+    pd.testing.assert_frame_equal(reusado['data'], resultado['data'])
+    assert reusado['data']['precio_venta'].tolist() == [1234.5, 3.25]
+
+
+def test_title_line_does_not_identify_layout(tmp_path, layouts):
+    parse(write(tmp_path / 'a.csv', [TITULO, 'producto,cantidad', 'Pan,2']), layouts)
+    # Mismo título, otro encabezado: no se lee con el layout de a.csv
+    resultado = parse(write(tmp_path / 'b.csv', [TITULO, 'cliente;precio_venta;producto', 'C1;2,5;Pan']), layouts)
+    assert resultado['layout']['conocido'] is False
+    assert resultado['layout']['firma'] == header_signature('cliente;precio_venta;producto')
+    df = resultado['data']
+    assert df['cliente'].tolist() == ['C1'] and df['precio_venta'].tolist() == [2.5]
+    assert len(layouts.list()) == 2
+
+
+def test_known_header_on_another_line_is_detected_again(tmp_path, layouts):
+    parse(write(tmp_path / 'a.csv', [TITULO, 'producto,cantidad', 'Pan,2']), layouts)
+    # El encabezado conocido, pero sin título: el skiprows registrado no aplica
+    resultado = parse(write(tmp_path / 'b.csv', ['producto,cantidad', 'Pan,2', 'Leche,3']), layouts)
+    assert resultado['layout']['conocido'] is False
+    assert resultado['data']['cantidad'].tolist() == [2, 3]
+    assert layouts.get(header_signature('producto,cantidad'))['dialecto']['skiprows'] == 0
+
+
+def test_alias_forgets_layouts_with_that_column(tmp_path, layouts):
+    path = write(tmp_path / 'a.csv', ['producto,monto', 'Pan,2.5'])
+    assert 'precio_venta' not in parse(path, layouts)['data'].columns
+    assert layouts.get(header_signature('producto,monto')) is not None
+
+    assert layouts.add_alias('Monto', 'precio_venta') == {'monto': 'precio_venta'}
+    assert layouts.get(header_signature('producto,monto')) is None
+    resultado = parse(path, layouts)
+    assert resultado['data']['precio_venta'].tolist() == [2.5]
+
+    # Otro proceso (otra instancia sobre el mismo archivo) ve el alias y el layout nuevo
+    otro = RegistroLayouts(str(layouts.path))
+    assert otro.aliases() == {'monto': 'precio_venta'}
+    assert otro.get(header_signature('producto,monto'))['mapeo'] == {'producto': 'producto', 'monto': 'precio_venta'}
+    assert otro.remove_alias('MONTO') and not layouts.aliases()
+
+
+def test_normalize_name():
+    assert normalize_name('Precio_Venta ($)') == 'precio venta'
+    assert normalize_name('  AÑO ') == 'ano'
@@ -0,0 +1,74 @@
+"""La caché devuelve el resultado de un archivo y modo ya analizados, y sólo ése"""
+import os
+import time
+
+import pytest
+
+from api.job_store import MemoryJobStore, SQLiteJobStore
+from api.result_cache import ResultCache
+
+CSV = b'producto,precio_venta,cantidad,sucursal\nLeche,1.5,3,Centro\nPan,0.5,24,Norte\nCafe,12.25,1,Centro\n'
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryJobStore(ttl_s=3600)
+    return SQLiteJobStore(str(tmp_path / 'jobs.db'), ttl_s=3600)
+
+
+def write_result(tmp_path, job_id):
+    carpeta = tmp_path / 'results' / job_id
+    carpeta.mkdir(parents=True)
+    (carpeta / 'analysis_result.json').write_text('{"ventas":{}}')
+    return str(carpeta / 'analysis_result.json')
+
+
+def test_cache_index(store):
+    for i, job_id in enumerate(['a', 'b', 'c']):
+        store.cache_put(('sha', 'full', str(i)), {'job_id': job_id, 'result_path': f"/r/{job_id}.json",
+                                                  'bytes': 100, 'created': time.time()})
+    assert store.cache_jobs(['a', 'c', 'z']) == {'a', 'c'}
+    assert store.cache_get(('sha', 'full', '0'))['job_id'] == 'a'
+    # Entra una sola: se quita la menos usada primero (b, después c)
+    quitadas = store.cache_evict(max_entries=1, max_bytes=10_000, max_age_s=3600)
+    assert sorted(e['job_id'] for e in quitadas) == ['b', 'c']
+    assert store.cache_jobs(['a', 'b', 'c']) == {'a'}
+    store.cache_count('hits', 2)
+    assert store.cache_stats() == {'hits': 2, 'entries': 1, 'bytes': 100}
+
+
+def test_hit_miss_and_eviction(store, tmp_path):
+    cache = ResultCache(store, max_entries=1)
+    assert cache.get('sha-a', 'completo') is None
+    cache.put('sha-a', 'completo', 'job-a', write_result(tmp_path, 'job-a'))
+    assert cache.get('sha-a', 'completo')['job_id'] == 'job-a'
+    assert cache.get('sha-a', 'ventas') is None
+
+    # La entrada nueva desaloja a la vieja; su job ya expiró, así que se borra el artefacto
+    cache.put('sha-b', 'completo', 'job-b', write_result(tmp_path, 'job-b'))
+    assert cache.get('sha-a', 'completo') is None
+    assert not (tmp_path / 'results' / 'job-a').exists()
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 3 and cache.stats()['evictions'] == 1
+
+    # Un artefacto borrado por fuera no se sirve
+    os.remove(tmp_path / 'results' / 'job-b' / 'analysis_result.json')
+    assert cache.get('sha-b', 'completo') is None
+
+
+def test_compact_upload_is_another_entry(api, client, wait):
+    def subir(**params):
+        respuesta = client.post('/upload', params=dict(params, modo='ventas'), files={'file': ('cache.csv', CSV)})
+        assert respuesta.status_code == 200, respuesta.text
+        job_id = respuesta.json()['job_id']
+        assert wait(f'/status/{job_id}')['status'] == 'completed'
+        return job_id, api.job_store.get(job_id)
+
+    normal, job_normal = subir()
+    compacto, job_compacto = subir(compact=True)
+    assert not job_compacto.get('cache_hit')
+    assert job_compacto['dataset_id'] != job_normal['dataset_id']
+    assert client.get(f'/results/{compacto}/json', params={'section': 'memoria'}).json()['compact'] is True
+
+    assert subir()[1]['cached_from'] == normal
+    assert subir(compact=True)[1]['cached_from'] == compacto
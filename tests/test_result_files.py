@@ -0,0 +1,93 @@
+"""Los resultados se sirven desde bytes ya serializados: documento o sección, gzip y ETag"""
+import gzip
+import json
+import os
+
+import pytest
+
+from api.result_files import (ResultChanged, etag_matches, locate, negotiate_encoding, read_body,
+                              write_results)
+
+RESULTADOS = {
+    'ventas': {'total': 1234.5, 'por_sucursal': {'Centro': 1000.0, 'Ñuñoa': 234.5}},
+    'auditoria': {'anomalias': ['2 valores nulos']},
+    'reporte': 'Informe con acentos: año, señal'
+}
+
+
+@pytest.fixture
+def result_path(tmp_path):
+    path = str(tmp_path / 'analysis_result.json')
+    write_results(path, RESULTADOS)
+    return path
+
+
+def test_document_and_sections(result_path):
+    ubicacion = locate(result_path)
+    assert json.loads(read_body(ubicacion)) == RESULTADOS
+    assert json.loads(gzip.decompress(read_body(ubicacion, 'gzip'))) == RESULTADOS
+    with open(result_path) as f:
+        assert json.load(f) == RESULTADOS
+
+    for nombre, valor in RESULTADOS.items():
+        seccion = locate(result_path, nombre)
+        assert json.loads(read_body(seccion)) == valor
+        assert json.loads(gzip.decompress(read_body(seccion, 'gzip'))) == valor
+        assert seccion['etag'] != ubicacion['etag']
+
+    with pytest.raises(KeyError, match='ventas, auditoria, reporte'):
+        locate(result_path, 'clientes')
+
+
+def test_rewrite_changes_etag_and_drops_old_generation(result_path):
+    vieja = locate(result_path)
+    write_results(result_path, dict(RESULTADOS, ventas={'total': 0}))
+    nueva = locate(result_path)
+    assert nueva['etag'] != vieja['etag']
+    assert json.loads(read_body(nueva))['ventas'] == {'total': 0}
+    # Quien ubicó la generación anterior vuelve a ubicar en lugar de leer offsets viejos
+    with pytest.raises(ResultChanged):
+        read_body(vieja, 'gzip')
+    assert sorted(os.listdir(os.path.dirname(result_path))) == sorted([
+        'analysis_result.json', 'analysis_result.index.json',
+        os.path.basename(nueva['path']), os.path.basename(nueva['gzip_path']),
+        os.path.basename(locate(result_path, 'ventas')['gzip_path'])
+    ])
+
+
+def test_results_written_before_the_index(tmp_path):
+    path = tmp_path / 'analysis_result.json'
+    path.write_text(json.dumps(RESULTADOS, indent=2), encoding='utf-8')
+    ubicacion = locate(str(path), 'ventas')
+    assert json.loads(read_body(ubicacion)) == RESULTADOS['ventas']
+    assert json.loads(gzip.decompress(read_body(ubicacion, 'gzip'))) == RESULTADOS['ventas']
+
+
+def test_negotiate_encoding_and_etag():
+    assert negotiate_encoding('gzip, deflate, br') == 'gzip'
+    assert negotiate_encoding('gzip;q=0, deflate') == 'deflate'
+    assert negotiate_encoding('br, *;q=0') is None
+    assert negotiate_encoding(None) is None
+    assert etag_matches('W/"abc", "def"', 'def') and etag_matches('*', 'abc')
+    assert not etag_matches('"abc"', 'abcd') and not etag_matches(None, 'abc')
+
+
+def test_results_endpoint(api, client, result_path):
+    api.job_store.create('res-1', {'status': 'completed', 'file': 'v.csv', 'modo': 'completo',
+                                   'result_path': result_path})
+
+    respuesta = client.get('/results/res-1', headers={'Accept-Encoding': 'gzip'})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['content-encoding'] == 'gzip'
+    assert respuesta.json() == RESULTADOS
+    etag = respuesta.headers['etag']
+    assert etag == f'W/"{locate(result_path)["etag"]}"'
+
+    sin_cambios = client.get('/results/res-1', headers={'If-None-Match': etag})
+    assert sin_cambios.status_code == 304 and sin_cambios.content == b''
+
+    seccion = client.get('/results/res-1/json', params={'section': 'ventas'}, headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in seccion.headers
+    assert seccion.json() == RESULTADOS['ventas']
+    assert seccion.headers['etag'] != etag
+    assert client.get('/results/res-1', params={'section': 'nada'}).status_code == 404
@@ -0,0 +1,81 @@
+"""Los sketches respetan sus cotas de error y merge() equivale a alimentar la unión"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.sketches import HyperLogLog, SketchCuantiles, SpaceSaving, hash_values
+
+
+@pytest.mark.parametrize('distintos', [50, 3_000, 200_000])
+def test_hll_estimate_within_error(distintos):
+    rng = np.random.default_rng(distintos)
+    valores = rng.permutation(np.repeat(np.arange(distintos), 3))
+    hll = HyperLogLog().add(valores)
+    assert abs(hll.estimate() - distintos) <= 3 * hll.error_relativo * distintos
+
+
+def test_hll_merge_equals_union():
+    a = HyperLogLog().add(np.arange(0, 60_000))
+    b = HyperLogLog().add(np.arange(40_000, 100_000))
+    union = HyperLogLog().add(np.arange(0, 100_000))
+    np.testing.assert_array_equal(a.merge(b).registros, union.registros)
+    with pytest.raises(ValueError):
+        a.merge(HyperLogLog(p=10))
+
+
+def test_hll_same_value_any_dtype():
+    # Un ID leído como número en un chunk y como texto en otro cuenta una sola vez
+    assert (hash_values(pd.Series([7.0, 12.0])) == hash_values(pd.Series(['7', '12']))).all()
+    assert (hash_values(pd.Series(['a', 'b'], dtype='category')) == hash_values(pd.Series(['a', 'b']))).all()
+
+
+def test_quantiles_within_alpha():
+    rng = np.random.default_rng(5)
+    valores = np.concatenate([
+        rng.lognormal(3, 1.5, 20_000),
+        -rng.lognormal(1, 1, 4_000),
+        np.zeros(1_000),
+    ])
+    sketch = SketchCuantiles()
+    for parte in np.array_split(rng.permutation(valores), 7):
+        sketch.add(parte)
+    assert sketch.count == len(valores)
+    for q in (0.01, 0.1, 0.15, 0.5, 0.9, 0.99, 1.0):
+        real = np.quantile(valores, q, method='lower')
+        assert abs(sketch.quantile(q) - real) <= sketch.alpha * abs(real), q
+
+
+def test_quantiles_merge_equals_union():
+    rng = np.random.default_rng(8)
+    a, b = rng.normal(100, 40, 5_000), rng.normal(-20, 5, 3_000)
+    combinado = SketchCuantiles().add(a).merge(SketchCuantiles().add(b))
+    directo = SketchCuantiles().add(np.concatenate([a, b]))
+    assert combinado.quantiles() == directo.quantiles()
+    assert SketchCuantiles().quantile(0.5) is None
+
+
+def test_space_saving_bounds():
+    rng = np.random.default_rng(2)
+    productos = np.array([f"SKU{i:04d}" for i in range(2_000)])
+    # Pocos productos pesados y una cola larga
+    pesos = np.where(np.arange(2_000) < 10, 5_000.0, 1.0)
+    chunks = [
+        pd.Series(rng.exponential(pesos[idx]), index=productos[idx])
+        for idx in (rng.choice(2_000, size=800) for _ in range(30))
+    ]
+    reales = pd.concat(chunks).groupby(level=0).sum()
+
+    k = 50
+    partes = [SpaceSaving(k) for _ in range(3)]
+    for i, chunk in enumerate(chunks):
+        partes[i % 3].add(chunk)
+    sketch = partes[0].merge(partes[1]).merge(partes[2])
+
+    assert len(sketch.pesos) == k
+    for item in sketch.pesos.index:
+        real = reales.get(item, 0.0)
+        assert sketch.pesos[item] - sketch.errores[item] - 1e-6 <= real <= sketch.pesos[item] + 1e-6, item
+    # Todo elemento con más de total/k del peso sigue en el resumen
+    pesados = reales[reales > reales.sum() / k].index
+    assert len(pesados) and set(pesados) <= set(sketch.pesos.index)
+    assert [fila['item'] for fila in sketch.top(3)] == list(reales.nlargest(3).index)
@@ -0,0 +1,76 @@
+"""Analizar por chunks da el mismo resultado que analizar el DataFrame entero"""
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.generador import GeneradorVentas
+from core.data_validator import DataValidator
+from core.pre_parser import PreParser
+from core.registro_analizadores import ANALIZADORES
+from core.registro_layouts import RegistroLayouts
+from core.streaming import VACIO, ConjuntoHashes, analyze_chunks
+
+
+def analizadores():
+    return dict({nombre: clase() for nombre, clase in ANALIZADORES.items()}, validation=DataValidator())
+
+
+def assert_equivalent(a, b, ruta=''):
+    """Igualdad recursiva; los floats difieren sólo por el orden de las sumas"""
+    if isinstance(a, dict):
+        assert isinstance(b, dict) and set(a) == set(b), ruta
+        for clave in a:
+            assert_equivalent(a[clave], b[clave], f"{ruta}/{clave}")
+    elif isinstance(a, (list, tuple)):
+        assert isinstance(b, (list, tuple)) and len(a) == len(b), ruta
+        for i, (x, y) in enumerate(zip(a, b)):
+            assert_equivalent(x, y, f"{ruta}[{i}]")
+    elif isinstance(a, float) and isinstance(b, float):
+        assert (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9), (ruta, a, b)
+    else:
+        assert a == b, (ruta, a, b)
+
+
+@pytest.fixture(scope='module')
+def ventas(tmp_path_factory):
+    directorio = tmp_path_factory.mktemp('streaming')
+    path = GeneradorVentas(filas=6000, tasa_duplicados=0.05, seed=11).write(str(directorio), 'csv')
+    return str(path), RegistroLayouts(str(directorio / 'layouts.json'))
+
+
+@pytest.mark.parametrize('chunksize', [700, 6000])
+def test_chunks_match_in_memory(ventas, chunksize):
+    path, layouts = ventas
+    df = PreParser(layouts=layouts).parse(path)['data']
+    en_memoria = {
+        nombre: analizador.validate(df) if nombre == 'validation' else analizador.analyze({'data': df})
+        for nombre, analizador in analizadores().items()
+    }
+    chunks = list(PreParser(layouts=layouts).iter_chunks(path, chunksize=chunksize))
+    assert len(chunks) == math.ceil(6000 / chunksize)
+
+    por_chunks = analyze_chunks(chunks, analizadores())
+    assert all(r.get('status') != 'error' for r in por_chunks.values()), por_chunks
+    assert_equivalent(en_memoria, por_chunks)
+
+
+def test_hash_set_matches_numpy():
+    rng = np.random.default_rng(3)
+    lotes = [rng.integers(0, 5000, size=rng.integers(1, 800)).astype(np.uint64) for _ in range(60)]
+    conjunto, vistos = VACIO, np.empty(0, dtype=np.uint64)
+    for lote in lotes:
+        unicos = np.unique(lote)
+        conjunto, ya_vistos = conjunto.add(unicos)
+        assert ya_vistos == len(np.intersect1d(unicos, vistos))
+        vistos = np.union1d(vistos, unicos)
+        assert len(conjunto) == len(vistos)
+    # Corridas disjuntas y ordenadas: la compactación deja O(log n) corridas
+    assert len(conjunto.corridas) <= 2 * math.ceil(math.log2(len(vistos)))
+    np.testing.assert_array_equal(conjunto.to_array(), vistos)
+
+    otro, _ = ConjuntoHashes().add(np.arange(4000, 9000, dtype=np.uint64))
+    union, comunes = conjunto.union(otro)
+    assert comunes == len(np.intersect1d(vistos, np.arange(4000, 9000)))
+    np.testing.assert_array_equal(union.to_array(), np.union1d(vistos, np.arange(4000, 9000, dtype=np.uint64)))
+    assert union.contains(np.array([4999, 8999, 9000], dtype=np.uint64)).tolist() == [True, True, False]
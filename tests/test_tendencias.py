@@ -0,0 +1,85 @@
+"""AnalizadorTendencias: series por día o semana, pendiente por producto y ventana de fechas"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.analyzer_tendencias import AnalizadorTendencias
+from core.marco_analisis import MarcoAnalisis
+
+
+def ventas(desde, dias, por_dia):
+    """Una fila por producto y día; `por_dia(producto, n)` es la cantidad del día n"""
+    fechas = pd.date_range(desde, periods=dias, freq='D')
+    filas = [
+        {'fecha': fecha, 'producto': producto, 'sucursal': 'Centro', 'precio_venta': 1.0,
+         'cantidad': por_dia(producto, n)}
+        for n, fecha in enumerate(fechas) for producto in ('Sube', 'Baja', 'Igual')
+    ]
+    return pd.DataFrame(filas)
+
+
+def cantidades(producto, n):
+    return {'Sube': 10 + 5 * n, 'Baja': 200 - 10 * n, 'Igual': 50}[producto]
+
+
+def test_daily_series_and_products():
+    df = ventas('2024-03-01', 14, cantidades)
+    resultado = AnalizadorTendencias().analyze({'data': df})
+    assert resultado['status'] == 'success'
+    assert (resultado['frecuencia'], resultado['periodos']) == ('dia', 14)
+    assert (resultado['desde'], resultado['hasta']) == ('2024-03-01', '2024-03-14')
+    assert [p['ventas'] for p in resultado['serie']] == [260.0 - 5 * n for n in range(14)]
+    # Media móvil de 7 días desde el séptimo
+    assert [p['media_movil'] for p in resultado['serie'][:7]] == [None] * 6 + [245.0]
+    assert resultado['tendencia'] == 'decreciente'
+
+    productos = resultado['por_producto']
+    assert (productos['series'], productos['crecientes'], productos['decrecientes'], productos['estables']) == (3, 1, 1, 1)
+    assert productos['top_crecientes'][0]['clave'] == 'Sube'
+    assert productos['top_crecientes'][0]['pendiente'] == pytest.approx(5.0)
+    assert productos['top_decrecientes'][0]['clave'] == 'Baja'
+    assert resultado['por_sucursal']['series'] == 1
+
+
+def test_weekly_series_starts_on_monday():
+    df = ventas('2024-01-03', 120, lambda producto, n: 1)
+    resultado = AnalizadorTendencias().analyze({'data': df})
+    assert resultado['frecuencia'] == 'semana'
+    assert pd.Timestamp(resultado['desde']).day_name() == 'Monday'
+    assert sum(p['ventas'] for p in resultado['serie']) == resultado['total_ventas'] == 360.0
+    # Ventas parejas: las semanas incompletas de los extremos no inventan una tendencia
+    assert resultado['tendencia'] == 'estable'
+    assert AnalizadorTendencias(frecuencia='dia').analyze({'data': df})['periodos'] == 120
+
+
+def test_mistyped_year_is_left_out_of_the_window():
+    df = ventas('2024-03-01', 10, cantidades)
+    df.loc[0, 'fecha'] = pd.Timestamp('2204-03-01')
+    resultado = AnalizadorTendencias(max_dias=400).analyze({'data': df})
+    assert resultado['filas_fuera_de_rango'] == 1
+    assert '1 filas con fecha fuera de 2024-03-01 a 2024-03-10' in resultado['problemas'][0]
+    assert resultado['hasta'] == '2024-03-10'
+    assert resultado['transacciones'] == 30
+    assert sum(p['ventas'] for p in resultado['serie']) == resultado['total_ventas'] - 10
+
+
+def test_dates_before_1970_and_missing_dates():
+    df = ventas('1969-12-25', 14, cantidades)
+    df.loc[3, 'fecha'] = pd.NaT
+    resultado = AnalizadorTendencias().analyze({'data': df})
+    assert (resultado['desde'], resultado['hasta']) == ('1969-12-25', '1970-01-07')
+    assert resultado['filas_sin_fecha'] == 1
+    assert resultado['por_producto']['top_crecientes'][0]['clave'] == 'Sube'
+
+    sin_fechas = AnalizadorTendencias().analyze({'data': df.drop(columns='fecha')})
+    assert sin_fechas['tendencia'] == 'sin_fecha'
+
+
+def test_chunks_match_single_pass():
+    df = ventas('2024-01-01', 200, lambda producto, n: (n * 7 + len(producto)) % 13 + 1)
+    analizador = AnalizadorTendencias()
+    partes = [analizador.fold(analizador.new_state(), MarcoAnalisis(chunk)) for chunk in np.array_split(df, 5)]
+    combinado = partes[0]
+    for parte in partes[1:]:
+        combinado = analizador.merge(combinado, parte)
+    assert analizador.finalize(combinado) == analizador.analyze({'data': df})